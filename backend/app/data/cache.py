@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached entry is served as fresh, and how much longer it may be
+# served as stale while a background refresh runs.
+DEFAULT_TTL = float(os.getenv("SONA_CACHE_TTL", "300"))
+DEFAULT_STALE_TTL = float(os.getenv("SONA_CACHE_STALE_TTL", "3600"))
+
+
+class _Entry:
+    __slots__ = ('value', 'fetched_at')
+
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class TTLCache:
+    """
+    In-process cache with TTL, stale-while-revalidate and single-flight loading.
+
+    - fresh entries (age < ttl) are returned directly
+    - stale entries (age < ttl + stale_ttl) are returned immediately and
+      refreshed once in a background thread
+    - missing/expired entries are loaded synchronously; concurrent callers
+      for the same key wait on the one in-flight load instead of
+      hitting the upstream again
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'loads': 0, 'load_errors': 0}
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() when needed"""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age < self.ttl:
+                    self._stats['hits'] += 1
+                    return entry.value
+                if age < self.ttl + self.stale_ttl:
+                    self._stats['stale_hits'] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = threading.Event()
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader), daemon=True
+                        ).start()
+                    return entry.value
+            self._stats['misses'] += 1
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            # Same bound as the leader: a failed load leaves nothing servable
+            # beyond ttl + stale_ttl
+            if entry is None or self.clock() - entry.fetched_at >= self.ttl + self.stale_ttl:
+                raise LookupError(f"Cache load failed for {key!r}")
+            return entry.value
+
+        try:
+            return self._load(key, loader)
+        finally:
+            self._finish(key)
+
+    def peek(self, key):
+        """Return the cached value for key if present (fresh or stale), else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def servable(self, key):
+        """True when get(key) would return without waiting on a load"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and self.clock() - entry.fetched_at < self.ttl + self.stale_ttl
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = _Entry(value, self.clock())
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['inflight'] = len(self._inflight)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _load(self, key, loader):
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self._stats['load_errors'] += 1
+            raise
+        with self._lock:
+            self._stats['loads'] += 1
+            self._entries[key] = _Entry(value, self.clock())
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            self._load(key, loader)
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {key!r}: {str(e)}")
+        finally:
+            self._finish(key)
+
+    def _finish(self, key):
+        with self._lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
@@ -1,12 +1,141 @@
-import yfinance as yf
-import pandas as pd
 from datetime import datetime, timedelta
+import os
+import pandas as pd
+from app.data.cache import TTLCache
+from app.data.intraday import INTERVALS, INTRADAY_DAYS, INTRADAY_TTL, IntradayBars, align_asof, chunk_ranges, intraday_frame
+from app.data.store import PriceStore, PRICE_STORE_DIR
+from app.utils.metrics import STAGE_SECONDS, UPSTREAM_SECONDS, UPSTREAM_ERRORS, FALLBACKS
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Column layout of a daily history frame, whatever the upstream returned
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+# Series joined onto every metal frame as extra (close) columns, in this order
+EXOGENOUS = ['usd_inr', 'oil', 'nifty', 'vix']
+
+# Longest gap, in rows, a series is carried forward over (exchange holidays
+# differ between COMEX, NSE and FX); longer gaps stay NaN
+FFILL_LIMIT = 5
+
+# Intraday counterpart, in time: how old the last FX bar may be
+INTRADAY_FFILL = pd.Timedelta(hours=12)
+
+# Market-data HTTP service used instead of yfinance when set (e.g. the load
+# test's stand-in, benchmarks/fake_market.py)
+MARKET_DATA_URL = os.getenv("SONA_MARKET_DATA_URL", "").rstrip('/')
+MARKET_DATA_TIMEOUT = float(os.getenv("SONA_MARKET_DATA_TIMEOUT", "10"))
+
+def yfinance_history(symbol, start=None, end=None, period=None, interval='1d'):
+    """Default upstream source: one yfinance Ticker.history round trip"""
+    import yfinance as yf  # deferred: heavy import, only needed on a cache miss
+    
+    ticker = yf.Ticker(symbol)
+    if period is not None:
+        return ticker.history(period=period, interval=interval)
+    return ticker.history(start=start, end=end, interval=interval)
+
+def yfinance_download(symbols, start=None, end=None, period=None, interval='1d'):
+    """Default bulk source: every symbol in one yf.download call, {symbol: frame}"""
+    import yfinance as yf
+    
+    window = {'period': period} if period is not None else {'start': start, 'end': end}
+    data = yf.download(list(symbols), group_by='ticker', actions=True, auto_adjust=True,
+                       progress=False, threads=True, interval=interval, **window)
+    
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    for symbol in symbols:
+        if symbol in data.columns.get_level_values(0):
+            frames[symbol] = data[symbol]
+    return frames
+
+def http_download(symbols, start=None, end=None, period=None, interval='1d'):
+    """
+    Bulk source for MARKET_DATA_URL: GET /history?symbols=..&start=..&end=..
+    The service answers {symbol: {'dates': [...], 'Open': [...], ...}}
+    (intraday: &interval=1h and start/end with a time of day)
+    """
+    import requests
+    
+    params = {'symbols': ','.join(symbols)}
+    if interval != '1d':
+        params['interval'] = interval
+    if period is not None:
+        params['period'] = period
+    elif interval != '1d':
+        params.update(start=start.isoformat(timespec='seconds'), end=end.isoformat(timespec='seconds'))
+    else:
+        params.update(start=start.date().isoformat(), end=end.date().isoformat())
+    response = requests.get(f"{MARKET_DATA_URL}/history", params=params, timeout=MARKET_DATA_TIMEOUT)
+    response.raise_for_status()
+    
+    frames = {}
+    for symbol, data in response.json().items():
+        index = pd.DatetimeIndex(pd.to_datetime(data.pop('dates')), name='Date')
+        frames[symbol] = pd.DataFrame(data, index=index)
+    return frames
+
+def http_history(symbol, start=None, end=None, period=None, interval='1d'):
+    """Per-symbol source for MARKET_DATA_URL"""
+    return http_download([symbol], start=start, end=end, period=period, interval=interval).get(symbol)
+
+def daily_frame(df):
+    """Normalize an upstream frame: naive calendar-day index, HISTORY_COLUMNS only"""
+    df = df.dropna(subset=['Close'])
+    index = df.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df = df.set_axis(index.normalize().rename('Date'))
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    
+    df = df.reindex(columns=HISTORY_COLUMNS)
+    return df.fillna({'Volume': 0, 'Dividends': 0.0, 'Stock Splits': 0.0})
+
+def align_series(index, series, limit=FFILL_LIMIT):
+    """
+    Put a series onto another calendar without look-ahead
+    Each day takes the latest value at or before it, carried forward
+    at most `limit` rows
+    """
+    merged = series.reindex(index.union(series.index)).ffill(limit=limit)
+    return merged.reindex(index)
+
 class MarketDataFetcher:
-    def __init__(self):
+    def __init__(self, source=None, cache=None, bulk_source=None, store=None, read_only=False):
+        # Any callable with yfinance_history's signature can stand in for
+        # yfinance (e.g. a local stub in tests)
+        self.source = source or (http_history if MARKET_DATA_URL else yfinance_history)
+        
+        # Multi-symbol download: (symbols, start, end, period) -> {symbol: frame}.
+        # A custom per-symbol source is looped over instead
+        if bulk_source is None and source is None:
+            bulk_source = http_download if MARKET_DATA_URL else yfinance_download
+        self.bulk_source = bulk_source
+        
+        # Local bar store: only new days are fetched, and stored history is
+        # served when the upstream is down. On by default for live data only,
+        # so stub sources never write into it
+        if store is None and source is None and PRICE_STORE_DIR:
+            store = PriceStore(PRICE_STORE_DIR)
+        self.store = store
+        # Serve the store as it is and never call the upstream (another
+        # process keeps it synced, e.g. the shared-state refresher)
+        self.read_only = read_only
+        self._sync_lock = threading.Lock()
+        
+        # Raw upstream frames keyed by (symbol, window)
+        self.cache = cache or TTLCache()
+        
+        # Intraday bars live in fixed-size float32 buffers per (symbol, interval),
+        # synced incrementally; derived frames are cached briefly
+        self.intraday = {}
+        self.intraday_cache = TTLCache(ttl=INTRADAY_TTL, stale_ttl=INTRADAY_TTL)
+        self._intraday_lock = threading.Lock()
+        
         self.symbols = {
             'gold': 'GC=F',      # Gold Futures
             'silver': 'SI=F',    # Silver Futures
@@ -40,18 +169,15 @@ class MarketDataFetcher:
             if not symbol:
                 raise ValueError(f"Unknown metal: {metal}")
             
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
+            # Every configured symbol comes from one cached bulk download
+            with STAGE_SECONDS.time(stage='fetch_history'):
+                df = self.get_market_frame(metal, days)
             
-            # Fetch data
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(start=start_date, end=end_date)
-            
-            if df.empty:
-                raise ValueError(f"No data available for {metal}")
-            
-            # Convert to INR
-            usd_inr = self.get_usd_inr_rate()
+            # Convert to INR at each day's own rate; days with no rate at all
+            # (FX series missing) use the spot/fallback rate
+            usd_inr = df['usd_inr']
+            if usd_inr.isna().any():
+                usd_inr = usd_inr.fillna(self.get_usd_inr_rate())
             df['Close'] = df['Close'] * usd_inr
             
             # Convert from Troy Ounce to grams (1 Troy Oz = 31.1035 grams)
@@ -70,6 +196,123 @@ class MarketDataFetcher:
             logger.error(f"Error fetching data for {metal}: {str(e)}")
             return None
     
+    def get_intraday_data(self, metal, interval='1h', days=30):
+        """
+        Intraday 24K INR/gram bars for the last `days` days (at most
+        INTRADAY_DAYS) as a float32 frame; None when unavailable
+        
+        Only Close is converted, as in get_historical_data. Each bar uses the
+        latest USD/INR bar at or before it (no look-ahead). One frame of
+        INTRADAY_DAYS is cached per (metal, interval) and sliced per request,
+        so the cache stays bounded whatever `days` clients ask for.
+        """
+        try:
+            if interval not in INTERVALS:
+                raise ValueError(f"Unsupported interval: {interval}")
+            days = min(days, INTRADAY_DAYS)
+            with STAGE_SECONDS.time(stage='fetch_intraday'):
+                df = self.intraday_cache.get(
+                    (metal, interval), lambda: self._intraday_frame(metal, interval, INTRADAY_DAYS)
+                )
+                start = pd.Timestamp.now('UTC').tz_localize(None) - pd.Timedelta(days=days)
+                return df[df.index >= start].copy()
+        except Exception as e:
+            logger.error(f"Error fetching {interval} data for {metal}: {str(e)}")
+            return None
+    
+    def _intraday_frame(self, metal, interval, days):
+        symbol, fx_symbol = self.symbols[metal], self.symbols['usd_inr']
+        start = pd.Timestamp.now('UTC').tz_localize(None) - pd.Timedelta(days=days)
+        with self._intraday_lock:
+            self.sync_intraday([symbol, fx_symbol], interval, start)
+        
+        bars = self.intraday.get((symbol, interval))
+        df = bars.frame(start) if bars is not None else None
+        if df is None:
+            raise ValueError(f"No {interval} data available for {symbol}")
+        
+        fx = self.intraday.get((fx_symbol, interval))
+        fx = fx.frame(start - INTRADAY_FFILL) if fx is not None else None
+        if fx is None:
+            usd_inr = pd.Series(float('nan'), index=df.index)
+        else:
+            usd_inr = align_asof(df.index, fx['Close'], INTRADAY_FFILL)
+        usd_inr = usd_inr.fillna(self.get_usd_inr_rate())
+        
+        # Same conversion as get_historical_data, in float64 then back to float32
+        close = df['Close'].to_numpy(dtype='float64') * usd_inr.to_numpy() / 31.1035 * self.retail_markup[metal]
+        df['Close'] = close.astype(df['Close'].dtype)
+        logger.info(f"Fetched {len(df)} {interval} records for {metal} (24K base)")
+        return df
+    
+    def sync_intraday(self, symbols, interval, start):
+        """
+        Bring the intraday buffers up to date from `start`, one bulk call per chunk
+        
+        Symbols already backfilled to start only fetch from their last bar;
+        others fetch the whole window. Requests are split into chunks the
+        upstream accepts (INTERVALS[interval]['chunk_days']) and fetched
+        newest first; a failed or empty chunk ends the backfill, since older
+        ones are past the upstream's intraday lookback (or it is down, and
+        the buffered bars are served). Returns the number of new bars.
+        """
+        end = pd.Timestamp.now('UTC').tz_localize(None)
+        starts = []
+        for symbol in symbols:
+            bars = self.intraday.setdefault((symbol, interval), IntradayBars(interval))
+            if bars.last is None or bars.requested_from is None or start < bars.requested_from:
+                starts.append(start)
+            else:
+                starts.append(bars.last)
+        
+        added, fetched = 0, False
+        for chunk_start, chunk_end in chunk_ranges(min(starts), end, interval):
+            try:
+                frames = self._download_intraday(symbols, chunk_start, chunk_end, interval)
+            except Exception as e:
+                logger.warning(f"{interval} fetch from {chunk_start} failed: {str(e)}")
+                FALLBACKS.inc(kind='intraday')
+                break
+            if not frames:
+                break
+            fetched = True
+            for symbol, df in frames.items():
+                added += self.intraday[(symbol, interval)].merge(df)
+        
+        # Don't retry what the upstream doesn't go back to on every call
+        if fetched:
+            for symbol in symbols:
+                bars = self.intraday[(symbol, interval)]
+                bars.requested_from = min(start, bars.requested_from or start)
+        return added
+    
+    def _download_intraday(self, symbols, start, end, interval):
+        """One upstream call for a chunk (or one per symbol) -> {symbol: intraday frame}"""
+        if self.bulk_source is None:
+            raw = {}
+            for symbol in symbols:
+                try:
+                    with UPSTREAM_SECONDS.time(symbol=symbol):
+                        raw[symbol] = self.source(symbol, start=start, end=end, interval=interval)
+                except Exception as e:
+                    UPSTREAM_ERRORS.inc(symbol=symbol)
+                    logger.warning(f"No {interval} history for {symbol}: {str(e)}")
+        else:
+            try:
+                with UPSTREAM_SECONDS.time(symbol='bulk'):
+                    raw = self.bulk_source(symbols, start=start, end=end, interval=interval)
+            except Exception:
+                UPSTREAM_ERRORS.inc(symbol='bulk')
+                raise
+        
+        frames = {}
+        for symbol in symbols:
+            df = raw.get(symbol)
+            df = intraday_frame(df) if df is not None and not df.empty else None
+            if df is not None and not df.empty:
+                frames[symbol] = df
+        return frames
+    
     def get_current_price(self, metal, purity='24K'):
         """Get current retail price for specific purity"""
         try:
@@ -97,16 +340,163 @@ class MarketDataFetcher:
             logger.error(f"Error getting current price: {str(e)}")
             return None
     
+    def get_market_frame(self, metal, days=365):
+        """
+        Date-aligned frame for one metal: its daily OHLCV columns plus the
+        close of every EXOGENOUS series (usd_inr, oil, nifty, vix) on the
+        metal's trading days, forward-filled over holidays
+        """
+        return self.cache.get((self.symbols[metal], days), lambda: self._align(metal, days)).copy()
+    
+    def _align(self, metal, days):
+        frames = self.cache.get(('bulk', days), lambda: self._fetch_bulk(days))
+        
+        df = frames[self.symbols[metal]].copy()
+        for name in EXOGENOUS:
+            other = frames.get(self.symbols[name])
+            if other is None:
+                df[name] = float('nan')
+            else:
+                df[name] = align_series(df.index, other['Close']).to_numpy()
+        return df
+    
+    def _fetch_bulk(self, days):
+        """Every configured symbol for the window; raises unless both metals are available"""
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        symbols = list(self.symbols.values())
+        
+        if self.store is None:
+            if self.read_only:
+                raise ValueError("Read-only market data needs a price store")
+            frames = self._download(symbols, start_date, end_date)
+        else:
+            with self._sync_lock:
+                if not self.read_only:
+                    self.sync(symbols, start_date, end_date)
+                frames = {}
+                for symbol in symbols:
+                    df = self.store.read(symbol, start=start_date.date())
+                    if df is not None:
+                        frames[symbol] = df
+        
+        missing = [self.symbols[m] for m in self.retail_markup if self.symbols[m] not in frames]
+        if missing:
+            raise ValueError(f"No data available for {', '.join(missing)}")
+        
+        logger.info(f"Loaded {len(frames)}/{len(symbols)} symbols for {days} days")
+        return frames
+    
+    def sync(self, symbols, start_date, end_date):
+        """
+        Bring the local store up to date, one upstream call per group
+        Symbols with history from start_date only fetch from their last stored
+        bar (re-fetched, since today's bar is provisional); new symbols or a
+        longer window than was stored are backfilled in a separate call, so
+        one that never backfills doesn't widen every sync for the others. On
+        upstream failure the stored bars are served as they are.
+        """
+        wanted = pd.Timestamp(start_date.date())
+        backfill, incremental = [], {}
+        for symbol in symbols:
+            meta = self.store.meta(symbol)
+            requested = pd.Timestamp(meta['requested_from']) if meta and meta.get('requested_from') else None
+            if meta is None or not meta['rows'] or requested is None or wanted < requested:
+                backfill.append(symbol)
+            else:
+                incremental[symbol] = pd.Timestamp(meta['last'])
+        
+        appended = 0
+        groups = [(backfill, wanted), (list(incremental), min(incremental.values(), default=wanted))]
+        for group, start in groups:
+            if not group:
+                continue
+            try:
+                frames = self._download(group, start.to_pydatetime(), end_date)
+            except Exception as e:
+                logger.warning(f"Market data sync from {start.date()} failed, serving stored history: {str(e)}")
+                FALLBACKS.inc(kind='price_store')
+                continue
+            
+            for symbol, df in frames.items():
+                if symbol in incremental:
+                    appended += self.store.append(symbol, df)
+                else:
+                    self.store.write(symbol, df, requested_from=wanted)
+                    appended += len(df)
+            logger.info(f"Synced {len(frames)}/{len(group)} symbols from {start.date()}")
+        return appended
+    
+    def _download(self, symbols, start_date, end_date):
+        """One bulk upstream call (or one per symbol for a per-symbol source) -> {symbol: daily frame}"""
+        if self.bulk_source is None:
+            raw = {}
+            for symbol in symbols:
+                try:
+                    raw[symbol] = self._fetch_history(symbol, start=start_date, end=end_date)
+                except Exception as e:
+                    logger.warning(f"No history for {symbol}: {str(e)}")
+        else:
+            try:
+                with UPSTREAM_SECONDS.time(symbol='bulk'):
+                    raw = self.bulk_source(symbols, start=start_date, end=end_date)
+            except Exception:
+                UPSTREAM_ERRORS.inc(symbol='bulk')
+                raise
+        
+        frames = {}
+        for symbol in symbols:
+            df = raw.get(symbol)
+            df = daily_frame(df) if df is not None else None
+            if df is None or df.empty:
+                if self.bulk_source is not None:  # the per-symbol path already counted it
+                    UPSTREAM_ERRORS.inc(symbol=symbol)
+                continue
+            frames[symbol] = df
+        return frames
+    
+    def _fetch_history(self, symbol, start=None, end=None, period=None):
+        """Fetch from the upstream source; raises so failures are never cached"""
+        try:
+            with UPSTREAM_SECONDS.time(symbol=symbol):
+                df = self.source(symbol, start=start, end=end, period=period)
+            if df is None or df.empty:
+                raise ValueError(f"No data available for {symbol}")
+        except Exception:
+            UPSTREAM_ERRORS.inc(symbol=symbol)
+            raise
+        return df
+    
     def get_usd_inr_rate(self):
         """Get current USD to INR exchange rate"""
+        symbol = self.symbols['usd_inr']
         try:
-            ticker = yf.Ticker(self.symbols['usd_inr'])
-            data = ticker.history(period='1d')
-            if not data.empty:
-                return float(data['Close'].iloc[-1])
-            return 83.0  # Fallback rate
+            with STAGE_SECONDS.time(stage='fx_lookup'):
+                if self.read_only:
+                    # Latest stored rate instead of an upstream lookup
+                    data = self.store.read(symbol, start=self.store.last_date(symbol))
+                else:
+                    data = self.cache.get(
+                        (symbol, '1d'),
+                        lambda: self._fetch_history(symbol, period='1d')
+                    )
+            return float(data['Close'].iloc[-1])
         except:
-            return 83.0
+            logger.warning("USD/INR unavailable, using fallback rate 83.0")
+            FALLBACKS.inc(kind='usd_inr')
+            return 83.0  # Fallback rate
+    
+    def cache_stats(self):
+        """Hit/miss counters for the market-data cache"""
+        return self.cache.stats()
+    
+    def store_stats(self):
+        """Stored rows and date range per symbol (empty without a store)"""
+        return self.store.stats() if self.store is not None else {}
+    
+    def intraday_stats(self):
+        """Rows, capacity and bytes of each intraday buffer"""
+        return dict((f"{symbol}@{interval}", bars.stats()) for (symbol, interval), bars in sorted(self.intraday.items()))
     
     def apply_purity(self, price_24k, metal, purity):
         """Apply purity factor to 24K price"""
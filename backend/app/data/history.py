@@ -0,0 +1,110 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from app.data.cache import TTLCache
+from app.utils.downsample import METHODS, minmax_indices
+
+logger = logging.getLogger(__name__)
+
+# How far back /api/history reaches, and the largest point count it returns
+HISTORY_DAYS = int(os.getenv("SONA_HISTORY_DAYS", "3650"))
+MAX_POINTS = 2000
+
+# Same freshness as the market data the pyramids are built from
+HISTORY_TTL = float(os.getenv("SONA_CACHE_TTL", "300"))
+HISTORY_STALE_TTL = float(os.getenv("SONA_SNAPSHOT_STALE_TTL", "86400"))
+
+METALS = ['gold', 'silver']
+
+
+class PricePyramid:
+    """
+    One metal's 24K daily closes at successively coarser resolutions
+
+    Level 0 is every bar; each further level keeps the min and max of
+    buckets twice as wide as the last (so spikes survive). A window query
+    picks the coarsest level that still has `points` rows in range, which
+    bounds the rows left to downsample to about twice `points` whatever
+    the range.
+    """
+
+    def __init__(self, dates, closes, version=None):
+        days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        closes = np.asarray(closes, dtype=np.float64)
+        self.version = version
+        self.levels = [(days, closes)]
+        size = 4  # min+max of 2 bars is both bars
+        while len(days) // size >= 2:
+            keep = minmax_indices(closes, np.arange(0, len(days) + size, size).clip(max=len(days)))
+            self.levels.append((days[keep], closes[keep]))
+            size *= 2
+
+    @property
+    def first(self):
+        return pd.Timestamp(self.levels[0][0][0], unit='D')
+
+    @property
+    def last(self):
+        return pd.Timestamp(self.levels[0][0][-1], unit='D')
+
+    def window(self, start, end, points, method='lttb'):
+        """(dates, closes, level) for [start, end] downsampled to at most `points`"""
+        bounds = np.array([start, end], dtype='datetime64[D]').astype(np.int64)
+        chosen, lo, hi = 0, *self._rows(0, bounds)
+        for level in range(1, len(self.levels)):
+            level_lo, level_hi = self._rows(level, bounds)
+            if level_hi - level_lo < points:
+                break
+            chosen, lo, hi = level, level_lo, level_hi
+
+        days, closes = self.levels[chosen]
+        days, closes = days[lo:hi], closes[lo:hi]
+        keep = METHODS[method](days, closes, points)
+        return days[keep].astype('datetime64[D]'), closes[keep], chosen
+
+    def _rows(self, level, bounds):
+        days = self.levels[level][0]
+        return int(np.searchsorted(days, bounds[0])), int(np.searchsorted(days, bounds[1], side='right'))
+
+
+class PriceHistory:
+    """
+    Long-range 24K price history per metal, kept as a PricePyramid
+
+    Pyramids are rebuilt only when the market data moved on (new latest
+    bar), the same way ForecastSnapshots reuses a snapshot.
+    """
+
+    def __init__(self, fetcher, days=HISTORY_DAYS, ttl=HISTORY_TTL, stale_ttl=HISTORY_STALE_TTL):
+        self.fetcher = fetcher
+        self.days = days
+        self.cache = TTLCache(ttl=ttl, stale_ttl=stale_ttl)
+
+    def get(self, metal):
+        return self.cache.get(metal, lambda: self._build(metal))
+
+    def ready(self, metal):
+        return self.cache.servable(metal)
+
+    def warm(self, metals=METALS):
+        for metal in metals:
+            try:
+                self.get(metal)
+            except Exception as e:
+                logger.error(f"History warmup failed for {metal}: {str(e)}")
+
+    def _build(self, metal):
+        df = self.fetcher.get_historical_data(metal, days=self.days, for_training=False)
+        if df is None or df.empty:
+            raise ValueError(f"No history available for {metal}")
+
+        close = df['Close'].dropna()
+        version = f"{close.index[-1].isoformat()}:{float(close.iloc[-1]):.6f}"
+        previous = self.cache.peek(metal)
+        if previous is not None and previous.version == version:
+            return previous
+
+        pyramid = PricePyramid(close.index, close.to_numpy(), version)
+        logger.info(f"Built {metal} history pyramid: {len(close)} bars, {len(pyramid.levels)} levels")
+        return pyramid
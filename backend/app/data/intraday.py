@@ -0,0 +1,140 @@
+import os
+import math
+import threading
+import numpy as np
+import pandas as pd
+
+# Supported bar intervals: bar length and the widest range one upstream
+# request may span (yfinance rejects longer intraday ranges), so fetches
+# are split into chunks of at most chunk_days
+INTERVALS = {
+    '1h': {'step': pd.Timedelta(hours=1), 'chunk_days': 180},
+    '15m': {'step': pd.Timedelta(minutes=15), 'chunk_days': 30}
+}
+
+# Calendar days of intraday bars kept per symbol and interval
+INTRADAY_DAYS = int(os.getenv("SONA_INTRADAY_DAYS", "365"))
+
+# Intraday frames go stale much faster than daily ones
+INTRADAY_TTL = float(os.getenv("SONA_INTRADAY_TTL", "60"))
+
+# Stored per bar (Dividends / Stock Splits are daily-only)
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+BAR_DTYPE = np.dtype(np.float32)
+TIME_DTYPE = np.dtype('datetime64[s]')
+
+
+def bar_capacity(interval, days=INTRADAY_DAYS):
+    """Most bars `days` calendar days of round-the-clock trading can hold"""
+    return math.ceil(pd.Timedelta(days=days) / INTERVALS[interval]['step'])
+
+
+def chunk_ranges(start, end, interval):
+    """[(chunk_start, chunk_end), ...] covering start..end, newest first"""
+    span = pd.Timedelta(days=INTERVALS[interval]['chunk_days'])
+    chunks = []
+    while end > start:
+        chunks.append((max(start, end - span), end))
+        end -= span
+    return chunks
+
+
+def intraday_frame(df):
+    """Normalize an upstream intraday frame: naive UTC index, float32 BAR_COLUMNS"""
+    df = df.dropna(subset=['Close'])
+    index = df.index
+    index = index.tz_convert('UTC').tz_localize(None) if index.tz is not None else index
+    df = df.set_axis(index.rename('Datetime'))
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df.reindex(columns=BAR_COLUMNS).fillna({'Volume': 0}).astype(BAR_DTYPE)
+
+
+def align_asof(index, series, max_gap):
+    """
+    Latest value of series at or before each time in index, NaN when that
+    value is more than max_gap old (the time-based align_series)
+    """
+    times = series.index.to_numpy(dtype='datetime64[ns]')
+    wanted = index.to_numpy(dtype='datetime64[ns]')
+    positions = np.searchsorted(times, wanted, side='right') - 1
+    values = series.to_numpy(dtype=np.float64)[positions.clip(min=0)]
+    too_old = (positions < 0) | (wanted - times[positions.clip(min=0)] > max_gap.to_timedelta64())
+    return pd.Series(np.where(too_old, np.nan, values), index=index)
+
+
+class IntradayBars:
+    """
+    Fixed-capacity bar buffer for one symbol and interval
+
+    Preallocated float32 columns plus second-resolution timestamps, so a
+    year of 15-minute bars is a fixed ~1 MB however often it is refreshed
+    (~1.7 MB as a float64 frame). Bars more than `days` older than the
+    latest one are dropped.
+    """
+
+    def __init__(self, interval, days=INTRADAY_DAYS):
+        self.interval = interval
+        self.days = days
+        self.capacity = bar_capacity(interval, days)
+        self.times = np.zeros(self.capacity, dtype=TIME_DTYPE)
+        self.values = np.zeros((self.capacity, len(BAR_COLUMNS)), dtype=BAR_DTYPE)
+        self.rows = 0
+        # Oldest time a backfill has been asked for (like the price store's requested_from)
+        self.requested_from = None
+        self._lock = threading.Lock()
+
+    @property
+    def last(self):
+        return pd.Timestamp(self.times[self.rows - 1]) if self.rows else None
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    def merge(self, df):
+        """
+        Add the bars of a normalized frame; bars already stored for the same
+        time are replaced (the latest one is provisional). Returns how many
+        new times were added.
+        """
+        if df.empty:
+            return 0
+        times = df.index.to_numpy(dtype=TIME_DTYPE)
+        values = df.to_numpy(dtype=BAR_DTYPE)
+        with self._lock:
+            stored = self.times[:self.rows]
+            keep = ~np.isin(stored, times)
+            merged_times = np.concatenate([stored[keep], times])
+            merged_values = np.concatenate([self.values[:self.rows][keep], values])
+
+            order = np.argsort(merged_times, kind='stable')
+            cutoff = merged_times[order[-1]] - np.timedelta64(self.days, 'D')
+            order = order[merged_times[order] >= cutoff][-self.capacity:]
+
+            rows = len(order)
+            self.times[:rows] = merged_times[order]
+            self.values[:rows] = merged_values[order]
+            added = len(merged_times) - self.rows
+            self.rows = rows
+        return added
+
+    def frame(self, start=None):
+        """Bars at or after start as a float32 DataFrame (a copy), or None if there are none"""
+        with self._lock:
+            first = 0
+            if start is not None:
+                first = int(np.searchsorted(self.times[:self.rows], np.datetime64(pd.Timestamp(start), 's')))
+            if first >= self.rows:
+                return None
+            times = self.times[first:self.rows].astype('datetime64[ns]')
+            values = self.values[first:self.rows].copy()
+        return pd.DataFrame(values, index=pd.DatetimeIndex(times, name='Datetime'), columns=BAR_COLUMNS)
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'capacity': self.capacity,
+            'bytes': self.nbytes,
+            'first': str(pd.Timestamp(self.times[0])) if self.rows else None,
+            'last': str(self.last) if self.rows else None
+        }
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import shutil
+import threading
+import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Where daily bars are persisted between runs; empty disables the store
+PRICE_STORE_DIR = os.getenv("SONA_PRICE_STORE", "data/prices")
+
+DATE_DTYPE = np.dtype('<i8')  # days since 1970-01-01
+
+
+def _day_numbers(index):
+    return index.to_numpy(dtype='datetime64[D]').astype(DATE_DTYPE)
+
+
+class PriceStore:
+    """
+    Append-only columnar store of daily bars, one directory per symbol
+
+    data/prices/<symbol>/
+      Date.bin, Open.bin, ...   one raw little-endian array per column
+      meta.json                 column dtypes and the committed row count
+
+    Appends write the column files first and only become visible when
+    meta.json is atomically replaced, so a crash mid-append leaves the
+    previous rows readable (the uncommitted tail is truncated next time).
+    Reads memory-map the files and copy out just the requested window.
+    The latest bar is provisional (today's session): its values are also
+    kept in meta.json and override the last row on read, so rewriting it
+    in place is covered by the same atomic commit.
+    """
+
+    def __init__(self, root=PRICE_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()  # one writer per process
+
+    def symbol_dir(self, symbol):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9.-]', '_', symbol))
+
+    def meta(self, symbol):
+        try:
+            with open(os.path.join(self.symbol_dir(symbol), "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def last_date(self, symbol):
+        meta = self.meta(symbol)
+        return pd.Timestamp(meta['last']) if meta and meta['rows'] else None
+
+    def read(self, symbol, start=None):
+        """Stored bars on or after start as a DataFrame, or None if there are none"""
+        meta = self.meta(symbol)
+        if not meta or not meta['rows']:
+            return None
+
+        directory = self.symbol_dir(symbol)
+        rows = meta['rows']
+        dates = np.memmap(os.path.join(directory, "Date.bin"), dtype=DATE_DTYPE, mode='r', shape=(rows,))
+        first = 0
+        if start is not None:
+            first = int(np.searchsorted(dates, _day_numbers(pd.DatetimeIndex([start]))[0]))
+        if first >= rows:
+            return None
+
+        data = {}
+        for name, dtype in meta['columns']:
+            column = np.memmap(os.path.join(directory, f"{name}.bin"), dtype=np.dtype(dtype), mode='r', shape=(rows,))
+            data[name] = np.array(column[first:])
+        # The committed provisional bar wins over a half-rewritten last row
+        for name, value in (meta.get('tail') or {}).items():
+            data[name][-1] = value
+        index = pd.DatetimeIndex(np.array(dates[first:]).astype('datetime64[D]').astype('datetime64[ns]'), name='Date')
+        return pd.DataFrame(data, index=index)
+
+    def write(self, symbol, df, requested_from=None):
+        """Replace a symbol's history with df (used for the first sync and backfills)"""
+        with self._lock:
+            directory = self.symbol_dir(symbol)
+            staging = f"{directory}.staging"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+
+            columns = [(name, np.dtype(df[name].dtype).newbyteorder('<').str) for name in df.columns]
+            self._write_column(os.path.join(staging, "Date.bin"), _day_numbers(df.index), 0, 0)
+            for name, dtype in columns:
+                self._write_column(os.path.join(staging, f"{name}.bin"), df[name].to_numpy(dtype=dtype), 0, 0)
+            self._commit(staging, columns, len(df), df.index[0], df.index[-1], requested_from, df)
+
+            # Directories can't be renamed over each other; readers see no data for an instant
+            old = f"{directory}.old"
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.isdir(directory):
+                os.rename(directory, old)
+            os.rename(staging, directory)
+            shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"Stored {len(df)} bars for {symbol}")
+
+    def append(self, symbol, df, requested_from=None):
+        """Add bars newer than the last stored one; returns how many rows were appended"""
+        meta = self.meta(symbol)
+        if not meta or not meta['rows']:
+            self.write(symbol, df, requested_from)
+            return len(df)
+
+        with self._lock:
+            directory = self.symbol_dir(symbol)
+            columns = [tuple(c) for c in meta['columns']]
+            if [name for name, _ in columns] != list(df.columns):
+                raise ValueError(f"Column layout changed for {symbol}")
+
+            rows = meta['rows']
+            last = pd.Timestamp(meta['last'])
+            new = df[df.index > last]
+            tail = df[df.index == last]
+
+            # Provisional latest bar: overwrite in place with the newer value.
+            # Until the commit below, readers get the old one from meta's tail.
+            # Once newer bars bury it, the committed tail is made permanent
+            replacement = tail
+            if not len(tail) and len(new) and meta.get('tail'):
+                replacement = pd.DataFrame([meta['tail']])
+            if len(replacement):
+                for name, dtype in columns:
+                    self._write_column(os.path.join(directory, f"{name}.bin"),
+                                       replacement[name].to_numpy(dtype=dtype)[-1:], rows - 1, rows)
+
+            if len(new):
+                self._write_column(os.path.join(directory, "Date.bin"), _day_numbers(new.index), rows, rows)
+                for name, dtype in columns:
+                    self._write_column(os.path.join(directory, f"{name}.bin"), new[name].to_numpy(dtype=dtype), rows, rows)
+
+            latest = new if len(new) else tail
+            self._commit(directory, columns, rows + len(new), pd.Timestamp(meta['first']),
+                         new.index[-1] if len(new) else last, requested_from or meta.get('requested_from'),
+                         latest if len(latest) else None, meta.get('tail'))
+            return len(new)
+
+    @staticmethod
+    def _write_column(path, values, offset_rows, committed_rows):
+        """Write values at row offset_rows, first dropping anything past committed_rows"""
+        values = np.ascontiguousarray(values)
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        with open(path, mode) as f:
+            f.truncate(committed_rows * values.itemsize)
+            f.seek(offset_rows * values.itemsize)
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _commit(directory, columns, rows, first, last, requested_from, tail=None, previous_tail=None):
+        """Atomically publish rows; the last bar of the `tail` frame is recorded (None keeps previous_tail)"""
+        if tail is not None:
+            tail = dict((name, tail[name].to_numpy(dtype=dtype)[-1].item()) for name, dtype in columns)
+        meta = {
+            'columns': columns,
+            'rows': rows,
+            'first': first.date().isoformat(),
+            'last': last.date().isoformat(),
+            'requested_from': pd.Timestamp(requested_from).date().isoformat() if requested_from is not None else None,
+            'tail': tail if tail is not None else previous_tail,
+            'synced_at': datetime.now().isoformat()
+        }
+        tmp = os.path.join(directory, "meta.json.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    def stats(self):
+        """Per-symbol row counts and date range, for diagnostics"""
+        if not os.path.isdir(self.root):
+            return {}
+        stats = {}
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name, "meta.json")
+            if not name.endswith(('.staging', '.old')) and os.path.exists(path):
+                with open(path) as f:
+                    meta = json.load(f)
+                stats[name] = {'rows': meta['rows'], 'first': meta['first'], 'last': meta['last']}
+        return stats
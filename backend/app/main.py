@@ -1,11 +1,52 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+
+import os
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import predictions
+from app.routes import predictions, stream
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cold start budget: import until the app accepts requests (liveness)
+COLD_START_TARGET_MS = float(os.getenv("SONA_COLD_START_TARGET_MS", "1500"))
+
+startup = {'serving_ms': None, 'ready_ms': None}
+
+def _elapsed_ms():
+    return round((time.perf_counter() - _import_started) * 1000, 1)
+
+def _mark_ready():
+    startup['ready_ms'] = _elapsed_ms()
+    logger.info(f"Models and snapshots warm after {startup['ready_ms']} ms")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models and build the per-metal base forecasts off the startup path,
+    # so liveness is served immediately and readiness flips once they are warm
+    predictions.snapshots.warm_in_background(on_done=_mark_ready)
+    if predictions.scheduler.interval and not predictions.SHARED:
+        predictions.scheduler.start()
+    stream.hub.start()
+    
+    startup['serving_ms'] = _elapsed_ms()
+    if startup['serving_ms'] > COLD_START_TARGET_MS:
+        logger.warning(f"Cold start {startup['serving_ms']} ms exceeds target {COLD_START_TARGET_MS} ms")
+    else:
+        logger.info(f"Cold start {startup['serving_ms']} ms (target {COLD_START_TARGET_MS} ms)")
+    yield
+    await stream.hub.stop()
+    predictions.scheduler.stop()
+    predictions.executor.shutdown()
 
 app = FastAPI(
     title="Sona-AI API",
     description="AI-Powered Gold & Silver Price Prediction API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -19,6 +60,29 @@ app.add_middleware(
 
 # Include routes
 app.include_router(predictions.router, prefix="/api", tags=["predictions"])
+app.include_router(stream.router, prefix="/api", tags=["stream"])
+
+def _metal_label(request):
+    metal = request.query_params.get('metal', '')
+    return metal if metal in ('gold', 'silver') else ''
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (not the raw path) keeps label cardinality bounded
+        route = request.scope.get('route')
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            route=getattr(route, 'path', 'unmatched'),
+            metal=_metal_label(request),
+            status=status
+        )
 
 @app.get("/")
 async def root():
@@ -30,4 +94,28 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "sona-ai-api"}
\ No newline at end of file
+    return {"status": "healthy", "service": "sona-ai-api"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/health/live")
+async def liveness():
+    """Process is up and the event loop is responsive"""
+    return {"status": "alive", "cold_start_ms": startup['serving_ms']}
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Models are loaded and every metal has a servable snapshot"""
+    metals = dict((m, predictions.snapshots.ready(m)) for m in ['gold', 'silver'])
+    loaded = predictions.serving_model_version() is not None
+    ready = loaded and all(metals.values())
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "warming",
+        "models_loaded": loaded,
+        "snapshots": metals,
+        "ready_ms": startup['ready_ms']
+    }
\ No newline at end of file
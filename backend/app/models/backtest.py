@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.models.scaler import FeatureScaler
+from app.models.training import HORIZONS, MODEL_PARAMS, horizons_xy, thread_budget, TRAIN_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Walk-forward layout: first fit on this share of the rows, then refit every
+# `step` rows on the expanding window and predict the next block in one call
+INITIAL_FRACTION = 0.5
+MIN_TRAIN_ROWS = 60
+BACKTEST_STEP = int(os.getenv("SONA_BACKTEST_STEP", "20"))
+
+
+def fit_predict_block(X_train, Y_train, X_eval, n_jobs=1, params=None):
+    """Fit one model on a training window and predict a whole evaluation block (rows x horizons)"""
+    from xgboost import XGBRegressor
+
+    scaler = FeatureScaler.fit(X_train)
+    model = XGBRegressor(n_jobs=n_jobs, **{**MODEL_PARAMS, **(params or {})})
+    model.fit(scaler.transform(X_train), Y_train)
+    predicted = model.get_booster().inplace_predict(scaler.transform(X_eval))
+    return predicted.reshape(len(X_eval), -1)
+
+
+def walk_forward_folds(n_rows, horizon, step=BACKTEST_STEP, initial=None):
+    """
+    (train_end, eval_start, eval_end) row bounds for an expanding window
+
+    Training stops `horizon` rows before the evaluation block, so no training
+    target is later than the first evaluated bar (no look-ahead).
+    """
+    initial = initial or max(MIN_TRAIN_ROWS, int(n_rows * INITIAL_FRACTION))
+    folds = []
+    for eval_start in range(initial, n_rows, step):
+        train_end = eval_start - horizon + 1
+        if train_end < MIN_TRAIN_ROWS // 2:
+            continue
+        folds.append((train_end, eval_start, min(eval_start + step, n_rows)))
+    return folds
+
+
+def error_stats(current, predicted, actual):
+    """MAE, MAPE (%) and directional hit rate (%) over aligned arrays"""
+    errors = predicted - actual
+    hits = np.sign(predicted - current) == np.sign(actual - current)
+    return {
+        'mae': round(float(np.mean(np.abs(errors))), 4),
+        'mape': round(float(np.mean(np.abs(errors) / actual) * 100), 4),
+        'hit_rate': round(float(np.mean(hits) * 100), 2),
+        'points': int(len(actual))
+    }
+
+
+def backtest(features, horizons=HORIZONS, step=BACKTEST_STEP, params=None, max_workers=TRAIN_WORKERS):
+    """
+    Walk-forward backtest of the multi-horizon model on a featurized history
+
+    Each fold is one fit predicting every horizon; training stops short of
+    the longest horizon. Returns ({horizon: stats}, timings). Folds are
+    independent, so their fits run in a process pool budgeted the same way
+    as training.
+    """
+    started = time.perf_counter()
+    X, Y = horizons_xy(features, horizons)
+    X = X.to_numpy(dtype=np.float64)
+    Y = Y.to_numpy(dtype=np.float64)
+    close = X[:, list(features.columns).index('Close')]
+    folds = walk_forward_folds(len(X), max(horizons), step)
+
+    workers, n_jobs = thread_budget(len(folds), max_workers)
+    if workers == 1:
+        predictions = [fit_predict_block(X[:t], Y[:t], X[a:b], n_jobs, params) for t, a, b in folds]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(fit_predict_block, X[:t], Y[:t], X[a:b], n_jobs, params) for t, a, b in folds]
+            predictions = [f.result() for f in futures]
+
+    results = {}
+    if folds:
+        predicted = np.concatenate(predictions)
+        actual = np.concatenate([Y[a:b] for _, a, b in folds])
+        current = np.concatenate([close[a:b] for _, a, b in folds])
+        for i, horizon in enumerate(horizons):
+            results[horizon] = error_stats(current, predicted[:, i], actual[:, i])
+            results[horizon]['folds'] = len(folds)
+
+    timings = {'fits': len(folds), 'workers': workers, 'seconds': round(time.perf_counter() - started, 3)}
+    return results, timings
+
+
+def confidence_from(stats):
+    """Confidence served to clients: the backtested directional hit rate"""
+    return int(round(stats['hit_rate']))
@@ -0,0 +1,306 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+from app.data.intraday import INTERVALS
+from app.utils.metrics import STAGE_SECONDS
+
+# Columns added by create_features, in the order it adds them
+FEATURE_COLUMNS = [
+    'MA_7', 'MA_14', 'MA_30',
+    'Volatility_7', 'Volatility_14',
+    'Returns_1', 'Returns_7',
+    'RSI',
+    'BB_middle', 'BB_std', 'BB_upper', 'BB_lower'
+]
+
+MEAN_WINDOWS = [7, 14, 20, 30]
+RSI_WINDOW = 14
+RETURN_LAGS = [1, 7]
+
+
+def create_features(df, interval='1d'):
+    """
+    Create technical indicators and features
+
+    Daily windows count bars (trading days). Intraday windows (interval
+    '1h' / '15m') are spans of time, e.g. MA_7 is the mean over the last
+    7 hours of 1h bars, however many bars the session gaps leave in it.
+    """
+    with STAGE_SECONDS.time(stage='create_features'):
+        if interval == '1d':
+            return _create_features(df)
+        return _create_intraday_features(df, INTERVALS[interval]['step'])
+
+
+def _create_features(df):
+    df = df.copy()
+
+    # Moving averages
+    df['MA_7'] = df['Close'].rolling(window=7).mean()
+    df['MA_14'] = df['Close'].rolling(window=14).mean()
+    df['MA_30'] = df['Close'].rolling(window=30).mean()
+
+    # Volatility
+    df['Volatility_7'] = df['Close'].rolling(window=7).std()
+    df['Volatility_14'] = df['Close'].rolling(window=14).std()
+
+    # Price momentum
+    df['Returns_1'] = df['Close'].pct_change(1)
+    df['Returns_7'] = df['Close'].pct_change(7)
+
+    # RSI
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+
+    # Bollinger Bands
+    df['BB_middle'] = df['Close'].rolling(window=20).mean()
+    df['BB_std'] = df['Close'].rolling(window=20).std()
+    df['BB_upper'] = df['BB_middle'] + (2 * df['BB_std'])
+    df['BB_lower'] = df['BB_middle'] - (2 * df['BB_std'])
+
+    # Only the warm-up rows go; gaps in exogenous columns are left to XGBoost
+    return df.dropna(subset=FEATURE_COLUMNS)
+
+
+def _create_intraday_features(df, step):
+    """create_features over time windows of `step` units; float32 features"""
+    df = df.copy()
+    close = df['Close'].astype(np.float64)
+
+    def rolling(series, bars):
+        # A window needs half its bars, so a session break shortens it
+        # instead of dropping the rows after it
+        return series.rolling(step * bars, min_periods=max(2, bars // 2))
+
+    def lagged_return(bars):
+        # Against the latest close at or before `bars` steps ago
+        times = df.index.to_numpy(dtype='datetime64[ns]')
+        positions = np.searchsorted(times, times - (step * bars).to_timedelta64(), side='right') - 1
+        prior = np.where(positions >= 0, close.to_numpy()[positions.clip(min=0)], np.nan)
+        return close.to_numpy() / prior - 1
+
+    features = pd.DataFrame(index=df.index)
+    for window in [7, 14, 30]:
+        features[f'MA_{window}'] = rolling(close, window).mean()
+    for window in [7, 14]:
+        features[f'Volatility_{window}'] = rolling(close, window).std()
+    for lag in RETURN_LAGS:
+        features[f'Returns_{lag}'] = lagged_return(lag)
+
+    delta = close.diff()
+    gain = rolling(delta.where(delta > 0, 0), RSI_WINDOW).mean()
+    loss = rolling(-delta.where(delta < 0, 0), RSI_WINDOW).mean()
+    features['RSI'] = 100 - (100 / (1 + gain / loss))
+
+    features['BB_middle'] = rolling(close, 20).mean()
+    features['BB_std'] = rolling(close, 20).std()
+    features['BB_upper'] = features['BB_middle'] + (2 * features['BB_std'])
+    features['BB_lower'] = features['BB_middle'] - (2 * features['BB_std'])
+
+    # Computed in float64 (rolling sums lose precision in float32), kept compact
+    df[FEATURE_COLUMNS] = features[FEATURE_COLUMNS].astype(np.float32)
+    return df.dropna(subset=FEATURE_COLUMNS)
+
+
+class _RollingWindow:
+    """Running sum / sum of squares over the last `size` values"""
+
+    def __init__(self, size, shift):
+        self.size = size
+        self.shift = shift  # values are centred on this to keep sums small
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nonzero = 0
+        self._since_resync = 0
+
+    def push(self, value):
+        v = value - self.shift
+        self.values.append(v)
+        self.total += v
+        self.total_sq += v * v
+        self.nonzero += v != 0
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+            self.nonzero -= old != 0
+        self._resync()
+
+    def replace_last(self, value):
+        """Swap the newest value for another (a revised provisional bar)"""
+        v = value - self.shift
+        old = self.values.pop()
+        self.values.append(v)
+        self.total += v - old
+        self.total_sq += v * v - old * old
+        self.nonzero += (v != 0) - (old != 0)
+        self._resync()
+
+    def _resync(self):
+        self._since_resync += 1
+        # Re-sum exactly once per window so float error never accumulates;
+        # amortised this is still O(1) per update
+        if self._since_resync >= self.size:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(x * x for x in self.values)
+            self._since_resync = 0
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        if not self.full:
+            return math.nan
+        if self.nonzero == 0:
+            return self.shift  # exact, so an all-zero loss window gives RSI 100
+        return self.total / self.size + self.shift
+
+    def std(self):
+        if not self.full:
+            return math.nan
+        n = self.size
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+
+class RollingFeatureState:
+    """
+    Incremental version of create_features
+
+    Keeps running window sums so each new bar is an O(1) update, and
+    row() returns the same feature vector as the last row of
+    create_features(df) for the same bars.
+    """
+
+    def __init__(self, columns, shift=0.0):
+        self.columns = list(columns)
+        self.shift = shift
+        self.means = dict((w, _RollingWindow(w, shift)) for w in MEAN_WINDOWS)
+        self.gains = _RollingWindow(RSI_WINDOW, 0.0)
+        self.losses = _RollingWindow(RSI_WINDOW, 0.0)
+        self.closes = deque(maxlen=max(RETURN_LAGS) + 1)
+        self.last_bar = None
+        self.last_index = None
+        self.count = 0
+
+    @classmethod
+    def from_frame(cls, df):
+        """Seed the state from a raw (un-featurized) history frame"""
+        state = cls(df.columns, shift=float(df['Close'].iloc[0]))
+        for index, values in zip(df.index, df.to_numpy(dtype=np.float64)):
+            state.update(index, values)
+        return state
+
+    def update(self, index, values):
+        """Push one bar (values ordered like self.columns)"""
+        values = np.asarray(values, dtype=np.float64)
+        close = float(values[self.columns.index('Close')])
+
+        if self.closes:
+            delta = close - self.closes[-1]
+        else:
+            delta = 0.0  # pandas treats the first (NaN) diff as 0 gain / 0 loss
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+
+        for window in self.means.values():
+            window.push(close)
+        self.closes.append(close)
+
+        self.last_bar = values
+        self.last_index = index
+        self.count += 1
+
+    def replace_last(self, values):
+        """
+        Replace the latest bar with a revised one for the same index (today's
+        provisional bar moved); O(1) like update()
+        """
+        values = np.asarray(values, dtype=np.float64)
+        close = float(values[self.columns.index('Close')])
+
+        if len(self.closes) > 1:
+            delta = close - self.closes[-2]
+        else:
+            delta = 0.0
+        self.gains.replace_last(delta if delta > 0 else 0.0)
+        self.losses.replace_last(-delta if delta < 0 else 0.0)
+
+        for window in self.means.values():
+            window.replace_last(close)
+        self.closes[-1] = close
+        self.last_bar = values
+
+    def extend(self, df):
+        """Push every bar of df that is newer than the last one seen"""
+        new = df[df.index > self.last_index] if self.last_index is not None else df
+        for index, values in zip(new.index, new.to_numpy(dtype=np.float64)):
+            self.update(index, values)
+        return len(new)
+
+    def matches(self, df):
+        """
+        True when df agrees with the state up to its last bar (so extend() is
+        valid); the recent closes kept for the returns are compared
+        """
+        return self._agrees(df, len(self.closes))
+
+    def matches_before_last(self, df):
+        """
+        True when df agrees with the state up to the bar before its last one,
+        i.e. only the latest (provisional) bar was revised, so replace_last()
+        is valid
+        """
+        return len(self.closes) > 1 and self._agrees(df, len(self.closes) - 1)
+
+    def _agrees(self, df, compared):
+        if self.last_index is None or self.last_index not in df.index or list(df.columns) != self.columns:
+            return False
+        position = df.index.get_loc(self.last_index)
+        stored = list(self.closes)[:compared]
+        end = position + 1 - (len(self.closes) - compared)
+        if end < len(stored):
+            return False
+        return df['Close'].iloc[end - len(stored):end].tolist() == stored
+
+    @property
+    def ready(self):
+        return self.count >= max(MEAN_WINDOWS) and not np.isnan(self.features()).any()
+
+    def features(self):
+        closes = self.closes
+        returns = []
+        for lag in RETURN_LAGS:
+            if len(closes) > lag:
+                returns.append(closes[-1] / closes[-1 - lag] - 1)
+            else:
+                returns.append(math.nan)
+
+        gain = self.gains.mean()
+        loss = self.losses.mean()
+        if loss == 0:
+            rs = math.inf if gain > 0 else math.nan
+        else:
+            rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+
+        bb_middle = self.means[20].mean()
+        bb_std = self.means[20].std()
+
+        return np.array([
+            self.means[7].mean(), self.means[14].mean(), self.means[30].mean(),
+            self.means[7].std(), self.means[14].std(),
+            returns[0], returns[1],
+            rsi,
+            bb_middle, bb_std, bb_middle + 2 * bb_std, bb_middle - 2 * bb_std
+        ])
+
+    def row(self):
+        """Feature row for the latest bar, shape (1, n_features)"""
+        return np.concatenate([self.last_bar, self.features()])[None, :]
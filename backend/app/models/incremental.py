@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from app.models.scaler import FeatureScaler
+from app.models.training import (
+    METALS, MODEL_PARAMS, TRAINING_DAYS, horizons_xy, fit_metal, mark_trained, train_all
+)
+from app.models.features import create_features
+
+logger = logging.getLogger(__name__)
+
+# Boosting rounds added per incremental update, and how many of the most
+# recent labelled rows each update trains on (at least all the new ones).
+# Much shorter windows chase the last few weeks and lose accuracy
+INCREMENTAL_ROUNDS = int(os.getenv("SONA_INCREMENTAL_ROUNDS", "10"))
+INCREMENTAL_WINDOW = int(os.getenv("SONA_INCREMENTAL_WINDOW", "250"))
+
+# Fall back to a full refit once a model has this many trees, or when the
+# recent window's feature means sit this many (training) standard
+# deviations away from what the scaler was fitted on
+MAX_TREES = int(os.getenv("SONA_MAX_TREES", "400"))
+DRIFT_THRESHOLD = float(os.getenv("SONA_DRIFT_THRESHOLD", "3"))
+
+
+def new_rows(booster, X):
+    """Labelled rows newer than the booster's last training row"""
+    through = booster.attr('trained_through')
+    if through is None:
+        return len(X)
+    return int((X.index > pd.Timestamp(through)).sum())
+
+
+def drift_score(scaler, X):
+    """Largest |mean shift| of the recent window, in training standard deviations"""
+    window = scaler.transform(X.iloc[-INCREMENTAL_WINDOW:])
+    with np.errstate(all='ignore'):
+        shift = np.abs(np.nanmean(window, axis=0))
+    shift = shift[np.isfinite(shift)]
+    return float(shift.max()) if len(shift) else 0.0
+
+
+def refit_reason(booster, X):
+    """Why this update must be a full refit, or None when warm-starting is fine"""
+    if booster is None:
+        return 'no_model'
+    if booster.attr('trained_through') is None:
+        return 'untracked'
+    scaler = FeatureScaler.from_booster(booster)
+    if scaler.feature_names != list(X.columns):
+        return 'features_changed'
+    if booster.num_boosted_rounds() + INCREMENTAL_ROUNDS > MAX_TREES:
+        return 'tree_cap'
+    if drift_score(scaler, X) > DRIFT_THRESHOLD:
+        return 'drift'
+    return None
+
+
+def fit_incremental(booster, X, Y, n_jobs=None, params=None):
+    """
+    Continue boosting an existing model on the recent window
+    The booster's own scaler is kept (its trees split on those scaled
+    values); the served booster is not modified. Returns (booster, seconds).
+    """
+    from xgboost import XGBRegressor
+
+    start = time.perf_counter()
+    scaler = FeatureScaler.from_booster(booster)
+    rows = max(INCREMENTAL_WINDOW, new_rows(booster, X))
+    X, Y = X.iloc[-rows:], Y.iloc[-rows:]
+
+    model = XGBRegressor(n_jobs=n_jobs, **{**MODEL_PARAMS, **(params or {}), 'n_estimators': INCREMENTAL_ROUNDS})
+    model.fit(scaler.transform(X), Y, xgb_model=booster)
+    updated = mark_trained(scaler.attach(model.get_booster()), X)
+    return updated, time.perf_counter() - start
+
+
+def train_incremental(fetcher, models, metals=None, params=None):
+    """
+    Warm-start update of each metal's model from `models` ({metal: booster})
+
+    Metals without new labelled rows are skipped; those that need a full
+    refit (no model, tree cap, drift) go through train_all. Returns
+    ({metal: booster}, report) like train_all, with report['incremental']
+    describing what happened per metal. params ({metal: overrides}) are
+    the metal's tuned values, used for the added trees and any full refit.
+    """
+    params = params or {}
+    started = time.perf_counter()
+    report = {'incremental': {}, 'errors': {}}
+    trained, full = {}, []
+
+    for metal in metals or METALS:
+        booster = models.get(metal)
+        try:
+            df = fetcher.get_historical_data(metal, days=TRAINING_DAYS, for_training=True)
+            if df is None or len(df) < 100:
+                raise ValueError(f"Insufficient data for {metal}")
+            X, Y = horizons_xy(create_features(df))
+
+            reason = refit_reason(booster, X)
+            if reason is not None:
+                full.append(metal)
+                report['incremental'][metal] = {'mode': 'full', 'reason': reason}
+                continue
+
+            added = new_rows(booster, X)
+            if added == 0:
+                report['incremental'][metal] = {'mode': 'skipped', 'reason': 'no_new_rows'}
+                continue
+
+            trained[metal], seconds = fit_incremental(booster, X, Y, params=params.get(metal))
+            report['incremental'][metal] = {
+                'mode': 'incremental',
+                'new_rows': added,
+                'trees': trained[metal].num_boosted_rounds(),
+                'seconds': round(seconds, 3)
+            }
+        except Exception as e:
+            logger.error(f"Incremental update failed for {metal}: {str(e)}")
+            report['errors'][metal] = str(e)
+
+    if full:
+        refit, full_report = train_all(fetcher, full, params=params)
+        trained.update(refit)
+        report['full'] = full_report
+        report['errors'].update(full_report['errors'])
+
+    report['total'] = round(time.perf_counter() - started, 3)
+    return trained, report
+
+
+def compare_with_full(features, days=20, step=1, params=None):
+    """
+    Replay `days` of daily incremental updates and compare them with one full refit
+
+    Both end up trained on the same rows and are scored on the `days` rows
+    that follow (the replay applies the same tree-cap / drift fallbacks as
+    production). Returns per-horizon MAE for each and the fit times.
+    """
+    X, Y = horizons_xy(features)
+    cutoff = len(X) - days
+    if cutoff - days < 100:
+        raise ValueError("Not enough history to compare")
+
+    booster, _ = fit_metal(X.iloc[:cutoff - days], Y.iloc[:cutoff - days], params=params)
+    t = time.perf_counter()
+    modes = {'incremental': 0, 'full': 0}
+    for end in range(cutoff - days + step, cutoff + 1, step):
+        X_seen, Y_seen = X.iloc[:end], Y.iloc[:end]
+        if refit_reason(booster, X_seen) is None:
+            booster, _ = fit_incremental(booster, X_seen, Y_seen, params=params)
+            modes['incremental'] += 1
+        else:
+            booster, _ = fit_metal(X_seen, Y_seen, params=params)
+            modes['full'] += 1
+    incremental_seconds = time.perf_counter() - t
+
+    t = time.perf_counter()
+    reference, _ = fit_metal(X.iloc[:cutoff], Y.iloc[:cutoff], params=params)
+    full_seconds = time.perf_counter() - t
+
+    X_eval, Y_eval = X.iloc[cutoff:], Y.iloc[cutoff:].to_numpy()
+    results = {}
+    for name, model in [('incremental', booster), ('full', reference)]:
+        scaler = FeatureScaler.from_booster(model)
+        predicted = model.inplace_predict(scaler.transform(X_eval)).reshape(len(X_eval), -1)
+        results[name] = np.mean(np.abs(predicted - Y_eval), axis=0)
+
+    return {
+        'eval_rows': len(X_eval),
+        'updates': modes,
+        'mae_incremental': [round(float(v), 4) for v in results['incremental']],
+        'mae_full': [round(float(v), 4) for v in results['full']],
+        'mae_change_pct': round(float((results['incremental'].mean() / results['full'].mean() - 1) * 100), 2),
+        'seconds_per_update': round(incremental_seconds / max(1, sum(modes.values())), 3),
+        'seconds_full_refit': round(full_seconds, 3)
+    }
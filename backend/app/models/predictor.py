@@ -1,210 +1,371 @@
 import os
-import joblib
+import threading
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 from app.data.fetcher import MarketDataFetcher
-from xgboost import XGBRegressor
-from sklearn.preprocessing import StandardScaler
+from app.models.features import FEATURE_COLUMNS, RollingFeatureState, create_features
+from app.models.registry import ModelRegistry
+from app.models.backtest import backtest, confidence_from
+from app.models.incremental import train_incremental
+from app.models.tuning import tune_all
+from app.models.simulation import band_seed, daily_sigma, regime_sigma, simulate_bands, standardized_returns
+from app.models.training import METALS, HORIZONS, build_dataset, horizons_xy, fit_metal, train_all
+from app.utils.metrics import STAGE_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Walk-forward backtest every retrained metal so confidence reflects real accuracy
+BACKTEST_ON_RETRAIN = os.getenv("SONA_BACKTEST_ON_RETRAIN", "1") == "1"
+
+# Scheduled/cron retrains: "full" refits from scratch, "incremental" keeps
+# boosting the active models on the new bars (with full-refit fallbacks)
+RETRAIN_MODE = os.getenv("SONA_RETRAIN_MODE", "full")
+
 class PricePredictor:
-    def __init__(self):
-        self.models_dir = "models"
-        self.fetcher = MarketDataFetcher()
-        self.models = {}
-        self.scalers = {}
-        self.load_or_train_models()
+    def __init__(self, models_dir="models", fetcher=None):
+        self.models_dir = models_dir
+        self.fetcher = fetcher or MarketDataFetcher()
+        self.registry = ModelRegistry(models_dir)
+        self.bundle = None  # active ModelBundle; replaced as a whole, never mutated
+        self.feature_states = {}
+        self._load_lock = threading.Lock()
+        self._train_lock = threading.Lock()
+    
+    @property
+    def loaded(self):
+        return self.bundle is not None
+    
+    @property
+    def model_version(self):
+        return self.bundle.version if self.bundle is not None else None
+    
+    @property
+    def models(self):
+        return self.bundle.models if self.bundle is not None else {}
+    
+    @property
+    def scalers(self):
+        return self.bundle.scalers if self.bundle is not None else {}
+    
+    def ensure_models(self):
+        """Load (or train) the models on first use; safe to call from any thread"""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load_or_train_models()
     
     def load_or_train_models(self):
-        """Load existing models or train new ones"""
-        for metal in ['gold', 'silver']:
-            for day in [1, 2, 3]:
-                model_path = f"{self.models_dir}/{metal}_day{day}.pkl"
-                scaler_path = f"{self.models_dir}/{metal}_day{day}_scaler.pkl"
-                
-                if os.path.exists(model_path) and os.path.exists(scaler_path):
-                    self.models[f"{metal}_day{day}"] = joblib.load(model_path)
-                    self.scalers[f"{metal}_day{day}"] = joblib.load(scaler_path)
-                    logger.info(f"Loaded model: {metal}_day{day}")
-                else:
-                    logger.warning(f"Model not found: {metal}_day{day}. Training new model...")
-                    self.train_model(metal, day)
-    
-    def train_model(self, metal, forecast_day):
-        """
-        Train XGBoost model on PURE 24K prices only
-        Purity will be applied AFTER prediction
-        """
-        logger.info(f"Training {metal} model for day {forecast_day} (24K base)")
+        """Load the active registry version, training whatever is missing"""
+        bundle = self.registry.load_active()
+        if bundle is not None:
+            logger.info(f"Loaded model version {bundle.version}: {sorted(bundle.models)}")
+            self.bundle = bundle
         
-        # Fetch historical 24K data (no purity adjustment)
-        df = self.fetcher.get_historical_data(metal, days=365, for_training=True)
+        missing = []
+        for metal in METALS:
+            if metal not in self.models:
+                logger.warning(f"Model not found: {metal}. Training new model...")
+                missing.append(metal)
         
-        if df is None or len(df) < 100:
-            raise ValueError(f"Insufficient data for {metal}")
-        
-        # Feature engineering
-        df = self.create_features(df)
+        if missing:
+            self.train_models(missing)
+    
+    def train_model(self, metal):
+        """
+        Train the multi-horizon XGBoost model on PURE 24K prices only
+        Purity will be applied AFTER prediction
+        """
+        logger.info(f"Training {metal} model for days {HORIZONS[0]}-{HORIZONS[-1]} (24K base)")
         
-        # Prepare target (shift by forecast_day)
-        df[f'target_{forecast_day}'] = df['Close'].shift(-forecast_day)
-        df = df.dropna()
+        # Fetch historical 24K data (no purity adjustment) and build features
+        features = build_dataset(self.fetcher, metal)
         
-        # Split features and target
-        feature_cols = [col for col in df.columns if col not in ['target_1', 'target_2', 'target_3', 'Date']]
-        X = df[feature_cols]
-        y = df[f'target_{forecast_day}']
+        tuning = self.tuning().get(metal)
+        booster, _ = fit_metal(*horizons_xy(features), params=tuning['params'] if tuning else None)
+        self.publish({metal: booster}, model_info={metal: {'tuning': tuning}} if tuning else None)
+    
+    def tuning(self):
+        """Tuned config per metal recorded in the active manifest ({} when untuned)"""
+        manifest = self.bundle.manifest if self.bundle is not None else {}
+        return dict(
+            (metal, info['tuning']) for metal, info in manifest.get('models', {}).items() if 'tuning' in info
+        )
+    
+    def train_models(self, metals=None, incremental=False, tuning=None):
+        """
+        Train one model per metal in parallel, every metal by default
+        incremental=True warm-starts from the active models instead.
+        Each metal uses its tuned config (from `tuning` or the active
+        manifest) when it has one. Returns the timing report
+        """
+        tuning = {**self.tuning(), **(tuning or {})}
+        params = dict((metal, result['params']) for metal, result in tuning.items())
+        if incremental:
+            # Warm starts need the native boosters, whatever engine serves
+            boosters = self.registry.load_boosters(self.model_version)
+            trained, report = train_incremental(self.fetcher, boosters, metals, params)
+        else:
+            trained, report = train_all(self.fetcher, metals, params=params)
         
-        # Scale features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        # A warm-started model keeps its parent's backtest; re-running the
+        # walk-forward would cost a full history's worth of fits again
+        updated = [m for m, info in report.get('incremental', {}).items() if info['mode'] == 'incremental']
+        refit = dict((m, b) for m, b in trained.items() if m not in updated)
+        model_info = self.backtest_models(refit, report, params) if BACKTEST_ON_RETRAIN else {}
+        manifest = self.bundle.manifest if self.bundle is not None else {}
+        for metal in updated:
+            parent_info = manifest.get('models', {}).get(metal, {})
+            if 'backtest' in parent_info:
+                model_info[metal] = {
+                    'backtest': parent_info['backtest'],
+                    'backtest_from': parent_info.get('backtest_from', parent_info.get('trained_in'))
+                }
+        # The config travels with the model, so later retrains keep using it
+        for metal in trained:
+            if metal in tuning:
+                model_info.setdefault(metal, {})['tuning'] = tuning[metal]
         
-        # Train XGBoost model
-        model = XGBRegressor(
-            n_estimators=200,
-            max_depth=5,
-            learning_rate=0.05,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42
-        )
-        model.fit(X_scaled, y)
+        if trained:
+            self.publish(trained, report, model_info)
         
-        # Save model and scaler
-        os.makedirs(self.models_dir, exist_ok=True)
-        joblib.dump(model, f"{self.models_dir}/{metal}_day{forecast_day}.pkl")
-        joblib.dump(scaler, f"{self.models_dir}/{metal}_day{forecast_day}_scaler.pkl")
+        logger.info(f"Training report: {report}")
+        return report
+    
+    def backtest_models(self, trained, report, params=None):
+        """Walk-forward error stats per horizon for each trained metal"""
+        model_info = {}
+        report['backtest'] = {}
+        for metal in trained:
+            try:
+                results, timings = backtest(build_dataset(self.fetcher, metal), params=(params or {}).get(metal))
+            except Exception as e:
+                logger.error(f"Backtest failed for {metal}: {str(e)}")
+                continue
+            report['backtest'][metal] = timings
+            # String keys: the manifest is JSON
+            model_info[metal] = {'backtest': dict((str(day), stats) for day, stats in results.items())}
+            for day, stats in results.items():
+                logger.info(f"Backtest {metal} day {day}: {stats}")
+        return model_info
+    
+    def tune_models(self, metals=None):
+        """
+        Search a config per metal, then retrain and publish with it
+        Returns the tuning and training reports
+        """
+        logger.info("Tuning model hyperparameters...")
+        results, report = tune_all(self.fetcher, metals)
+        for result in results.values():
+            result['tuned_at'] = datetime.now().isoformat()
+        report['results'] = results
         
-        self.models[f"{metal}_day{forecast_day}"] = model
-        self.scalers[f"{metal}_day{forecast_day}"] = scaler
+        training = self.train_models(list(results), tuning=results) if results else {}
+        return {'tuning': report, 'training': training}
+    
+    def publish(self, trained, report=None, model_info=None):
+        """Write trained models as a new registry version and swap to it"""
+        with self._train_lock:
+            version = self.registry.publish(trained, report, parent=self.model_version, model_info=model_info)
+            self.swap(version)
         
-        logger.info(f"✅ Model trained: {metal}_day{forecast_day} (24K base)")
+        for key in trained:
+            logger.info(f"✅ Model trained: {key} (24K base)")
+        return version
+    
+    def swap(self, version):
+        """Load a version fully, then serve it with a single reference switch"""
+        bundle = self.registry.load(version)
+        self.bundle = bundle
+        logger.info(f"Serving model version {bundle.version}")
+    
+    def rollback(self, version=None):
+        """Re-activate an earlier version (the previous one by default)"""
+        with self._train_lock:
+            version = self.registry.rollback(version)
+            self.swap(version)
+        return version
     
     def create_features(self, df):
         """Create technical indicators and features"""
-        df = df.copy()
-        
-        # Moving averages
-        df['MA_7'] = df['Close'].rolling(window=7).mean()
-        df['MA_14'] = df['Close'].rolling(window=14).mean()
-        df['MA_30'] = df['Close'].rolling(window=30).mean()
-        
-        # Volatility
-        df['Volatility_7'] = df['Close'].rolling(window=7).std()
-        df['Volatility_14'] = df['Close'].rolling(window=14).std()
-        
-        # Price momentum
-        df['Returns_1'] = df['Close'].pct_change(1)
-        df['Returns_7'] = df['Close'].pct_change(7)
-        
-        # RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        return create_features(df)
+    
+    def latest_data(self, metal):
+        """Fetch the latest 24K history used for prediction"""
+        df = self.fetcher.get_historical_data(metal, days=90, for_training=True)
         
-        # Bollinger Bands
-        df['BB_middle'] = df['Close'].rolling(window=20).mean()
-        df['BB_std'] = df['Close'].rolling(window=20).std()
-        df['BB_upper'] = df['BB_middle'] + (2 * df['BB_std'])
-        df['BB_lower'] = df['BB_middle'] - (2 * df['BB_std'])
+        if df is None or df.empty:
+            raise ValueError(f"Could not fetch data for {metal}")
         
-        return df.dropna()
+        return df
     
-    def predict(self, metal, purity='24K'):
+    def predict_base(self, metal, df=None):
         """
-        Generate predictions for next 7 days
-        1. Predict 24K prices
-        2. Apply purity factor after prediction
+        Generate the 24K base forecast for the next 7 days
+        Purity, unit and city spread are applied later as plain multipliers
         """
-        logger.info(f"Generating predictions for {metal} (will apply {purity} after)")
+        logger.info(f"Generating 24K base predictions for {metal}")
         
-        # Fetch latest 24K data
-        df = self.fetcher.get_historical_data(metal, days=90, for_training=True)
+        self.ensure_models()
         
-        if df is None or df.empty:
-            raise ValueError(f"Could not fetch data for {metal}")
+        if df is None:
+            df = self.latest_data(metal)
         
-        df = self.create_features(df)
+        data_version = self.data_version(df)
         
         # Get current 24K price
-        current_price_24k = float(df['Close'].iloc[-1])
+        current_price = float(df['Close'].iloc[-1])
         
-        # Apply purity to current price
-        current_price = self.fetcher.apply_purity(current_price_24k, metal, purity)
+        # Prepare features for prediction (same row as create_features(df).iloc[-1:])
+        with STAGE_SECONDS.time(stage='features'):
+            latest_features = self.latest_features(metal, df)
+        columns = list(df.columns) + FEATURE_COLUMNS
         
-        logger.info(f"Current {metal} price - 24K: ₹{current_price_24k:.2f}, {purity}: ₹{current_price:.2f} per gram")
+        # Capture the bundle once, so a concurrent swap can't mix versions
+        bundle = self.bundle
         
-        # Prepare features for prediction
-        feature_cols = [col for col in df.columns if col not in ['target_1', 'target_2', 'target_3', 'Date']]
-        latest_features = df[feature_cols].iloc[-1:].values
+        if metal not in bundle.models:
+            logger.warning(f"Model not found for {metal}, training now...")
+            self.train_model(metal)
+            bundle = self.bundle
         
-        forecast = []
+        scaler = bundle.scalers[metal]
+        model = bundle.models[metal]
         
-        # Predict days 1-3 with dedicated models (on 24K prices)
-        for day in range(1, 4):
-            model_key = f"{metal}_day{day}"
-            
-            if model_key not in self.scalers or model_key not in self.models:
-                logger.warning(f"Model not found for {model_key}, training now...")
-                self.train_model(metal, day)
-            
-            scaler = self.scalers[model_key]
-            model = self.models[model_key]
-            
-            X_scaled = scaler.transform(latest_features)
-            predicted_price_24k = float(model.predict(X_scaled)[0])
-            
-            # Apply purity to predicted price
-            predicted_price = self.fetcher.apply_purity(predicted_price_24k, metal, purity)
-            
+        # Every horizon from a single inference call
+        with STAGE_SECONDS.time(stage='scaler_transform'):
+            X_scaled = scaler.transform(self.model_inputs(latest_features, columns, scaler))
+        with STAGE_SECONDS.time(stage='xgb_inference'):
+            predicted = model.inplace_predict(X_scaled).reshape(-1)
+        
+        with STAGE_SECONDS.time(stage='simulation'):
+            simulation = self.simulate(
+                df, latest_features[0], columns, current_price, predicted, band_seed(data_version, bundle.version)
+            )
+        
+        forecast = []
+        for i, (day, predicted_price) in enumerate(zip(HORIZONS, predicted.tolist())):
             trend = ((predicted_price - current_price) / current_price) * 100
-            confidence = 95 - (day * 5)  # Decreasing confidence
+            confidence = self.confidence(bundle, metal, day, self.default_confidence(day))
             
             forecast.append({
                 'day': day,
-                'price': round(predicted_price, 2),
+                'price': predicted_price,
                 'trend': round(trend, 2),
                 'confidence': confidence
             })
+            if simulation is not None:
+                forecast[-1]['band'] = dict((f"p{p}", prices[i]) for p, prices in simulation['bands'].items())
+                forecast[-1]['prob_up'] = round(simulation['prob_up'][i] * 100, 1)
         
-        # For days 4-7, use trend extrapolation
-        last_pred_price = forecast[-1]['price']
-        avg_daily_change = (last_pred_price - current_price) / 3
+        logger.info(f"Generated {len(forecast)} day 24K forecast for {metal}")
         
-        for day in range(4, 8):
-            predicted_price = last_pred_price + (avg_daily_change * (day - 3))
-            trend = ((predicted_price - current_price) / current_price) * 100
-            confidence = max(50, 85 - (day * 5))
-            
+        return {
+            'metal': metal,
+            'current_price': current_price,
+            'forecast': forecast,
+            'data_version': data_version,
+            'model_version': bundle.version,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def predict(self, metal, purity='24K'):
+        """
+        Generate predictions for next 7 days
+        1. Predict 24K prices
+        2. Apply purity factor after prediction
+        """
+        base = self.predict_base(metal)
+        current_price = self.fetcher.apply_purity(base['current_price'], metal, purity)
+        
+        forecast = []
+        for day_pred in base['forecast']:
             forecast.append({
-                'day': day,
-                'price': round(predicted_price, 2),
-                'trend': round(trend, 2),
-                'confidence': confidence
+                'day': day_pred['day'],
+                'price': round(self.fetcher.apply_purity(day_pred['price'], metal, purity), 2),
+                'trend': day_pred['trend'],
+                'confidence': day_pred['confidence']
             })
         
-        logger.info(f"Generated {len(forecast)} day forecast for {metal} ({purity})")
-        
         return {
             'current_price': round(current_price, 2),
             'forecast': forecast,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': base['timestamp']
         }
     
-    def retrain_models(self):
-        """Retrain all models with latest data (24K only)"""
-        logger.info("Starting model retraining (24K base prices)...")
+    @staticmethod
+    def simulate(df, row, columns, current_price, predicted, seed):
+        """
+        Monte Carlo percentile bands around the forecast (None without enough history)
+        Shocks are the recent daily returns, rescaled to the current
+        Volatility_7/14 level (within bounds of their own scale)
+        """
+        returns = standardized_returns(df['Close'].to_numpy())
+        if returns is None:
+            return None
+        shocks, scale = returns
+        sigma = daily_sigma(current_price, row[columns.index('Volatility_7')], row[columns.index('Volatility_14')])
+        return simulate_bands(predicted, current_price, shocks, regime_sigma(sigma, scale), seed=seed)
+    
+    @staticmethod
+    def confidence(bundle, metal, day, default):
+        """Backtested hit rate for one horizon, or the fixed heuristic if it has none"""
+        stats = bundle.manifest.get('models', {}).get(metal, {}).get('backtest', {}).get(str(day))
+        return confidence_from(stats) if stats else default
+    
+    @staticmethod
+    def default_confidence(day):
+        """The original fixed confidence: model days 1-3, then decaying to 50"""
+        return 95 - (day * 5) if day <= 3 else max(50, 85 - (day * 5))
+    
+    @staticmethod
+    def model_inputs(row, columns, scaler):
+        """
+        Reorder a feature row to the columns the scaler was fitted on
+        (a model trained before a column was added uses a subset)
+        """
+        names = scaler.feature_names
+        if not names or names == columns:
+            return row
+        return row[:, [columns.index(name) for name in names]]
+    
+    def latest_features(self, metal, df):
+        """
+        Feature row for the latest bar via the incremental rolling state
+        Only bars newer than the previous call are pushed, and a revised
+        provisional bar (intraday refreshes) is swapped in place; the state
+        is reseeded only when older bars changed
+        """
+        state = self.feature_states.get(metal)
+        if state is not None and state.matches(df):
+            state.extend(df)
+        elif state is not None and state.matches_before_last(df):
+            state.replace_last(df.loc[state.last_index].to_numpy(dtype=np.float64))
+            state.extend(df)
+        else:
+            state = RollingFeatureState.from_frame(df)
+        
+        if not state.ready:
+            raise ValueError(f"Insufficient data for {metal} features")
+        
+        self.feature_states[metal] = state
+        return state.row()
+    
+    @staticmethod
+    def data_version(df):
+        """Identify a data update by its latest bar"""
+        return f"{df.index[-1].isoformat()}:{float(df['Close'].iloc[-1]):.6f}"
+    
+    def retrain_models(self, incremental=None):
+        """Retrain all models with latest data (24K only); mode defaults to SONA_RETRAIN_MODE"""
+        if incremental is None:
+            incremental = RETRAIN_MODE == "incremental"
+        logger.info(f"Starting {'incremental' if incremental else 'full'} model retraining (24K base prices)...")
         
-        for metal in ['gold', 'silver']:
-            for day in [1, 2, 3]:
-                try:
-                    self.train_model(metal, day)
-                except Exception as e:
-                    logger.error(f"Error training {metal} day {day}: {str(e)}")
+        if incremental:
+            self.ensure_models()
+        report = self.train_models(incremental=incremental)
         
-        logger.info("✅ All models retrained")
\ No newline at end of file
+        logger.info("✅ All models retrained")
+        return report
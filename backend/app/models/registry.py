@@ -0,0 +1,307 @@
+import os
+import json
+import shutil
+import logging
+from datetime import datetime
+from app.models.scaler import FeatureScaler
+from app.models.trees import EXPORT_RTOL, INFERENCE_ENGINE, TreeEnsemble, check_export
+
+logger = logging.getLogger(__name__)
+
+# Native XGBoost binary format; loads without unpickling sklearn objects
+MODEL_EXT = "ubj"
+
+# The same trees exported for NumPy evaluation (app.models.trees), next to it
+EXPORT_EXT = "npz"
+
+# How many published versions to keep on disk (the active one is always kept)
+KEEP_VERSIONS = int(os.getenv("SONA_MODEL_KEEP_VERSIONS", "5"))
+
+# Version layout: 2 = one multi-horizon model per metal with its scaler
+# embedded. Versions of the older per-day layout (1) are never served.
+MODEL_FORMAT = 2
+
+
+class ModelBundle:
+    """One immutable, fully-loaded model version; swapped in as a whole"""
+
+    def __init__(self, version, models, scalers, manifest=None):
+        self.version = version
+        self.models = models
+        self.scalers = scalers
+        self.manifest = manifest or {}
+
+
+class ModelRegistry:
+    """
+    Versioned on-disk model store
+
+    models/
+      versions/<version>/{metal}.ubj, {metal}.npz, manifest.json
+      ACTIVE   <- name of the serving version, replaced atomically
+      serving/<pid>   <- version each live process has loaded (kept by prune)
+
+    A version directory is written under a staging name and renamed into
+    place only when complete, so a crash never leaves a half-written version.
+    """
+
+    def __init__(self, root="models"):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.active_path = os.path.join(root, "ACTIVE")
+        # serving/<pid>: the version each live process has loaded, so prune()
+        # never deletes one another worker still serves (or warm-starts from)
+        self.serving_dir = os.path.join(root, "serving")
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def active_version(self):
+        try:
+            with open(self.active_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if version and os.path.isdir(self.version_dir(version)) else None
+
+    def manifest(self, version):
+        with open(os.path.join(self.version_dir(version), "manifest.json")) as f:
+            return json.load(f)
+
+    def compatible(self, version):
+        return self.manifest(version).get('format', 1) == MODEL_FORMAT
+
+    def list_versions(self):
+        """Published versions, oldest first"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(
+            v for v in os.listdir(self.versions_dir)
+            if not v.startswith('.') and os.path.exists(os.path.join(self.version_dir(v), "manifest.json"))
+        )
+
+    def publish(self, trained, report=None, parent=None, activate=True, model_info=None):
+        """
+        Write a new version from {metal: booster} (scaler attached)
+        Keys not in `trained` are carried over from `parent` unchanged.
+        model_info adds per-model manifest fields (e.g. backtest stats).
+        """
+        # Sortable timestamp names, so "previous version" is a plain sort
+        version = datetime.now().strftime("%Y%m%dT%H%M%S-%f")
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = os.path.join(self.versions_dir, f".staging-{version}")
+        os.makedirs(staging)
+
+        try:
+            models = {}
+            for key, booster in trained.items():
+                save_model(staging, key, booster)
+                models[key] = {'trained_in': version, **(model_info or {}).get(key, {})}
+
+            if parent is not None and self.compatible(parent):
+                parent_manifest = self.manifest(parent)
+                for key, info in parent_manifest.get('models', {}).items():
+                    if key in models:
+                        continue
+                    for ext in (MODEL_EXT, EXPORT_EXT):
+                        path = os.path.join(self.version_dir(parent), f"{key}.{ext}")
+                        if os.path.exists(path):
+                            shutil.copy2(path, staging)
+                    models[key] = info
+
+            manifest = {
+                'version': version,
+                'format': MODEL_FORMAT,
+                'parent': parent,
+                'created_at': datetime.now().isoformat(),
+                'models': models,
+                'report': report or {}
+            }
+            with open(os.path.join(staging, "manifest.json"), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            os.rename(staging, self.version_dir(version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"Published model version {version} ({len(trained)} retrained)")
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point ACTIVE at version with a single atomic rename"""
+        if not os.path.isdir(self.version_dir(version)):
+            raise ValueError(f"Unknown model version: {version}")
+        tmp = f"{self.active_path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.active_path)
+        logger.info(f"Active model version: {version}")
+        self.prune()
+
+    def rollback(self, version=None):
+        """Activate `version`, or the version published before the active one"""
+        if version is None:
+            versions = self.list_versions()
+            active = self.active_version()
+            older = [v for v in versions if (active is None or v < active) and self.compatible(v)]
+            if not older:
+                raise ValueError("No earlier model version to roll back to")
+            version = older[-1]
+        elif os.path.isdir(self.version_dir(version)) and not self.compatible(version):
+            raise ValueError(f"Model version {version} uses an older layout and can't be served")
+        self.activate(version)
+        return version
+
+    def prune(self, keep=KEEP_VERSIONS):
+        """Delete all but the newest `keep` versions, never the active or a served one"""
+        protected = {self.active_version(), *self.serving_versions()}
+        versions = self.list_versions()
+        for version in versions[:-keep] if keep > 0 else []:
+            if version not in protected:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+    def mark_serving(self, version):
+        """Record that this process serves version (replaces its previous mark)"""
+        os.makedirs(self.serving_dir, exist_ok=True)
+        path = os.path.join(self.serving_dir, str(os.getpid()))
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(version)
+        os.replace(tmp, path)
+
+    def serving_versions(self):
+        """Versions marked by processes that are still alive; dead marks are removed"""
+        if not os.path.isdir(self.serving_dir):
+            return set()
+        versions = set()
+        for name in os.listdir(self.serving_dir):
+            if not name.isdigit():
+                continue
+            path = os.path.join(self.serving_dir, name)
+            if not _alive(int(name)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    versions.add(f.read().strip())
+            except FileNotFoundError:
+                pass
+        return versions
+
+    def load(self, version, engine=INFERENCE_ENGINE):
+        """
+        Load every model of a version into a ModelBundle
+        With the numpy engine, models are TreeEnsembles wherever an export
+        exists (xgboost is not imported at all then), else native boosters.
+        """
+        manifest = self.manifest(version)
+        models, scalers = {}, {}
+        for key in manifest['models']:
+            exported = os.path.join(self.version_dir(version), f"{key}.{EXPORT_EXT}")
+            model = None
+            if engine == 'numpy' and os.path.exists(exported):
+                try:
+                    model = TreeEnsemble.load(exported)
+                except Exception as e:
+                    logger.warning(f"Ignoring tree export for {key}: {str(e)}")
+            models[key] = model if model is not None else load_booster(self.version_dir(version), key)
+            scalers[key] = FeatureScaler.from_booster(models[key])
+        self.mark_serving(version)
+        return ModelBundle(version, models, scalers, manifest)
+
+    def export(self, version):
+        """Add NumPy exports to a version published without them; {key: exported}"""
+        directory = self.version_dir(version)
+        return dict(
+            (key, export_model(directory, key, load_booster(directory, key))) for key in self.manifest(version)['models']
+        )
+
+    def load_boosters(self, version):
+        """Native boosters of a version, {key: Booster} (for warm-start training)"""
+        if version is None:
+            return {}
+        return dict((key, load_booster(self.version_dir(version), key)) for key in self.manifest(version)['models'])
+
+    def load_active(self):
+        version = self.active_version()
+        if version is None:
+            return None
+        if not self.compatible(version):
+            logger.warning(f"Active model version {version} uses the old per-day layout; retraining")
+            return None
+        return self.load(version)
+
+    def describe(self):
+        """Summary for the /api/models endpoint"""
+        versions = []
+        for version in self.list_versions():
+            manifest = self.manifest(version)
+            versions.append({
+                'version': version,
+                'format': manifest.get('format', 1),
+                'parent': manifest.get('parent'),
+                'created_at': manifest.get('created_at'),
+                'models': sorted(manifest.get('models', {}))
+            })
+        return {'active': self.active_version(), 'versions': versions}
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+def save_model(directory, key, booster):
+    """
+    Write a model (scaler attached as a booster attribute) in native XGBoost
+    format, plus its NumPy export when that reproduces the booster
+    """
+    booster = booster.get_booster() if hasattr(booster, 'get_booster') else booster
+    booster.save_model(os.path.join(directory, f"{key}.{MODEL_EXT}"))
+    export_model(directory, key, booster)
+
+
+def export_model(directory, key, booster):
+    """
+    Write {key}.npz when the export reproduces the booster; returns whether it did
+
+    The file is written and fsynced under a temporary name, then renamed
+    into place, so exporting into a published (even active) version never
+    shows workers a partial file.
+    """
+    tmp = os.path.join(directory, f".{key}.{EXPORT_EXT}.{os.getpid()}.tmp")
+    try:
+        ensemble = TreeEnsemble.from_booster(booster)
+        error = check_export(booster, ensemble)
+        if error > EXPORT_RTOL:
+            raise ValueError(f"export differs from the booster by {error:.2e}")
+        ensemble.save(tmp)
+        os.replace(tmp, os.path.join(directory, f"{key}.{EXPORT_EXT}"))
+        return True
+    except Exception as e:
+        # Served through xgboost instead
+        logger.warning(f"No NumPy export for {key}: {str(e)}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+def load_booster(directory, key):
+    import xgboost as xgb  # deferred: only needed without a NumPy export
+
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(directory, f"{key}.{MODEL_EXT}"))
+    return booster
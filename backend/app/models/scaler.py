@@ -0,0 +1,58 @@
+import json
+import warnings
+import numpy as np
+
+# Booster attribute holding the scaler, so model + scaling ship as one file
+SCALER_ATTR = "feature_scaler"
+
+
+class FeatureScaler:
+    """
+    Serving-side StandardScaler: (X - mean) / scale
+    Stored as JSON inside the model file; no scikit-learn or unpickling.
+    """
+
+    def __init__(self, mean, scale, feature_names=None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+    @classmethod
+    def fit(cls, X):
+        """Column mean / std like StandardScaler, ignoring NaN (gaps in exogenous inputs)"""
+        names = list(X.columns) if hasattr(X, 'columns') else None
+        X = np.asarray(X, dtype=np.float64)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN column
+            mean = np.nan_to_num(np.nanmean(X, axis=0))
+            scale = np.nan_to_num(np.nanstd(X, axis=0))
+        scale[scale == 0] = 1.0  # same guard as StandardScaler
+        return cls(mean, scale, names)
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data['mean'], data['scale'], data.get('feature_names'))
+
+    def to_json(self):
+        return json.dumps({
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'feature_names': self.feature_names
+        })
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Scaler stored alongside the trees by attach()"""
+        text = booster.attr(SCALER_ATTR)
+        if text is None:
+            raise ValueError("Model has no embedded feature scaler")
+        return cls.from_json(text)
+
+    def attach(self, booster):
+        """Store the scaler in the booster's attributes, so one file holds both"""
+        booster.set_attr(**{SCALER_ATTR: self.to_json()})
+        return booster
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
@@ -0,0 +1,113 @@
+import os
+import fcntl
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Hours between automatic retrains; 0 (the default) disables the in-app
+# scheduler, leaving retrains to cron (train_models.py) or /refresh-models.
+# With several workers only one retrains at a time (a lock file in the
+# model registry); the others switch to the version it published
+RETRAIN_INTERVAL_HOURS = float(os.getenv("SONA_RETRAIN_INTERVAL_HOURS", "0"))
+
+
+class RetrainScheduler:
+    """
+    Background retraining outside the serving path
+
+    Training runs on its own thread (fits go to the training process pool);
+    requests keep using the active model version until the new one has been
+    published and swapped in atomically by the predictor.
+    """
+
+    def __init__(self, predictor, interval_hours=RETRAIN_INTERVAL_HOURS):
+        self.predictor = predictor
+        self.interval = interval_hours * 3600
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._running = threading.Lock()
+        self._manual = False
+        self._thread = None
+        self.last_run = None
+        self.last_report = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="sona-retrain", daemon=True)
+        self._thread.start()
+        logger.info(f"Retrain scheduler started (every {self.interval / 3600:g}h)" if self.interval else "Retrain scheduler started (manual only)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Ask for a retrain now; returns False if one is already running"""
+        if self._running.locked():
+            return False
+        self._manual = True
+        self.start()
+        self._wake.set()
+        return True
+
+    @property
+    def running(self):
+        return self._running.locked()
+
+    def status(self):
+        return {
+            'running': self.running,
+            'interval_hours': self.interval / 3600,
+            'last_run': self.last_run,
+            'last_error': self.last_error,
+            'last_report': self.last_report
+        }
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.interval or None)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            manual, self._manual = self._manual, False
+            self.run_once(scheduled=not manual)
+
+    def run_once(self, scheduled=False):
+        with self._running:
+            registry = self.predictor.registry
+            os.makedirs(registry.root, exist_ok=True)
+            with open(os.path.join(registry.root, ".retrain.lock"), 'w') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info("Retrain already running in another process; skipping")
+                    self.last_error = "Retrain already running in another process"
+                    return
+                try:
+                    self._retrain(scheduled)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _retrain(self, scheduled):
+        registry = self.predictor.registry
+        active = registry.active_version()
+        # Another worker published within the interval: serve that instead of training again
+        if scheduled and self.interval and active is not None and active != self.predictor.model_version:
+            created = datetime.fromisoformat(registry.manifest(active)['created_at'])
+            if (datetime.now() - created).total_seconds() < self.interval:
+                logger.info(f"Switching to model version {active} published by another process")
+                self.predictor.swap(active)
+                return
+
+        logger.info("Scheduled retrain starting")
+        try:
+            self.last_report = self.predictor.retrain_models()
+            self.last_error = None
+        except Exception as e:
+            logger.error(f"Scheduled retrain failed: {str(e)}")
+            self.last_error = str(e)
+        self.last_run = datetime.now().isoformat()
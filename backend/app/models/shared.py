@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime
+from app.models.features import FEATURE_COLUMNS
+from app.models.snapshot import METALS, SNAPSHOT_TTL
+
+logger = logging.getLogger(__name__)
+
+# How long a worker waits for the refresher's first publication before a
+# request for that metal fails
+SHARED_WAIT_SECONDS = float(os.getenv("SONA_SHARED_WAIT", "60"))
+
+
+class SharedSnapshots:
+    """
+    Read-only ForecastSnapshots for API workers in shared-state mode
+
+    The refresher process publishes forecasts, feature rows and the model
+    version into a SharedState file. Workers never fetch data or load
+    models: each access compares the generation counter and only re-decodes
+    the payload when the refresher has published a new one.
+    """
+
+    def __init__(self, state, wait=SHARED_WAIT_SECONDS):
+        self.state = state
+        self.wait = wait
+        self.generation = 0
+        self.payload = {}
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Latest published payload (decoded once per generation)"""
+        if self.state.generation() != self.generation:
+            with self._lock:
+                result = self.state.read()
+                if result is not None and result[0] != self.generation:
+                    self.generation = result[0]
+                    self.payload = json.loads(bytes(result[1]))
+        return self.payload
+
+    @property
+    def model_version(self):
+        return self.current().get('model_version')
+
+    def get(self, metal):
+        """Snapshot for metal, waiting (blocking) for the first publication"""
+        deadline = time.monotonic() + self.wait
+        while True:
+            snapshot = self.peek(metal)
+            if snapshot is not None:
+                return snapshot
+            if time.monotonic() >= deadline:
+                raise LookupError(f"No shared {metal} snapshot published yet")
+            time.sleep(0.1)
+
+    def peek(self, metal):
+        return self.current().get('snapshots', {}).get(metal)
+
+    def ready(self, metal):
+        return self.peek(metal) is not None
+
+    def features(self, metal):
+        """Latest feature row published for metal: {'columns': [...], 'row': [...]}"""
+        return self.current().get('features', {}).get(metal)
+
+    def warm(self, metals=METALS):
+        for metal in metals:
+            try:
+                self.get(metal)
+            except LookupError as e:
+                logger.error(str(e))
+
+    def warm_in_background(self, metals=METALS, on_done=None):
+        def run():
+            self.warm(metals)
+            if on_done is not None:
+                on_done()
+        threading.Thread(target=run, daemon=True).start()
+
+    def invalidate(self, metal=None):
+        """Nothing cached locally beyond the current generation"""
+
+
+class SnapshotPublisher:
+    """
+    Refresher-side loop: keeps ForecastSnapshots current and publishes them
+
+    A new generation is written only when a snapshot's (data, model)
+    version changes. The registry's ACTIVE pointer is followed, so a
+    rollback done by any worker takes effect here. With `history`
+    (a PriceHistory), its long window is kept synced into the price store
+    the workers read history from.
+    """
+
+    def __init__(self, snapshots, state, interval=SNAPSHOT_TTL, history=None):
+        self.snapshots = snapshots
+        self.history = history
+        self.predictor = snapshots.predictor
+        self.state = state
+        self.interval = interval
+        self.versions = None
+        self._stop = threading.Event()
+
+    def follow_registry(self):
+        active = self.predictor.registry.active_version()
+        if active is not None and active != self.predictor.model_version:
+            logger.info(f"Registry points at {active}; swapping")
+            self.predictor.swap(active)
+            self.snapshots.invalidate()
+
+    def payload(self):
+        snapshots, features = {}, {}
+        for metal in METALS:
+            try:
+                snapshots[metal] = self.snapshots.get(metal)
+            except Exception as e:
+                logger.error(f"Refresh failed for {metal}: {str(e)}")
+                continue
+            state = self.predictor.feature_states.get(metal)
+            if state is not None:
+                features[metal] = {
+                    'columns': state.columns + FEATURE_COLUMNS,
+                    'row': state.row()[0].tolist()
+                }
+        return {
+            'model_version': self.predictor.model_version,
+            'published_at': datetime.now().isoformat(),
+            'snapshots': snapshots,
+            'features': features
+        }
+
+    def refresh(self):
+        """Publish when any snapshot changed; returns the new generation or None"""
+        self.predictor.ensure_models()
+        self.follow_registry()
+        if self.history is not None:
+            self.history.warm()
+        payload = self.payload()
+        versions = dict((m, s['version']) for m, s in payload['snapshots'].items())
+        if versions == self.versions or not versions:
+            return None
+        # Feature rows may hold NaN (missing exogenous values); json round-trips it
+        generation = self.state.publish(json.dumps(payload, default=str).encode())
+        self.versions = versions
+        logger.info(f"Published shared state generation {generation}: {versions}")
+        return generation
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Shared state refresh failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,91 @@
+import os
+import zlib
+import numpy as np
+
+# Simulated price paths per forecast and the percentiles reported per day
+SIM_PATHS = int(os.getenv("SONA_SIM_PATHS", "10000"))
+BAND_PERCENTILES = [5, 25, 50, 75, 95]
+
+# Recent daily returns resampled for the shocks (about one trading year)
+RETURN_WINDOW = 250
+MAX_SHOCK = 6
+
+# The current volatility may run this far below / above the window's own
+# (robust) daily scale; beyond that it is more likely a data error
+REGIME_RANGE = (0.5, 3.0)
+
+
+def daily_sigma(close, volatility_7, volatility_14):
+    """
+    Current daily log-return volatility from the Volatility_7/14 features
+
+    Those are rolling standard deviations of the price level; for a random
+    walk the level spread over n days is about sigma * price * sqrt(n / 6),
+    so each is converted back and the two are averaged.
+    """
+    estimates = [v / close / np.sqrt(n / 6) for v, n in ((volatility_7, 7), (volatility_14, 14)) if np.isfinite(v) and v > 0]
+    return float(np.mean(estimates)) if estimates else None
+
+
+def standardized_returns(closes, window=RETURN_WINDOW):
+    """
+    Recent daily log returns as unit-scale shocks (the shape of the moves)
+
+    Centred on the median and scaled by the MAD, so one bad tick or a
+    contract roll can't inflate the scale; moves beyond MAX_SHOCK robust
+    deviations are clipped as data errors. Returns (shocks, daily scale),
+    or None with too little history.
+    """
+    returns = np.diff(np.log(np.asarray(closes, dtype=np.float64)[-(window + 1):]))
+    returns = returns[np.isfinite(returns)]
+    if len(returns) < 20:
+        return None
+    centred = returns - np.median(returns)
+    scale = 1.4826 * np.median(np.abs(centred))
+    if scale == 0:
+        return None
+    return np.clip(centred / scale, -MAX_SHOCK, MAX_SHOCK), float(scale)
+
+
+def regime_sigma(sigma, scale):
+    """Current volatility bounded by REGIME_RANGE around the historical scale"""
+    if sigma is None:
+        return scale
+    return float(np.clip(sigma, REGIME_RANGE[0] * scale, REGIME_RANGE[1] * scale))
+
+
+def simulate_bands(forecast, current_price, shocks, sigma, paths=SIM_PATHS, seed=0):
+    """
+    Percentile bands around a multi-day forecast by Monte Carlo
+
+    Each path resamples `shocks` (standardized historical returns, so fat
+    tails are kept) scaled to today's `sigma` and accumulates them over the
+    days. The moves are centred so the median path is the model's forecast
+    for each day. Fully vectorized: one (days x paths) draw, cumsum and
+    partition.
+
+    Returns {'bands': {percentile: [price per day]}, 'prob_up': [share per day]}
+    with prob_up the share of paths above the current price.
+    """
+    forecast = np.asarray(forecast, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    draws = shocks[rng.integers(0, len(shocks), size=(len(forecast), paths))]
+    log_moves = np.cumsum(draws * sigma, axis=0, dtype=np.float64)
+
+    ranks = np.round(np.array(BAND_PERCENTILES) / 100 * (paths - 1)).astype(np.int64)
+    quantiles = np.partition(log_moves, ranks, axis=1)[:, ranks]
+    median = quantiles[:, BAND_PERCENTILES.index(50)]
+    quantiles = quantiles - median[:, None]
+    log_moves = log_moves - median[:, None]
+    bands = forecast[:, None] * np.exp(quantiles)
+    prob_up = (log_moves > np.log(current_price / forecast)[:, None]).mean(axis=1)
+
+    return {
+        'bands': dict((p, bands[:, i].tolist()) for i, p in enumerate(BAND_PERCENTILES)),
+        'prob_up': prob_up.tolist()
+    }
+
+
+def band_seed(data_version, model_version):
+    """Same data and models give the same bands (snapshots and ETags stay stable)"""
+    return zlib.crc32(f"{data_version}|{model_version}".encode())
@@ -0,0 +1,71 @@
+import os
+import threading
+import logging
+from app.data.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# How often a snapshot is re-checked against the market data, and how long
+# an old snapshot may keep being served while that check runs in the background
+SNAPSHOT_TTL = float(os.getenv("SONA_SNAPSHOT_TTL", "60"))
+SNAPSHOT_STALE_TTL = float(os.getenv("SONA_SNAPSHOT_STALE_TTL", "86400"))
+
+METALS = ['gold', 'silver']
+
+
+class ForecastSnapshots:
+    """
+    Precomputed 24K base forecasts, one per metal
+
+    The model only runs when the latest bar (or the models) changed since the
+    previous snapshot; otherwise the existing snapshot is kept. Requests read
+    the snapshot and apply purity/unit/city as plain arithmetic.
+    """
+
+    def __init__(self, predictor, ttl=SNAPSHOT_TTL, stale_ttl=SNAPSHOT_STALE_TTL):
+        self.predictor = predictor
+        self.cache = TTLCache(ttl=ttl, stale_ttl=stale_ttl)
+
+    def get(self, metal):
+        """Return the current base snapshot for metal, building it if needed"""
+        return self.cache.get(metal, lambda: self._build(metal))
+
+    def peek(self, metal):
+        """Return the snapshot if one exists, without ever building"""
+        return self.cache.peek(metal)
+
+    def ready(self, metal):
+        """True when get(metal) can be served without running the model"""
+        return self.cache.servable(metal)
+
+    def warm(self, metals=METALS):
+        """Build snapshots up front so the first request does not pay for it"""
+        for metal in metals:
+            try:
+                self.get(metal)
+            except Exception as e:
+                logger.error(f"Snapshot warmup failed for {metal}: {str(e)}")
+
+    def warm_in_background(self, metals=METALS, on_done=None):
+        def run():
+            self.warm(metals)
+            if on_done is not None:
+                on_done()
+        threading.Thread(target=run, daemon=True).start()
+
+    def invalidate(self, metal=None):
+        self.cache.invalidate(metal)
+
+    def _build(self, metal):
+        self.predictor.ensure_models()
+        df = self.predictor.latest_data(metal)
+        version = (self.predictor.data_version(df), self.predictor.model_version)
+
+        previous = self.cache.peek(metal)
+        if previous is not None and previous['version'] == version:
+            return previous
+
+        snapshot = self.predictor.predict_base(metal, df)
+        snapshot['version'] = version
+        logger.info(f"New {metal} snapshot for data {version[0]} (models {version[1]})")
+        return snapshot
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from app.models.features import create_features
+from app.models.scaler import FeatureScaler
+
+logger = logging.getLogger(__name__)
+
+METALS = ['gold', 'silver']
+HORIZONS = [1, 2, 3, 4, 5, 6, 7]  # all predicted at once by one model per metal
+TRAINING_DAYS = 365
+
+MODEL_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 5,
+    'learning_rate': 0.05,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+    # Multi-target trees: each leaf holds a vector with one value per horizon
+    'tree_method': 'hist',
+    'multi_strategy': 'multi_output_tree',
+    # Vector-leaf histograms are costly; 64 bins keeps one fit cheaper than
+    # the seven single-output fits it replaces
+    'max_bin': 64
+}
+
+# Upper bound on fit processes; by default one per metal
+TRAIN_WORKERS = int(os.getenv("SONA_TRAIN_WORKERS", "0")) or None
+
+
+def build_dataset(fetcher, metal, days=TRAINING_DAYS, interval='1d'):
+    """
+    Fetch and featurize one metal's history once for every horizon
+    Intraday intervals ('1h', '15m') give bar-sized horizons in horizons_xy.
+    """
+    if interval == '1d':
+        df = fetcher.get_historical_data(metal, days=days, for_training=True)
+    else:
+        df = fetcher.get_intraday_data(metal, interval=interval, days=days)
+
+    if df is None or len(df) < 100:
+        raise ValueError(f"Insufficient data for {metal}")
+
+    return create_features(df, interval)
+
+
+def horizons_xy(features, horizons=HORIZONS):
+    """Feature matrix and one shifted-close target column per horizon"""
+    df = features.copy()
+    targets = [f'target_{day}' for day in horizons]
+    for day, target in zip(horizons, targets):
+        df[target] = df['Close'].shift(-day)
+    df = df.dropna(subset=targets)
+
+    feature_cols = [col for col in df.columns if col not in targets and col != 'Date']
+    return df[feature_cols], df[targets]
+
+
+def fit_metal(X, Y, n_jobs=None, params=None):
+    """
+    Fit one multi-output model over every horizon column of Y
+    Returns (booster, seconds); the scaler is embedded in the booster.
+    """
+    from xgboost import XGBRegressor
+
+    start = time.perf_counter()
+    scaler = FeatureScaler.fit(X)
+
+    model = XGBRegressor(n_jobs=n_jobs, **{**MODEL_PARAMS, **(params or {})})
+    model.fit(scaler.transform(X), Y)
+    booster = scaler.attach(model.get_booster())
+    mark_trained(booster, X, full=True)
+    return booster, time.perf_counter() - start
+
+
+def mark_trained(booster, X, full=False):
+    """Record the last training row (and, for full fits, its date) on the booster"""
+    if hasattr(X, 'index') and len(X):
+        through = str(X.index[-1].date())
+        booster.set_attr(trained_through=through)
+        if full:
+            booster.set_attr(full_fit_through=through)
+    return booster
+
+
+def thread_budget(tasks, max_workers=None):
+    """Split the cores between pool processes and XGBoost threads"""
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(tasks, max_workers or cpus, cpus))
+    return workers, max(1, cpus // workers)
+
+
+def train_all(fetcher, metals=None, max_workers=TRAIN_WORKERS, params=None):
+    """
+    Train one multi-horizon model per metal, every metal when metals is None
+
+    The fits run in a process pool with nthread budgeted so
+    pools x threads <= cores. params ({metal: overrides}) replaces
+    MODEL_PARAMS per metal, e.g. with tuned values.
+    Returns ({'gold': booster, ...}, report).
+    """
+    params = params or {}
+    started = time.perf_counter()
+    report = {'fetch': {}, 'features': {}, 'fit': {}, 'errors': {}}
+
+    datasets = {}
+    for metal in metals or METALS:
+        try:
+            t = time.perf_counter()
+            df = fetcher.get_historical_data(metal, days=TRAINING_DAYS, for_training=True)
+            report['fetch'][metal] = round(time.perf_counter() - t, 3)
+            if df is None or len(df) < 100:
+                raise ValueError(f"Insufficient data for {metal}")
+
+            t = time.perf_counter()
+            datasets[metal] = horizons_xy(create_features(df))
+            report['features'][metal] = round(time.perf_counter() - t, 3)
+        except Exception as e:
+            logger.error(f"Error preparing {metal} dataset: {str(e)}")
+            report['errors'][metal] = str(e)
+
+    workers, n_jobs = thread_budget(len(datasets), max_workers)
+    report['workers'] = workers
+    report['threads_per_worker'] = n_jobs
+
+    trained = {}
+    t = time.perf_counter()
+    if workers == 1:
+        # Nothing to parallelise; skip the process start-up cost
+        for metal, (X, Y) in datasets.items():
+            _collect(trained, report, metal, lambda: fit_metal(X, Y, n_jobs, params.get(metal)))
+    elif datasets:
+        # spawn: forking a process that already runs OpenMP/server threads can deadlock
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = dict((metal, pool.submit(fit_metal, X, Y, n_jobs, params.get(metal))) for metal, (X, Y) in datasets.items())
+            for metal, future in futures.items():
+                _collect(trained, report, metal, future.result)
+    report['fit_wall'] = round(time.perf_counter() - t, 3)
+    report['total'] = round(time.perf_counter() - started, 3)
+
+    return trained, report
+
+
+def _collect(trained, report, metal, result):
+    try:
+        booster, seconds = result()
+        trained[metal] = booster
+        report['fit'][metal] = round(seconds, 3)
+    except Exception as e:
+        logger.error(f"Error training {metal}: {str(e)}")
+        report['errors'][metal] = str(e)
@@ -0,0 +1,185 @@
+import os
+import json
+import numpy as np
+
+# Serving engine: "numpy" evaluates the exported TreeEnsemble (no xgboost
+# import in API workers), "xgboost" loads native boosters
+INFERENCE_ENGINE = os.getenv("SONA_INFERENCE", "numpy")
+
+# Largest |TreeEnsemble - Booster| difference accepted at export, relative
+# to the prediction (float32 sums in XGBoost vs float64 here)
+EXPORT_RTOL = 1e-5
+
+# Bumped whenever the array layout below changes; older files are ignored
+EXPORT_FORMAT = 1
+
+
+class TreeEnsemble:
+    """
+    A trained XGBoost regressor as flat NumPy arrays
+
+    Every tree's nodes are concatenated into one set of arrays (split
+    feature, threshold, left/right child, default direction) with leaves
+    pointing at themselves. Evaluation compares every node's split at once,
+    then walks all trees together in `depth` gathers and sums one gather
+    of the leaf vectors: a few dozen NumPy calls whatever the size. Vector
+    leaves (multi_output_tree) and one-target-per-tree models both map to
+    a (nodes, targets) value table. Booster attributes (the feature scaler,
+    trained_through) travel along, so attr() works as on a Booster.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, values, roots, base_score, depth,
+                 attributes=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.values = values
+        self.roots = roots
+        self.base_score = base_score
+        self.depth = depth
+        self.attributes = attributes or {}
+        # children[2 * node + went_left]: one gather per level
+        self.children = np.stack([right, left], axis=1).ravel()
+        self.leaf_values = values.astype(np.float64)
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Export a squared-error gbtree Booster (or XGBRegressor)"""
+        booster = booster.get_booster() if hasattr(booster, 'get_booster') else booster
+        learner = json.loads(booster.save_raw('json'))['learner']
+        if learner['objective']['name'] != 'reg:squarederror':
+            raise ValueError(f"Unsupported objective: {learner['objective']['name']}")
+        if learner['gradient_booster']['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster: {learner['gradient_booster']['name']}")
+
+        params = learner['learner_model_param']
+        targets = max(1, int(params.get('num_target', '1')))
+        base_score = np.broadcast_to(np.asarray(json.loads(params['base_score']), dtype=np.float64), (targets,))
+        model = learner['gradient_booster']['model']
+
+        feature, threshold, left, right, default_left, values, roots = [], [], [], [], [], [], []
+        depth, offset = 0, 0
+        for tree, target in zip(model['trees'], model['tree_info']):
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            children_left = np.asarray(tree['left_children'], dtype=np.int64)
+            children_right = np.asarray(tree['right_children'], dtype=np.int64)
+            conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+            nodes = len(children_left)
+            leaf = children_left == -1
+            own = np.arange(nodes)
+
+            tree_values = np.zeros((nodes, targets), dtype=np.float64)
+            if int(tree['tree_param'].get('size_leaf_vector', '1')) > 1:
+                # Vector leaf: right_children holds its row in leaf_weights
+                weights = np.asarray(tree['leaf_weights'], dtype=np.float32).reshape(-1, targets)
+                tree_values[leaf] = weights[children_right[leaf]]
+            else:
+                tree_values[leaf, target] = conditions[leaf]
+
+            feature.append(np.where(leaf, 0, tree['split_indices']))
+            threshold.append(np.where(leaf, np.float32(0), conditions))
+            left.append(np.where(leaf, own, children_left) + offset)
+            right.append(np.where(leaf, own, children_right) + offset)
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            values.append(tree_values)
+            roots.append(offset)
+            depth = max(depth, _tree_depth(children_left, children_right))
+            offset += nodes
+
+        if not roots:
+            raise ValueError("Model has no trees")
+        return cls(
+            np.concatenate(feature).astype(np.int32),
+            np.concatenate(threshold).astype(np.float32),
+            np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32),
+            np.concatenate(default_left),
+            np.concatenate(values).astype(np.float32),
+            np.asarray(roots, dtype=np.int32),
+            base_score.copy(),
+            depth,
+            booster.attributes()
+        )
+
+    @property
+    def num_trees(self):
+        return len(self.roots)
+
+    def attr(self, key):
+        return self.attributes.get(key)
+
+    def inplace_predict(self, X):
+        """
+        Predictions for the rows of X, shaped like Booster.inplace_predict:
+        (rows, targets), or (rows,) for a single target
+        """
+        # XGBoost compares float32 feature values against float32 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+
+        # Every split's outcome for every row (rows x nodes)
+        x = X[:, self.feature]
+        went_left = x < self.threshold
+        missing = np.isnan(x)
+        if missing.any():
+            went_left = np.where(missing, self.default_left, went_left)
+
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.num_trees))
+        for _ in range(self.depth):
+            nodes = self.children[2 * nodes + went_left[rows, nodes]]
+
+        predicted = self.leaf_values[nodes].sum(axis=1) + self.base_score
+        return predicted[:, 0] if predicted.shape[1] == 1 else predicted
+
+    def save(self, path):
+        """Write as an uncompressed .npz (attributes as JSON)"""
+        with open(path, 'wb') as f:
+            np.savez(
+                f, format=EXPORT_FORMAT, feature=self.feature, threshold=self.threshold, left=self.left,
+                right=self.right, default_left=self.default_left, values=self.values, roots=self.roots,
+                base_score=self.base_score, depth=self.depth, attributes=json.dumps(self.attributes)
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['format']) != EXPORT_FORMAT:
+                raise ValueError(f"Unsupported tree export format in {path}")
+            return cls(
+                data['feature'], data['threshold'], data['left'], data['right'], data['default_left'],
+                data['values'], data['roots'], data['base_score'], int(data['depth']),
+                json.loads(str(data['attributes']))
+            )
+
+
+def _tree_depth(children_left, children_right):
+    """Edges on the longest root-to-leaf path"""
+    # A vector leaf's right child is its leaf_weights row; only splits have children
+    depth, level = 0, [0]
+    while True:
+        level = [c for n in level if children_left[n] != -1 for c in (children_left[n], children_right[n])]
+        if not level:
+            return depth
+        depth += 1
+
+
+def check_export(booster, ensemble, rows=256, seed=0):
+    """
+    Largest relative difference between the two on random rows
+
+    The models see standardized features, so N(0, 1) rows (with some
+    NaN) reach every part of the trees that real inputs do.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, int(booster.num_features()))).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    expected = np.asarray(booster.inplace_predict(X), dtype=np.float64)
+    actual = ensemble.inplace_predict(X)
+    return float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0)))
@@ -0,0 +1,178 @@
+import os
+import time
+import random
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.models.scaler import FeatureScaler
+from app.models.training import METALS, HORIZONS, MODEL_PARAMS, build_dataset, horizons_xy, thread_budget, TRAIN_WORKERS
+from app.models.backtest import walk_forward_folds
+
+logger = logging.getLogger(__name__)
+
+# Successive halving: start TUNE_CONFIGS random configs on MIN_ROUNDS
+# boosting rounds, keep the best 1/TUNE_ETA of them and give the survivors
+# TUNE_ETA times the rounds, until one config is left
+TUNE_CONFIGS = int(os.getenv("SONA_TUNE_CONFIGS", "27"))
+TUNE_ETA = int(os.getenv("SONA_TUNE_ETA", "3"))
+MIN_ROUNDS = int(os.getenv("SONA_TUNE_MIN_ROUNDS", "50"))
+EARLY_STOPPING_ROUNDS = 20
+
+# Time-series CV: the last TUNE_FOLDS blocks of TUNE_BLOCK rows, each scored
+# by a model trained on everything up to `horizon` rows before the block
+TUNE_FOLDS = 3
+TUNE_BLOCK = 30
+
+# Early stopping watches the last TUNE_VALIDATION rows of each fold's
+# training window (fit stops `horizon` rows before them), never the block
+# being scored
+TUNE_VALIDATION = 30
+
+# Sampled per config; everything else (tree method, bins, ...) stays as in MODEL_PARAMS
+SEARCH_SPACE = {
+    'max_depth': lambda rng: rng.choice([3, 4, 5, 6, 8]),
+    'learning_rate': lambda rng: round(10 ** rng.uniform(-2, -0.7), 4),
+    'subsample': lambda rng: round(rng.uniform(0.6, 1.0), 2),
+    'colsample_bytree': lambda rng: round(rng.uniform(0.5, 1.0), 2),
+    'min_child_weight': lambda rng: rng.choice([1, 3, 5, 10]),
+    'reg_lambda': lambda rng: round(10 ** rng.uniform(-1, 1), 3)
+}
+
+
+def sample_configs(n, seed=42):
+    """n random configs, the first being the current MODEL_PARAMS"""
+    rng = random.Random(seed)
+    defaults = dict((name, MODEL_PARAMS[name]) for name in ('max_depth', 'learning_rate', 'subsample', 'colsample_bytree'))
+    configs = [defaults]
+    while len(configs) < n:
+        configs.append(dict((name, sample(rng)) for name, sample in SEARCH_SPACE.items()))
+    return configs
+
+
+def tuning_folds(n_rows, horizon, folds=TUNE_FOLDS, block=TUNE_BLOCK):
+    return walk_forward_folds(n_rows, horizon, block, initial=n_rows - folds * block)
+
+
+def evaluate_config(X, Y, folds, params, rounds, n_jobs=1, horizon=max(HORIZONS), validation=TUNE_VALIDATION):
+    """
+    Cross-validated MAE (mean over folds and horizons) of one config
+
+    Each fold early-stops on the tail of its own training window, so a
+    config is fitted at its best round count up to `rounds`, then scored on
+    the untouched evaluation block at that round. Returns (mae, best_rounds)
+    with best_rounds averaged over the folds.
+    """
+    from xgboost import XGBRegressor
+
+    scores, best = [], []
+    for train_end, eval_start, eval_end in folds:
+        val_start = train_end - validation
+        fit_end = val_start - horizon + 1
+        scaler = FeatureScaler.fit(X[:fit_end])
+        model = XGBRegressor(
+            n_jobs=n_jobs,
+            **{**MODEL_PARAMS, **params, 'n_estimators': rounds},
+            eval_metric='mae',
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS
+        )
+        model.fit(
+            scaler.transform(X[:fit_end]), Y[:fit_end],
+            eval_set=[(scaler.transform(X[val_start:train_end]), Y[val_start:train_end])],
+            verbose=False
+        )
+        rounds_used = model.best_iteration + 1
+        predicted = model.get_booster().inplace_predict(
+            scaler.transform(X[eval_start:eval_end]), iteration_range=(0, rounds_used)
+        ).reshape(eval_end - eval_start, -1)
+        scores.append(float(np.mean(np.abs(predicted - Y[eval_start:eval_end]))))
+        best.append(rounds_used)
+    return float(np.mean(scores)), int(round(np.mean(best)))
+
+
+def successive_halving(datasets, configs=TUNE_CONFIGS, eta=TUNE_ETA, min_rounds=MIN_ROUNDS, max_workers=TRAIN_WORKERS, seed=42):
+    """
+    Pick a config per dataset ({metal: (X, Y)} as arrays) by successive halving
+
+    Every rung evaluates all surviving (metal, config) pairs at once in a
+    process pool, budgeted like training (pools x threads <= cores).
+    Returns {metal: result} with the chosen params (n_estimators set from
+    early stopping), its CV score and the per-rung history.
+    """
+    candidates = sample_configs(configs, seed)
+    rungs, remaining = 1, configs
+    while remaining // eta > 1:
+        remaining //= eta
+        rungs += 1
+    folds = dict((metal, tuning_folds(len(X), max(HORIZONS))) for metal, (X, _) in datasets.items())
+    alive = dict((metal, list(range(len(candidates)))) for metal in datasets)
+    history = dict((metal, []) for metal in datasets)
+    scores = {}
+
+    for rung in range(rungs):
+        rounds = min_rounds * eta ** rung
+        tasks = [(metal, i) for metal, indexes in alive.items() for i in indexes]
+        workers, n_jobs = thread_budget(len(tasks), max_workers)
+        t = time.perf_counter()
+        if workers == 1:
+            results = [evaluate_config(*datasets[m], folds[m], candidates[i], rounds, n_jobs) for m, i in tasks]
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [pool.submit(evaluate_config, *datasets[m], folds[m], candidates[i], rounds, n_jobs) for m, i in tasks]
+                results = [f.result() for f in futures]
+
+        for (metal, i), result in zip(tasks, results):
+            scores[(metal, i)] = result
+        for metal in alive:
+            ranked = sorted(alive[metal], key=lambda i: scores[(metal, i)][0])
+            history[metal].append({
+                'rounds': rounds,
+                'configs': len(ranked),
+                'best_mae': round(scores[(metal, ranked[0])][0], 4),
+                'seconds': round(time.perf_counter() - t, 3)
+            })
+            alive[metal] = ranked[:max(1, len(ranked) // eta)]
+            # The defaults always reach the last rung, so a tuned config
+            # only replaces them by beating them at the full budget
+            if rung == rungs - 2 and 0 not in alive[metal]:
+                alive[metal].append(0)
+        logger.info(f"Tuning rung {rung + 1}/{rungs}: {len(tasks)} configs x {rounds} rounds in {time.perf_counter() - t:.1f}s")
+
+    chosen = {}
+    for metal, indexes in alive.items():
+        best = min(indexes, key=lambda i: scores[(metal, i)][0])
+        mae, best_rounds = scores[(metal, best)]
+        chosen[metal] = {
+            'params': {**candidates[best], 'n_estimators': best_rounds},
+            'cv_mae': round(mae, 4),
+            'default_cv_mae': round(scores[(metal, 0)][0], 4),
+            'folds': len(folds[metal]),
+            'rungs': history[metal]
+        }
+    return chosen
+
+
+def tune_all(fetcher, metals=None, configs=TUNE_CONFIGS, max_workers=TRAIN_WORKERS):
+    """
+    Tune one config per metal on its training history
+
+    Each metal has a single multi-horizon model, so a config is scored on
+    the mean MAE over every horizon. Returns ({metal: result}, report).
+    """
+    started = time.perf_counter()
+    report = {'errors': {}}
+    datasets = {}
+    for metal in metals or METALS:
+        try:
+            X, Y = horizons_xy(build_dataset(fetcher, metal))
+            datasets[metal] = (X.to_numpy(dtype=np.float64), Y.to_numpy(dtype=np.float64))
+        except Exception as e:
+            logger.error(f"Error preparing {metal} dataset: {str(e)}")
+            report['errors'][metal] = str(e)
+
+    results = successive_halving(datasets, configs, max_workers=max_workers) if datasets else {}
+    for metal, result in results.items():
+        logger.info(f"Tuned {metal}: {result['params']} (CV MAE {result['cv_mae']}, default {result['default_cv_mae']})")
+    report['total'] = round(time.perf_counter() - started, 3)
+    return results, report
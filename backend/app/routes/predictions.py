@@ -1,12 +1,64 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app.data.fetcher import MarketDataFetcher
+from app.data.history import PriceHistory, MAX_POINTS
+from app.data.intraday import INTRADAY_DAYS, INTRADAY_TTL
 from app.models.predictor import PricePredictor
+from app.models.snapshot import ForecastSnapshots
+from app.models.scheduler import RetrainScheduler
+from app.models.shared import SharedSnapshots
 from app.utils.city_spreads import get_city_spread, CITIES
+from app.utils.admission import AdmissionController, Overloaded, client_key
+from app.utils.concurrency import CoalescingExecutor
+from app.utils.downsample import METHODS
+from app.utils.pricing import price_grid
+from app.utils.metrics import STAGE_SECONDS, CallbackGauge
+from app.utils.shared_state import SharedState, SHARED_STATE_PATH
+from app.utils import http_cache
 from typing import Optional
+from datetime import date, timedelta
+import numpy as np
+import asyncio
+import hmac
+import math
 import logging
+import os
+
+# Bounded pool for blocking prediction work, and how long a request may wait on it
+PREDICT_WORKERS = int(os.getenv("SONA_PREDICT_WORKERS", "4"))
+PREDICT_TIMEOUT = float(os.getenv("SONA_PREDICT_TIMEOUT", "10"))
+
+# Shared secret for the model admin endpoints (X-Admin-Token header); when
+# unset they are disabled
+ADMIN_TOKEN = os.getenv("SONA_ADMIN_TOKEN", "")
 
 router = APIRouter()
 predictor = PricePredictor()
 
+# With SONA_SHARED_STATE set, forecasts come from the refresher process
+# (refresh_state.py) through shared memory, and this worker never loads
+# models or fetches market data itself
+SHARED = bool(SHARED_STATE_PATH)
+if SHARED:
+    snapshots = SharedSnapshots(SharedState(SHARED_STATE_PATH))
+    # Long-range history is read from the price store the refresher keeps synced
+    history = PriceHistory(MarketDataFetcher(read_only=True))
+else:
+    snapshots = ForecastSnapshots(predictor)
+    history = PriceHistory(predictor.fetcher)
+executor = CoalescingExecutor(max_workers=PREDICT_WORKERS, timeout=PREDICT_TIMEOUT)
+admission = AdmissionController()
+admission.register_metrics()
+scheduler = RetrainScheduler(predictor)
+
+CallbackGauge(
+    "sona_market_cache", "Market-data cache counters and size", ["stat"],
+    lambda: dict(((k,), v) for k, v in predictor.fetcher.cache_stats().items())
+)
+CallbackGauge(
+    "sona_predict_executor", "Prediction executor submitted/coalesced/timeout counts", ["stat"],
+    lambda: dict(((k,), v) for k, v in executor.stats.items())
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -17,6 +69,8 @@ SILVER_UNITS = [1, 100, 1000]  # 1g, 100g (standard bar), 1kg
 
 @router.get("/predict")
 async def get_predictions(
+    request: Request,
+    response: Response,
     metal: str = Query("gold", regex="^(gold|silver)$"),
     state: str = Query("Maharashtra"),
     city: str = Query("Mumbai"),
@@ -27,78 +81,441 @@ async def get_predictions(
     Get price predictions for a specific metal, purity, and location
     """
     try:
-        # Validate inputs
-        if state not in CITIES or city not in CITIES[state]:
-            raise HTTPException(status_code=400, detail="Invalid state or city")
+        validate_selection(metal, state, city, purity, unit)
+        check_rate_limit(request)
         
-        if metal == 'gold' and purity not in GOLD_PURITIES:
-            raise HTTPException(status_code=400, detail="Invalid purity for gold")
+        params = (metal, state, city, purity if metal == 'gold' else '24K', unit)
         
-        if metal == 'gold' and unit not in GOLD_UNITS:
-            raise HTTPException(status_code=400, detail="Invalid unit for gold")
+        # Conditional request against the current snapshot: 304 without
+        # running the predictor or localizing anything. get() on a ready
+        # snapshot never blocks, but starts the background revalidation once
+        # it is past its TTL, so a client that always revalidates still
+        # moves on to the rebuilt forecast
+        if snapshots.ready(metal):
+            headers = snapshot_cache_headers(snapshots.get(metal), *params)
+            if http_cache.is_not_modified(request, headers['ETag'], headers.get('Last-Modified')):
+                return http_cache.not_modified_response(headers)
         
-        if metal == 'silver' and unit not in SILVER_UNITS:
-            raise HTTPException(status_code=400, detail="Invalid unit for silver")
+        # Read the precomputed 24K snapshot; everything below is arithmetic
+        (snapshot,), stale = await admitted_snapshots([metal])
+        if stale:
+            response.headers.update(STALE_HEADERS)
+        else:
+            response.headers.update(snapshot_cache_headers(snapshot, *params))
         
-        # Get base predictions with purity
-        base_predictions = predictor.predict(metal, purity=purity if metal == 'gold' else '24K')
+        with STAGE_SECONDS.time(stage='localize'):
+            return {**localize(snapshot, metal, purity, state, city, unit), 'stale': stale}
         
-        # Get city spread
-        city_spread = get_city_spread(city)
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Prediction timed out, please retry")
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def validate_selection(metal, state, city, purity, unit):
+    """Raise a 400 for an unknown location or a purity/unit the metal doesn't have"""
+    if state not in CITIES or city not in CITIES[state]:
+        raise HTTPException(status_code=400, detail="Invalid state or city")
+    
+    if metal == 'gold' and purity not in GOLD_PURITIES:
+        raise HTTPException(status_code=400, detail="Invalid purity for gold")
+    
+    if metal == 'gold' and unit not in GOLD_UNITS:
+        raise HTTPException(status_code=400, detail="Invalid unit for gold")
+    
+    if metal == 'silver' and unit not in SILVER_UNITS:
+        raise HTTPException(status_code=400, detail="Invalid unit for silver")
+
+def parse_list(value, allowed, cast=str):
+    """Parse a comma-separated query value (or "all") against allowed options"""
+    if value is None or value.strip().lower() == 'all':
+        return list(allowed)
+    try:
+        items = [cast(v.strip()) for v in value.split(',') if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid value: {value}")
+    invalid = [v for v in items if v not in allowed]
+    if invalid or not items:
+        raise HTTPException(status_code=400, detail=f"Invalid value(s): {', '.join(map(str, invalid)) or value}")
+    return items
+
+@router.get("/predict/batch")
+async def get_batch_predictions(
+    request: Request,
+    response: Response,
+    metal: str = Query("all"),
+    state: str = Query("all"),
+    city: str = Query("all"),
+    purity: str = Query("all"),  # For gold only
+    unit: str = Query("all")  # grams
+):
+    """
+    Localized prices for every requested city x purity x unit in one call
+
+    Prices are columnar: prices[c][p][u][d] for cities[c], purities[p],
+    units[u] and days[d], where day 0 is the current price.
+    """
+    try:
+        metals = parse_list(metal, ['gold', 'silver'])
+        states = parse_list(state, list(CITIES))
+        state_cities = [(s, c) for s in states for c in CITIES[s]]
+        cities = parse_list(city, [c for _, c in state_cities])
+        city_states = dict((c, s) for s, c in state_cities)
+        spreads = [get_city_spread(c) for c in cities]
+        
+        check_rate_limit(request)
+        base_snapshots, stale = await admitted_snapshots(metals)
+        if stale:
+            response.headers.update(STALE_HEADERS)
         
-        # Apply localization
-        current_price_per_gram = base_predictions['current_price']
-        current_price_total = current_price_per_gram * unit
-        current_price_localized = current_price_total * (1 + city_spread / 100)
+        result = {
+            'stale': stale,
+            'days': list(range(0, 8)),
+            'cities': cities,
+            'states': [city_states[c] for c in cities],
+            'spreads': spreads,
+            'metals': {}
+        }
         
-        forecast = []
-        for day_pred in base_predictions['forecast']:
-            price_per_gram = day_pred['price']
-            price_total = price_per_gram * unit
-            localized_price = price_total * (1 + city_spread / 100)
+        metal_units = {'gold': GOLD_UNITS, 'silver': SILVER_UNITS}
+        requested_units = parse_list(unit, sorted(set(u for m in metals for u in metal_units[m])), int)
+        
+        for m, snapshot in zip(metals, base_snapshots):
+            # Units are filtered per metal so "unit=10,100" works across both
+            units = [u for u in requested_units if u in metal_units[m]]
+            if not units:
+                raise HTTPException(status_code=400, detail=f"Invalid unit for {m}")
+            
+            if m == 'gold':
+                purities = parse_list(purity, GOLD_PURITIES)
+                factors = [predictor.fetcher.purity_factors[p] for p in purities]
+            else:
+                purities = ['Pure']
+                factors = [1.0]
+            
+            base_prices = [snapshot['current_price']] + [d['price'] for d in snapshot['forecast']]
+            with STAGE_SECONDS.time(stage='localize_grid'):
+                grid = price_grid(base_prices, factors, units, spreads)
             
-            forecast.append({
-                'day': day_pred['day'],
-                'price': round(localized_price, 2),
-                'price_per_gram': round(price_per_gram, 2),
-                'trend': day_pred['trend'],
-                'confidence': day_pred['confidence']
-            })
+            result['metals'][m] = {
+                'purities': purities,
+                'units': units,
+                'prices': grid.tolist(),
+                'trend': [d['trend'] for d in snapshot['forecast']],
+                'confidence': [d['confidence'] for d in snapshot['forecast']],
+                'timestamp': snapshot['timestamp']
+            }
         
-        week_average = sum([f['price'] for f in forecast]) / len(forecast)
-        week_trend = ((forecast[-1]['price'] - current_price_localized) / current_price_localized) * 100
+        return result
+        
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Prediction timed out, please retry")
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/history")
+async def get_history(
+    request: Request,
+    response: Response,
+    metal: str = Query("gold", regex="^(gold|silver)$"),
+    state: str = Query("Maharashtra"),
+    city: str = Query("Mumbai"),
+    purity: str = Query("22K", regex="^(18K|22K|24K)$"),  # For gold only
+    unit: int = Query(10),  # grams
+    start: Optional[date] = Query(None),  # default: one year before end
+    end: Optional[date] = Query(None),  # default: latest bar
+    points: int = Query(500, ge=3, le=MAX_POINTS),
+    method: str = Query("lttb", regex="^(lttb|minmax)$")
+):
+    """
+    Localized daily price history for a date range, downsampled to at most `points`
+
+    Columnar: prices[i] is the close on dates[i]. lttb keeps the visual
+    shape; minmax keeps every bucket's low and high.
+    """
+    try:
+        validate_selection(metal, state, city, purity, unit)
+        purity = purity if metal == 'gold' else '24K'
+        
+        pyramid = await get_history_pyramid(metal)
+        end = end or pyramid.last.date()
+        start = start or end - timedelta(days=365)
+        if start > end:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+        
+        headers = http_cache.cache_headers(
+            http_cache.make_etag(pyramid.version, metal, state, city, purity, unit, start, end, points, method)
+        )
+        if http_cache.is_not_modified(request, headers['ETag']):
+            return http_cache.not_modified_response(headers)
+        response.headers.update(headers)
+        
+        with STAGE_SECONDS.time(stage='history'):
+            dates, closes, level = pyramid.window(start, end, points, method)
+            spread = get_city_spread(city)
+            factor = predictor.fetcher.purity_factors[purity] if metal == 'gold' else 1.0
+            prices = price_grid(closes, [factor], [unit], [spread])[0, 0, 0]
         
         return {
             'metal': metal,
             'purity': purity if metal == 'gold' else 'Pure',
             'unit': unit,
-            'unit_label': f"{unit} gram{'s' if unit != 1 else ''}",
             'location': {'state': state, 'city': city},
-            'currentPrice': round(current_price_localized, 2),
-            'currentPricePerGram': round(current_price_per_gram * (1 + city_spread / 100), 2),
-            'forecast': forecast,
-            'weekAverage': round(week_average, 2),
-            'weekTrend': round(week_trend, 2),
-            'spread': city_spread,
-            'timestamp': base_predictions['timestamp']
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'method': method,
+            'level': level,
+            'points': len(dates),
+            'dates': np.datetime_as_string(dates).tolist(),
+            'prices': prices.tolist()
         }
         
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="History is still loading, please retry")
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
+        logger.error(f"History error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/intraday")
+async def get_intraday(
+    response: Response,
+    metal: str = Query("gold", regex="^(gold|silver)$"),
+    state: str = Query("Maharashtra"),
+    city: str = Query("Mumbai"),
+    purity: str = Query("22K", regex="^(18K|22K|24K)$"),  # For gold only
+    unit: int = Query(10),  # grams
+    interval: str = Query("1h", regex="^(1h|15m)$"),
+    days: int = Query(5, ge=1, le=INTRADAY_DAYS),
+    points: int = Query(500, ge=3, le=MAX_POINTS),
+    method: str = Query("lttb", regex="^(lttb|minmax)$")
+):
+    """
+    Localized intraday prices (1h or 15m bars) for the last `days` days,
+    downsampled to at most `points`; latest is the newest bar as-is
+    
+    Bars are fetched by each worker (shared-state mode included) and
+    cached for SONA_INTRADAY_TTL seconds.
+    """
+    try:
+        validate_selection(metal, state, city, purity, unit)
+        purity = purity if metal == 'gold' else '24K'
+        
+        df = await executor.run(('intraday', metal, interval, days), predictor.fetcher.get_intraday_data, metal, interval, days)
+        if df is None or df.empty:
+            raise HTTPException(status_code=503, detail=f"No {interval} data available, please retry")
+        
+        with STAGE_SECONDS.time(stage='intraday'):
+            times = df.index.to_numpy(dtype='datetime64[s]')
+            closes = df['Close'].to_numpy(dtype=np.float64)
+            keep = METHODS[method](times.astype(np.int64), closes, points)
+            spread = get_city_spread(city)
+            factor = predictor.fetcher.purity_factors[purity] if metal == 'gold' else 1.0
+            prices = price_grid(np.append(closes[keep], closes[-1]), [factor], [unit], [spread])[0, 0, 0]
+        
+        response.headers['Cache-Control'] = f"public, max-age={int(INTRADAY_TTL)}"
+        return {
+            'metal': metal,
+            'purity': purity if metal == 'gold' else 'Pure',
+            'unit': unit,
+            'location': {'state': state, 'city': city},
+            'interval': interval,
+            'method': method,
+            'bars': len(df),
+            'points': len(keep),
+            'times': [f"{t}Z" for t in np.datetime_as_string(times[keep])],
+            'prices': prices[:-1].tolist(),
+            'latest': {'time': f"{times[-1]}Z", 'price': prices[-1].item()}
+        }
+        
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Intraday data is still loading, please retry")
+    except Exception as e:
+        logger.error(f"Intraday error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def get_history_pyramid(metal):
+    """The metal's history pyramid; a first (multi-year) fetch runs on the executor"""
+    if history.ready(metal):
+        return history.get(metal)
+    return await executor.run(('history', metal), history.get, metal)
+
+# Shed responses: the last good forecast, never cached downstream
+STALE_HEADERS = {'Cache-Control': 'no-store', 'Warning': '110 - "Response is Stale"', 'Retry-After': '1'}
+
+def check_rate_limit(request):
+    """429 with Retry-After once the client's token bucket is empty"""
+    wait = admission.rate_limit(client_key(request))
+    if wait:
+        raise HTTPException(
+            status_code=429, detail="Too many requests", headers={'Retry-After': str(max(1, math.ceil(wait)))}
+        )
+
+async def admitted_snapshots(metals):
+    """
+    Snapshots for metals under admission control: (snapshots, stale)
+
+    When the server is saturated (queue full, or no slot in time) or a
+    snapshot build times out, the last good snapshots are served instead,
+    flagged stale; 503 only when there is none yet.
+    """
+    try:
+        async with admission.slot():
+            return await asyncio.gather(*[get_snapshot(m) for m in metals]), False
+    except (Overloaded, asyncio.TimeoutError) as e:
+        last = [snapshots.peek(m) for m in metals]
+        if any(s is None for s in last):
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={'Retry-After': '1'})
+        admission.stats['stale_served'] += 1
+        logger.warning(f"Serving stale forecast for {', '.join(metals)}: {str(e) or type(e).__name__}")
+        return last, True
+
+def serving_model_version():
+    """Model version behind the forecasts this worker serves"""
+    return snapshots.model_version if SHARED else predictor.model_version
+
+def snapshot_cache_headers(snapshot, *params):
+    """ETag/Last-Modified/Cache-Control derived from a snapshot's data + model version"""
+    etag = http_cache.make_etag(*snapshot['version'], *params)
+    return http_cache.cache_headers(etag, http_cache.http_date(snapshot['timestamp']))
+
+async def get_snapshot(metal):
+    """
+    Return the base snapshot for metal without blocking the event loop
+    Builds (fetch + model) run on the executor, one per metal at a time
+    """
+    if snapshots.ready(metal):
+        return snapshots.get(metal)
+    return await executor.run(metal, snapshots.get, metal)
+
+def localize(snapshot, metal, purity, state, city, unit):
+    """Apply purity, unit and city spread to a 24K base snapshot"""
+    purity = purity if metal == 'gold' else '24K'
+    city_spread = get_city_spread(city)
+    
+    current_price_per_gram = round(predictor.fetcher.apply_purity(snapshot['current_price'], metal, purity), 2)
+    current_price_total = current_price_per_gram * unit
+    current_price_localized = current_price_total * (1 + city_spread / 100)
+    
+    forecast = []
+    for day_pred in snapshot['forecast']:
+        price_per_gram = round(predictor.fetcher.apply_purity(day_pred['price'], metal, purity), 2)
+        price_total = price_per_gram * unit
+        localized_price = price_total * (1 + city_spread / 100)
+        
+        forecast.append({
+            'day': day_pred['day'],
+            'price': round(localized_price, 2),
+            'price_per_gram': price_per_gram,
+            'trend': day_pred['trend'],
+            'confidence': day_pred['confidence']
+        })
+        if 'band' in day_pred:
+            forecast[-1]['band'] = dict(
+                (name, round(round(predictor.fetcher.apply_purity(price, metal, purity), 2) * unit * (1 + city_spread / 100), 2))
+                for name, price in day_pred['band'].items()
+            )
+            forecast[-1]['prob_up'] = day_pred['prob_up']
+    
+    week_average = sum([f['price'] for f in forecast]) / len(forecast)
+    week_trend = ((forecast[-1]['price'] - current_price_localized) / current_price_localized) * 100
+    
+    return {
+        'metal': metal,
+        'purity': purity if metal == 'gold' else 'Pure',
+        'unit': unit,
+        'unit_label': f"{unit} gram{'s' if unit != 1 else ''}",
+        'location': {'state': state, 'city': city},
+        'currentPrice': round(current_price_localized, 2),
+        'currentPricePerGram': round(current_price_per_gram * (1 + city_spread / 100), 2),
+        'forecast': forecast,
+        'weekAverage': round(week_average, 2),
+        'weekTrend': round(week_trend, 2),
+        'spread': city_spread,
+        'timestamp': snapshot['timestamp']
+    }
+
 @router.get("/purities")
-async def get_purities():
+async def get_purities(request: Request, response: Response):
     """Get available gold purities"""
-    return {
+    body = {
         'gold': GOLD_PURITIES,
         'silver': ['Pure']
     }
+    return static_response(request, response, body)
 
 @router.get("/units")
-async def get_units(metal: str = Query("gold")):
+async def get_units(request: Request, response: Response, metal: str = Query("gold")):
     """Get available units for metal"""
     if metal == 'gold':
-        return {'units': GOLD_UNITS, 'label': 'grams'}
+        body = {'units': GOLD_UNITS, 'label': 'grams'}
     else:
-        return {'units': SILVER_UNITS, 'label': 'grams'}
\ No newline at end of file
+        body = {'units': SILVER_UNITS, 'label': 'grams'}
+    return static_response(request, response, body)
+
+def static_response(request, response, body):
+    """Option lists only change with a deploy, so the body itself is the version"""
+    headers = http_cache.cache_headers(http_cache.make_etag(body), max_age=http_cache.STATIC_MAX_AGE, swr=0)
+    if http_cache.is_not_modified(request, headers['ETag']):
+        return http_cache.not_modified_response(headers)
+    response.headers.update(headers)
+    return body
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Market-data cache counters, price store and intraday buffer coverage, and admission counts"""
+    return {
+        **predictor.fetcher.cache_stats(),
+        'store': predictor.fetcher.store_stats(),
+        'intraday': predictor.fetcher.intraday_stats(),
+        'admission': admission.snapshot()
+    }
+
+
+@router.get("/models")
+async def get_models():
+    """Active model version, published versions and retrain status"""
+    registry = await asyncio.to_thread(predictor.registry.describe)
+    return {
+        'serving': serving_model_version(),
+        **registry,
+        'retrain': scheduler.status()
+    }
+
+def require_admin(request: Request):
+    """403 unless the request carries the configured admin token"""
+    token = request.headers.get('x-admin-token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.post("/models/rollback")
+async def rollback_models(request: Request, version: Optional[str] = Query(None)):
+    """Serve an earlier model version (the previous one by default)"""
+    require_admin(request)
+    try:
+        if SHARED:
+            # Only move ACTIVE; the refresher follows it on its next cycle
+            active = await asyncio.to_thread(predictor.registry.rollback, version)
+        else:
+            active = await asyncio.to_thread(predictor.rollback, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'active': active}
+
+@router.post("/refresh-models")
+async def refresh_models(request: Request):
+    """Start a background retrain; the new version is swapped in when done"""
+    require_admin(request)
+    if SHARED:
+        raise HTTPException(status_code=409, detail="Retrains run in the refresher process")
+    started = scheduler.trigger()
+    return {'started': started, 'retrain': scheduler.status()}
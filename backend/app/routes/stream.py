@@ -0,0 +1,113 @@
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.routes import predictions
+from app.utils.streaming import PriceStreamHub, CLOSE
+from websockets.exceptions import ConnectionClosed
+import asyncio
+import json
+import logging
+
+router = APIRouter()
+hub = PriceStreamHub(predictions.get_snapshot, predictions.localize)
+hub.register_metrics()
+
+logger = logging.getLogger(__name__)
+
+# SSE comment line sent when idle so proxies keep the connection open
+SSE_HEARTBEAT_SECONDS = 15
+
+@router.websocket("/stream")
+async def stream_prices(
+    websocket: WebSocket,
+    metal: str = Query("gold"),
+    state: str = Query("Maharashtra"),
+    city: str = Query("Mumbai"),
+    purity: str = Query("22K"),  # For gold only
+    unit: int = Query(10)  # grams
+):
+    """
+    Live localized prices over WebSocket
+    First message is the full payload ({"type": "snapshot"}), then only
+    changed fields ({"type": "update"}) whenever new market data arrives.
+    """
+    try:
+        if metal not in ('gold', 'silver'):
+            raise HTTPException(status_code=400, detail="Invalid metal")
+        predictions.validate_selection(metal, state, city, purity, unit)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    await websocket.accept()
+    try:
+        subscriber = await hub.subscribe(metal, purity, state, city, unit)
+    except Exception as e:
+        logger.error(f"Stream subscribe error: {str(e)}")
+        await websocket.close(code=1011, reason="Prices unavailable")
+        return
+    
+    async def send():
+        while True:
+            message = await subscriber.queue.get()
+            if message is CLOSE:
+                await websocket.close(code=1013, reason="Consumer too slow")
+                return
+            await websocket.send_json(message)
+    
+    async def receive():
+        # Clients don't need to send anything; this just notices disconnects
+        while True:
+            await websocket.receive_text()
+    
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        hub.unsubscribe(subscriber)
+        for task in tasks:
+            task.cancel()
+        # wait() (unlike gather) keeps a server-side cancellation intact
+        await asyncio.wait(tasks)
+        # Retrieve every outcome: a disconnect surfaces as a task's exception
+        for task in tasks:
+            if task.done() and not task.cancelled():
+                error = task.exception()
+                if error is not None and not isinstance(error, (WebSocketDisconnect, ConnectionClosed)):
+                    logger.error(f"Stream error: {error!r}")
+
+@router.get("/stream/sse")
+async def stream_prices_sse(
+    request: Request,
+    metal: str = Query("gold", regex="^(gold|silver)$"),
+    state: str = Query("Maharashtra"),
+    city: str = Query("Mumbai"),
+    purity: str = Query("22K", regex="^(18K|22K|24K)$"),  # For gold only
+    unit: int = Query(10)  # grams
+):
+    """Same stream as /stream, as Server-Sent Events for clients without WebSockets"""
+    predictions.validate_selection(metal, state, city, purity, unit)
+    
+    try:
+        subscriber = await hub.subscribe(metal, purity, state, city, unit)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Prediction timed out, please retry")
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is CLOSE:
+                    return
+                yield f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from app.utils.metrics import CallbackGauge
+
+logger = logging.getLogger(__name__)
+
+# Requests doing forecast work at once, how many more may wait for a slot
+# (and for how long) before they are shed
+ADMIT_CONCURRENCY = int(os.getenv("SONA_ADMIT_CONCURRENCY", "64"))
+ADMIT_QUEUE = int(os.getenv("SONA_ADMIT_QUEUE", "256"))
+ADMIT_QUEUE_TIMEOUT = float(os.getenv("SONA_ADMIT_QUEUE_TIMEOUT", "2"))
+
+# Per-client token bucket: sustained requests/second and burst size. Off
+# unless set (0): behind a proxy without SONA_TRUST_PROXY every client
+# would share the proxy's bucket
+RATE_LIMIT = float(os.getenv("SONA_RATE_LIMIT", "0"))
+RATE_BURST = float(os.getenv("SONA_RATE_BURST", "40"))
+MAX_TRACKED_CLIENTS = 10000
+
+# Take the client from X-Forwarded-For (only behind a trusted proxy), and
+# how many proxies in front of the app append to it
+TRUST_PROXY = os.getenv("SONA_TRUST_PROXY", "0") == "1"
+TRUSTED_HOPS = max(1, int(os.getenv("SONA_TRUSTED_HOPS", "1")))
+
+
+class Overloaded(Exception):
+    """No slot and no room in the queue (or the wait timed out)"""
+
+
+class TokenBuckets:
+    """
+    One token bucket per client key, least recently seen dropped first
+
+    Buckets refill lazily on access, so idle clients cost nothing but
+    their entry.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, max_clients=MAX_TRACKED_CLIENTS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_clients = max_clients
+        self.clock = clock
+        self.buckets = OrderedDict()  # key -> [tokens, updated_at]
+
+    def take(self, key):
+        """Spend one token; returns 0 when allowed, else seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.burst, now]
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue, plus per-client rate limits
+
+    At most `limit` requests hold a slot; up to `queue_size` more wait
+    for one, each for at most `queue_timeout` seconds. Anything beyond is
+    rejected immediately with Overloaded, so a burst degrades into fast
+    fallback responses instead of an ever-growing backlog that also starves
+    /health. Runs on the event loop; no locking needed.
+    """
+
+    def __init__(self, limit=ADMIT_CONCURRENCY, queue_size=ADMIT_QUEUE, queue_timeout=ADMIT_QUEUE_TIMEOUT,
+                 rate=RATE_LIMIT, burst=RATE_BURST):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.buckets = TokenBuckets(rate, burst)
+        if rate and not TRUST_PROXY:
+            logger.warning(
+                f"Rate limit {rate:g}/s is keyed on the peer address; behind a proxy or CDN "
+                f"set SONA_TRUST_PROXY=1, or every client shares the proxy's bucket"
+            )
+        self.active = 0
+        self.waiting = 0
+        self.stats = {
+            'admitted': 0, 'queued': 0, 'shed': 0, 'queue_timeouts': 0,
+            'rate_limited': 0, 'stale_served': 0, 'max_waiting': 0
+        }
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    def rate_limit(self, client):
+        """0 when the client may proceed, else the Retry-After seconds"""
+        wait = self.buckets.take(client)
+        if wait:
+            self.stats['rate_limited'] += 1
+        return wait
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the `limit` slots for the body; raises Overloaded instead of queueing without bound"""
+        semaphore = self.semaphore
+        if semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.stats['shed'] += 1
+                raise Overloaded("Admission queue full")
+            self.stats['queued'] += 1
+            self.waiting += 1
+            self.stats['max_waiting'] = max(self.stats['max_waiting'], self.waiting)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats['shed'] += 1
+                self.stats['queue_timeouts'] += 1
+                raise Overloaded(f"No slot within {self.queue_timeout:g}s")
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        self.stats['admitted'] += 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+    def snapshot(self):
+        return {**self.stats, 'active': self.active, 'waiting': self.waiting, 'clients': len(self.buckets.buckets)}
+
+    def register_metrics(self):
+        CallbackGauge(
+            "sona_admission", "Admission control: admitted/queued/shed/rate-limited counts and current load", ["stat"],
+            lambda: dict(((k,), v) for k, v in self.snapshot().items())
+        )
+
+
+def client_key(request, trusted_hops=TRUSTED_HOPS):
+    """
+    Rate-limit identity: the peer address, or behind trusted proxies the
+    X-Forwarded-For entry `trusted_hops` from the right, the address the
+    outermost trusted proxy saw. Entries left of it are client-supplied
+    and can be forged.
+    """
+    if TRUST_PROXY:
+        forwarded = request.headers.get('x-forwarded-for')
+        hops = [hop.strip() for hop in forwarded.split(',')] if forwarded else []
+        if hops:
+            return hops[max(0, len(hops) - trusted_hops)]
+    return request.client.host if request.client else 'unknown'
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingExecutor:
+    """
+    Run blocking work on a bounded thread pool without stalling the event loop
+
+    Concurrent calls with the same key share one in-flight computation.
+    Each caller waits at most `timeout` seconds; a timed-out caller gives up
+    but the shared computation keeps running for the others.
+    """
+
+    def __init__(self, max_workers, timeout, thread_name_prefix="sona-worker"):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._inflight = {}
+        self.stats = {'submitted': 0, 'coalesced': 0, 'timeouts': 0}
+
+    async def run(self, key, fn, *args):
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, fn, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.stats['submitted'] += 1
+        else:
+            self.stats['coalesced'] += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.warning(f"Timed out after {self.timeout}s waiting for {key!r}")
+            raise
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
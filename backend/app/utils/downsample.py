@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def bucket_edges(n, buckets):
+    """Row boundaries splitting n rows into `buckets` near-equal buckets"""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def minmax_indices(y, edges):
+    """
+    Indices of each bucket's minimum and maximum, in order
+
+    One stable sort by (bucket, value) puts every bucket's min at its first
+    edge and its max just before the next, so there is no per-bucket loop.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    sizes = np.diff(edges)
+    edges = edges[:-1][sizes > 0]
+    sizes = sizes[sizes > 0]
+    bucket = np.repeat(np.arange(len(sizes)), sizes)
+    order = np.lexsort((y, bucket))
+    return np.unique(np.concatenate([order[edges], order[edges + sizes - 1]]))
+
+
+def minmax(y, points):
+    """Min/max buckets: about `points` indices keeping every bucket's extremes"""
+    n = len(y)
+    if n <= points:
+        return np.arange(n)
+    return minmax_indices(y, bucket_edges(n, max(1, points // 2)))
+
+
+def lttb(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets: `points` indices that keep the visual shape
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    chosen point and the average of the next bucket.
+    """
+    n = len(y)
+    if n <= points or points < 3:
+        return np.arange(n) if n <= points else np.array([0, n - 1])
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = bucket_edges(n - 2, points - 2) + 1
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        chosen[i + 1] = a
+    return chosen
+
+
+METHODS = {
+    'lttb': lttb,
+    'minmax': lambda x, y, points: minmax(y, points)
+}
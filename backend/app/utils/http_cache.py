@@ -0,0 +1,54 @@
+import os
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Response
+
+# Browser/CDN freshness for forecast responses; static option lists live longer
+FORECAST_MAX_AGE = int(os.getenv("SONA_HTTP_MAX_AGE", "60"))
+FORECAST_STALE_WHILE_REVALIDATE = int(os.getenv("SONA_HTTP_SWR", "300"))
+STATIC_MAX_AGE = 86400
+
+
+def make_etag(*parts):
+    """Weak ETag over the data/model version and request parameters"""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def http_date(timestamp):
+    """RFC 7231 date from a snapshot's ISO timestamp (naive means local time)"""
+    dt = datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp
+    return format_datetime(dt.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def cache_headers(etag, last_modified=None, max_age=FORECAST_MAX_AGE, swr=FORECAST_STALE_WHILE_REVALIDATE):
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f"public, max-age={max_age}" + (f", stale-while-revalidate={swr}" if swr else "")
+    }
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    return headers
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(',')]
+        # Weak comparison: W/"x" matches "x"
+        bare = etag[2:] if etag.startswith('W/') else etag
+        return '*' in tags or any((t[2:] if t.startswith('W/') else t) == bare for t in tags)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(headers):
+    return Response(status_code=304, headers=headers)
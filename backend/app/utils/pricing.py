@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def price_grid(base_prices, purity_factors, units, spreads):
+    """
+    Localized price grid via broadcasting
+
+    base_prices:    (D,) 24K prices per gram (current price first, then forecast days)
+    purity_factors: (P,)
+    units:          (U,) grams
+    spreads:        (C,) city spreads in percent
+
+    Returns an array of shape (C, P, U, D). Per-gram prices are rounded to
+    paise before scaling, same as the single-city /predict path.
+    """
+    base_prices = np.asarray(base_prices, dtype=np.float64)
+    per_gram = np.round(np.asarray(purity_factors, dtype=np.float64)[:, None] * base_prices[None, :], 2)
+    multipliers = 1 + np.asarray(spreads, dtype=np.float64) / 100
+
+    grid = (
+        per_gram[None, :, None, :]
+        * np.asarray(units, dtype=np.float64)[None, None, :, None]
+        * multipliers[:, None, None, None]
+    )
+    return np.round(grid, 2)
@@ -0,0 +1,113 @@
+"""
+Seqlock-published state in a memory-mapped file
+
+One writer process publishes a payload; any number of reader processes map
+the same file read-only and share its pages. The header holds a generation
+counter that is odd while a write is in progress:
+
+    writer: gen += 1 (odd), write payload + length, gen += 1 (even)
+    reader: g1 = gen; copy payload; g2 = gen; valid when g1 == g2 and even
+
+Readers never take a lock and never block the writer; a torn read is simply
+retried. Checking for an update is one 8-byte read of the counter.
+"""
+
+import os
+import mmap
+import time
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File shared by the refresher and the API workers (tmpfs such as /dev/shm
+# keeps it in memory); empty means every worker computes its own state
+SHARED_STATE_PATH = os.getenv("SONA_SHARED_STATE", "")
+SHARED_STATE_SIZE = int(os.getenv("SONA_SHARED_STATE_SIZE", str(1 << 20)))
+
+MAGIC = b"SONASHM1"
+HEADER = struct.Struct("<8sQQ")  # magic, generation, payload length
+GENERATION = struct.Struct("<Q")
+GENERATION_OFFSET = 8
+READ_RETRIES = 100
+
+
+class SharedState:
+    def __init__(self, path=SHARED_STATE_PATH, size=SHARED_STATE_SIZE, writer=False):
+        self.path = path
+        self.size = size
+        self.writer = writer
+        self._file = None
+        self._map = None
+        if writer:
+            self._open_writer()
+
+    def _open_writer(self):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) == self.size
+        self._file = open(self.path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.truncate(self.size)
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+        magic, generation, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            HEADER.pack_into(self._map, 0, MAGIC, 0, 0)
+        elif generation % 2:
+            # A previous writer died mid-publish; the payload is torn, so
+            # mark the state empty until the next publish
+            HEADER.pack_into(self._map, 0, MAGIC, generation + 1, 0)
+
+    def _mapping(self):
+        """Read-only mapping, opened once the writer has created the file"""
+        if self._map is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size < HEADER.size:
+                        return None
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                return None
+            if self._map[:len(MAGIC)] != MAGIC:
+                self._map.close()
+                self._map = None
+        return self._map
+
+    def generation(self):
+        """Current generation (0 before anything was published)"""
+        mapping = self._mapping()
+        if mapping is None:
+            return 0
+        return GENERATION.unpack_from(mapping, GENERATION_OFFSET)[0]
+
+    def publish(self, payload):
+        """Writer only: make payload (bytes) the current state; returns its generation"""
+        if HEADER.size + len(payload) > self.size:
+            raise ValueError(f"Shared state payload of {len(payload)} bytes exceeds {self.size}")
+        generation = GENERATION.unpack_from(self._map, GENERATION_OFFSET)[0]
+        GENERATION.pack_into(self._map, GENERATION_OFFSET, generation + 1)
+        self._map[HEADER.size:HEADER.size + len(payload)] = payload
+        HEADER.pack_into(self._map, 0, MAGIC, generation + 1, len(payload))
+        GENERATION.pack_into(self._map, GENERATION_OFFSET, generation + 2)
+        return generation + 2
+
+    def read(self):
+        """(generation, payload bytes) of a consistent snapshot, or None if none is available"""
+        mapping = self._mapping()
+        if mapping is None:
+            return None
+        for attempt in range(READ_RETRIES):
+            _, generation, length = HEADER.unpack_from(mapping, 0)
+            if generation % 2 == 0:
+                payload = mapping[HEADER.size:HEADER.size + length]
+                if GENERATION.unpack_from(mapping, GENERATION_OFFSET)[0] == generation:
+                    return (generation, payload) if length else None
+            time.sleep(0 if attempt < 10 else 0.001)
+        logger.warning("Shared state stayed mid-write; keeping the previous copy")
+        return None
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,132 @@
+import os
+import asyncio
+import logging
+from app.utils.metrics import CallbackGauge
+
+logger = logging.getLogger(__name__)
+
+# How often the hub checks for a new snapshot, and how many undelivered
+# messages a subscriber may have before it is treated as too slow and dropped
+STREAM_POLL_SECONDS = float(os.getenv("SONA_STREAM_POLL", "5"))
+STREAM_QUEUE_SIZE = int(os.getenv("SONA_STREAM_QUEUE", "8"))
+
+CLOSE = object()  # queue sentinel: stop sending and close the connection
+
+
+class Subscriber:
+    __slots__ = ('metal', 'params', 'queue', 'last', 'dropped')
+
+    def __init__(self, metal, params, queue_size=STREAM_QUEUE_SIZE):
+        self.metal = metal
+        self.params = params  # (purity, state, city, unit)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.last = None
+        self.dropped = False
+
+
+class PriceStreamHub:
+    """
+    Fan-out of localized price updates to streaming subscribers
+
+    The hub polls the per-metal snapshot; when its version changes it
+    localizes once per distinct (purity, state, city, unit) and pushes only
+    the fields that changed to each subscriber's bounded queue. A subscriber
+    whose queue is full is dropped rather than slowing everyone else down.
+    """
+
+    def __init__(self, get_snapshot, localize, poll_seconds=STREAM_POLL_SECONDS):
+        self.get_snapshot = get_snapshot  # async (metal) -> snapshot
+        self.localize = localize          # (snapshot, metal, purity, state, city, unit) -> payload
+        self.poll_seconds = poll_seconds
+        self.subscribers = {'gold': set(), 'silver': set()}
+        self.versions = {}
+        self.stats = {'subscribed': 0, 'dropped': 0, 'updates': 0, 'messages': 0}
+        self._task = None
+
+    def subscriber_count(self):
+        return sum(len(subs) for subs in self.subscribers.values())
+
+    async def subscribe(self, metal, purity, state, city, unit):
+        """Register a subscriber and queue its initial full payload"""
+        subscriber = Subscriber(metal, (purity, state, city, unit))
+        snapshot = await self.get_snapshot(metal)
+        payload = self.localize(snapshot, metal, *subscriber.params)
+        subscriber.last = payload
+        subscriber.queue.put_nowait({'type': 'snapshot', 'data': payload})
+        self.subscribers[metal].add(subscriber)
+        self.stats['subscribed'] += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers[subscriber.metal].discard(subscriber)
+
+    def publish(self, metal, snapshot):
+        """Push a new snapshot to every subscriber of metal; returns messages queued"""
+        localized = {}
+        sent = 0
+        for subscriber in list(self.subscribers[metal]):
+            payload = localized.get(subscriber.params)
+            if payload is None:
+                payload = localized[subscriber.params] = self.localize(snapshot, metal, *subscriber.params)
+
+            previous = subscriber.last or {}
+            changes = dict((k, v) for k, v in payload.items() if previous.get(k) != v)
+            if not changes:
+                continue
+            try:
+                subscriber.queue.put_nowait({'type': 'update', 'data': changes})
+                subscriber.last = payload
+                sent += 1
+            except asyncio.QueueFull:
+                self.drop(subscriber)
+
+        self.stats['updates'] += 1
+        self.stats['messages'] += sent
+        return sent
+
+    def drop(self, subscriber):
+        """Disconnect a consumer that can't keep up"""
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.stats['dropped'] += 1
+        # Make room for the sentinel so the sender wakes up and closes
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(CLOSE)
+
+    async def poll_once(self):
+        for metal, subs in self.subscribers.items():
+            if not subs:
+                continue
+            try:
+                snapshot = await self.get_snapshot(metal)
+            except Exception as e:
+                logger.warning(f"Stream poll failed for {metal}: {str(e)}")
+                continue
+            if snapshot['version'] != self.versions.get(metal):
+                self.versions[metal] = snapshot['version']
+                self.publish(metal, snapshot)
+
+    async def run(self):
+        while True:
+            await self.poll_once()
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def register_metrics(self):
+        CallbackGauge(
+            "sona_stream", "Streaming subscribers and fan-out counters", ["stat"],
+            lambda: dict([(('subscribers',), self.subscriber_count())] + [((k,), v) for k, v in self.stats.items()])
+        )
@@ -0,0 +1,37 @@
+"""
+Walk-forward backtest of the price models over a long history
+Prints per-horizon MAE / MAPE / hit rate without touching the served models
+"""
+
+from app.data.fetcher import MarketDataFetcher
+from app.models.training import build_dataset
+from app.models.backtest import backtest, BACKTEST_STEP
+import argparse
+import json
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=1825, help="history window in calendar days")
+    parser.add_argument("--step", type=int, default=BACKTEST_STEP, help="rows between refits")
+    parser.add_argument("--metal", choices=['gold', 'silver'], action='append')
+    args = parser.parse_args()
+    
+    fetcher = MarketDataFetcher()
+    report = {}
+    for metal in args.metal or ['gold', 'silver']:
+        logger.info(f"Backtesting {metal} over {args.days} days...")
+        results, timings = backtest(build_dataset(fetcher, metal, days=args.days), step=args.step)
+        report[metal] = {'horizons': results, 'timings': timings}
+    
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Micro-benchmarks for the prediction hot path
+
+Runs fully offline against deterministic synthetic OHLC frames.
+
+    python -m benchmarks.bench_predict                      # run, print, write results
+    python -m benchmarks.bench_predict --save-baseline      # store as the new baseline
+    python -m benchmarks.bench_predict --baseline benchmarks/baseline.json --threshold 0.25
+
+Exits with status 1 when any stage is slower than baseline * (1 + threshold).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import logging
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticSource, ohlc_frame
+
+HISTORY_DAYS = [90, 365, 3650]
+
+MODEL_SIZES = {
+    'small': {'n_estimators': 50, 'max_depth': 3},
+    'default': {},
+    'large': {'n_estimators': 800, 'max_depth': 7}
+}
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results.json")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """Median and best seconds per call, timeit-style"""
+    fn()  # warm up caches, lazy imports, allocations
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed * repeat >= min_time or number >= 1_000_000:
+            break
+        number *= 10
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    return {
+        'median_us': round(statistics.median(samples) * 1e6, 3),
+        'min_us': round(min(samples) * 1e6, 3),
+        'iterations': number * repeat
+    }
+
+
+def synthetic_fetcher():
+    from app.data.fetcher import MarketDataFetcher
+
+    source = SyntheticSource(history_days=max(HISTORY_DAYS))
+    return MarketDataFetcher(source=source, bulk_source=source.download)
+
+
+def converted_frame(days):
+    """Synthetic gold history already in INR/gram, like get_historical_data returns"""
+    return synthetic_fetcher().get_historical_data('gold', days=days)
+
+
+def bench_features(results, days_list):
+    from app.models.features import create_features, RollingFeatureState
+
+    for days in days_list:
+        df = converted_frame(days)
+        results[f"features.create_features[{days}d]"] = measure(lambda: create_features(df))
+        results[f"features.incremental_seed[{days}d]"] = measure(lambda: RollingFeatureState.from_frame(df))
+
+    df = converted_frame(365)
+    state = RollingFeatureState.from_frame(df)
+    bar = df.to_numpy(dtype=np.float64)[-1]
+    index = df.index[-1]
+
+    def update():
+        state.update(index, bar)
+        state.row()
+
+    results["features.incremental_update"] = measure(update)
+
+
+def bench_fetch(results, days_list):
+    fetcher = synthetic_fetcher()
+    for days in days_list:
+        results[f"fetch.cached[{days}d]"] = measure(lambda: fetcher.get_historical_data('gold', days=days))
+
+
+def bench_training(results, days_list, sizes):
+    from app.models.features import create_features
+    from app.models.training import horizons_xy, fit_metal
+
+    for days in days_list:
+        X, Y = horizons_xy(create_features(converted_frame(days)))
+        for size in sizes:
+            params = MODEL_SIZES[size]
+            results[f"train.fit[{days}d,{size}]"] = measure(
+                lambda: fit_metal(X, Y, params=params), min_time=0, repeat=3
+            )
+
+
+def bench_inference(results, sizes):
+    from app.models.features import create_features
+    from app.models.scaler import FeatureScaler
+    from app.models.training import horizons_xy, fit_metal
+    from app.models.trees import TreeEnsemble
+
+    X, Y = horizons_xy(create_features(converted_frame(365)))
+    row = X.to_numpy()[-1:]
+    for size in sizes:
+        booster, _ = fit_metal(X, Y, params=MODEL_SIZES[size])
+        scaler = FeatureScaler.from_booster(booster)
+        ensemble = TreeEnsemble.from_booster(booster)
+        results[f"inference.xgb[{size}]"] = measure(lambda: booster.inplace_predict(scaler.transform(row)))
+        results[f"inference.numpy[{size}]"] = measure(lambda: ensemble.inplace_predict(scaler.transform(row)))
+
+
+def bench_predict(results, days_list, models_dir):
+    from app.models.predictor import PricePredictor
+
+    predictor = PricePredictor(models_dir=models_dir, fetcher=synthetic_fetcher())
+    predictor.ensure_models()
+
+    for days in days_list:
+        df = predictor.fetcher.get_historical_data('gold', days=days)
+        results[f"predict.base[{days}d]"] = measure(lambda: predictor.predict_base('gold', df))
+
+        def cold():
+            predictor.feature_states.clear()
+            predictor.predict_base('gold', df)
+
+        results[f"predict.base_cold_features[{days}d]"] = measure(cold)
+
+
+def bench_localization(results):
+    from app.routes.predictions import localize, predictor, GOLD_PURITIES, GOLD_UNITS
+    from app.utils.city_spreads import CITY_SPREADS
+    from app.utils.pricing import price_grid
+
+    prices = ohlc_frame('GC=F', 8)['Close'].to_numpy() * 83 / 31.1035
+    snapshot = {
+        'current_price': float(prices[0]),
+        'forecast': [{'day': d, 'price': float(p), 'trend': 0.0, 'confidence': 90} for d, p in enumerate(prices[1:], 1)],
+        'timestamp': 'bench'
+    }
+    results["localize.single"] = measure(lambda: localize(snapshot, 'gold', '22K', 'Maharashtra', 'Mumbai', 10))
+
+    factors = [predictor.fetcher.purity_factors[p] for p in GOLD_PURITIES]
+    spreads = list(CITY_SPREADS.values())
+    results["localize.grid_all_cities"] = measure(lambda: price_grid(prices, factors, GOLD_UNITS, spreads))
+
+
+def environment():
+    import pandas
+    try:
+        import xgboost
+        xgb_version = xgboost.__version__
+    except ImportError:
+        xgb_version = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'xgboost': xgb_version
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return [(name, baseline_us, current_us, ratio)] for stages over the threshold"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        ratio = current['median_us'] / previous['median_us'] if previous['median_us'] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append((name, previous['median_us'], current['median_us'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sona-AI prediction micro-benchmarks")
+    parser.add_argument("--days", default=",".join(map(str, HISTORY_DAYS)), help="history lengths in days")
+    parser.add_argument("--sizes", default=",".join(MODEL_SIZES), help="model sizes to train/infer")
+    parser.add_argument("--stages", default="features,fetch,predict,inference,localize,train",
+                        help="comma-separated stage groups to run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    days_list = [int(d) for d in args.days.split(',')]
+    sizes = args.sizes.split(',')
+    stages = set(args.stages.split(','))
+    results = {}
+
+    started = time.perf_counter()
+    if 'features' in stages:
+        bench_features(results, days_list)
+    if 'fetch' in stages:
+        bench_fetch(results, days_list)
+    if 'predict' in stages:
+        with tempfile.TemporaryDirectory() as models_dir:
+            bench_predict(results, days_list, models_dir)
+    if 'inference' in stages:
+        bench_inference(results, sizes)
+    if 'localize' in stages:
+        bench_localization(results)
+    if 'train' in stages:
+        bench_training(results, days_list, sizes)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'duration_s': round(time.perf_counter() - started, 1),
+        'environment': environment(),
+        'results': results
+    }
+
+    width = max(len(name) for name in results) if results else 0
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['median_us']:>14,.1f} us  (min {r['min_us']:,.1f}, n={r['iterations']})")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --save-baseline)")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {before:,.1f} us -> {after:,.1f} us ({ratio:.2f}x)")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
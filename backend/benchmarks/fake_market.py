@@ -0,0 +1,142 @@
+"""
+Local stand-in for the market-data upstream, for load tests
+
+Serves deterministic synthetic bars (benchmarks.synthetic) ending today over
+HTTP, with injected latency and failures. Point the API at it with
+SONA_MARKET_DATA_URL:
+
+    python -m benchmarks.fake_market --port 8900 --latency-ms 150 --error-rate 0.05
+    SONA_MARKET_DATA_URL=http://127.0.0.1:8900 uvicorn app.main:app
+
+GET /history?symbols=GC=F,SI=F&start=2024-01-01&end=2025-01-01   (or &period=1d)
+    {symbol: {'dates': [...], 'Open': [...], ...}}
+GET /history?symbols=GC=F&interval=15m&start=2025-01-01T00:00:00&end=...
+    the same with intraday bars (UTC timestamps)
+GET /stats
+    request / injected-failure counters
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from benchmarks.synthetic import SyntheticSource
+
+
+class FakeMarket:
+    """Synthetic bars plus the fault model; shared by every handler thread"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, drop_rate=0.0, seed=42):
+        self.source = SyntheticSource(history_days=4000, end=pd.Timestamp.today().normalize())
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'errors_injected': 0, 'drops_injected': 0}
+        self._lock = threading.Lock()
+
+    def fault(self):
+        """'drop', 'error' or None for the next request (drawn under the lock)"""
+        with self._lock:
+            self.stats['requests'] += 1
+            draw = self.rng.random()
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        time.sleep(delay)
+        if draw < self.drop_rate:
+            kind = 'drop'
+        elif draw < self.drop_rate + self.error_rate:
+            kind = 'error'
+        else:
+            return None
+        with self._lock:
+            self.stats[f"{kind}s_injected"] += 1
+        return kind
+
+    def history(self, symbols, start=None, end=None, period=None, interval='1d'):
+        start = pd.Timestamp(start) if start else None
+        end = pd.Timestamp(end) if end else None
+        body = {}
+        for symbol in symbols:
+            df = self.source.window(symbol, start, end, period, interval)
+            if interval == '1d':
+                body[symbol] = {'dates': [d.strftime('%Y-%m-%d') for d in df.index]}
+            else:
+                body[symbol] = {'dates': [d.isoformat() for d in df.index]}
+            body[symbol].update((column, df[column].tolist()) for column in df.columns)
+        return body
+
+
+def make_handler(market):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+            if url.path == '/stats':
+                return self.reply(200, market.stats)
+            if url.path != '/history' or not query.get('symbols'):
+                return self.reply(404, {'detail': 'unknown endpoint'})
+
+            fault = market.fault()
+            if fault == 'drop':
+                self.close_connection = True
+                self.connection.close()
+                return
+            if fault == 'error':
+                return self.reply(503, {'detail': 'injected failure'})
+            symbols = query['symbols'].split(',')
+            self.reply(200, market.history(symbols, query.get('start'), query.get('end'), query.get('period'),
+                                           query.get('interval', '1d')))
+
+        def reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(market, host='127.0.0.1', port=8900):
+    server = ThreadingHTTPServer((host, port), make_handler(market))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake market-data server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of connections closed without a reply")
+    args = parser.parse_args(argv)
+
+    market = FakeMarket(args.latency_ms, args.jitter_ms, args.error_rate, args.drop_rate)
+    server = serve(market, args.host, args.port)
+    print(f"Fake market data on http://{args.host}:{server.server_address[1]} ({date.today()})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
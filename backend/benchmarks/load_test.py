@@ -0,0 +1,403 @@
+"""
+End-to-end load test of the HTTP API
+
+Starts the fake market-data server (benchmarks.fake_market) and the API
+(uvicorn app.main:app) as subprocesses in a scratch directory, waits for
+/health/ready, then drives an open-loop request mix at a target rate and
+writes a JSON report.
+
+    python -m benchmarks.load_test --rps 200 --duration 30
+    python -m benchmarks.load_test --rps 500 --workers 4 --shared --latency-ms 200 --error-rate 0.05
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rps 100    # an already running API
+
+Requests are scheduled at fixed intervals whatever the server does, and
+latency is measured from the scheduled time, so a stalled server shows up
+as queueing in the percentiles instead of as a lower request rate.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from urllib.parse import urlencode, urlparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "load_results.json")
+
+# Share of requests per endpoint (the forecast dominates real traffic)
+DEFAULT_MIX = {'predict': 70, 'purities': 10, 'units': 10, 'health': 10}
+
+
+def parse_mix(value):
+    """"predict=70,health=30" -> {'predict': 70.0, 'health': 30.0}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def selection_options():
+    """Valid purities, units and locations, as the API defines them"""
+    from app.routes.predictions import GOLD_PURITIES, GOLD_UNITS, SILVER_UNITS
+    from app.utils.city_spreads import CITIES
+
+    return {'purities': GOLD_PURITIES, 'units': {'gold': GOLD_UNITS, 'silver': SILVER_UNITS}, 'cities': CITIES}
+
+
+def request_path(kind, rng, options):
+    """A realistic request for one endpoint kind: random metal, location, purity and unit"""
+    if kind == 'health':
+        return "/health"
+    metal = rng.choice(['gold', 'gold', 'gold', 'silver'])
+    if kind == 'purities':
+        return "/api/purities"
+    if kind == 'units':
+        return f"/api/units?metal={metal}"
+    cities = options['cities']
+    state = rng.choice(list(cities))
+    query = {
+        'metal': metal,
+        'state': state,
+        'city': rng.choice(cities[state]),
+        'purity': rng.choice(options['purities']),
+        'unit': rng.choice(options['units'][metal])
+    }
+    return f"/api/predict?{urlencode(query)}"
+
+
+class HttpClient:
+    """
+    Minimal asyncio HTTP/1.1 client with a pool of keep-alive connections
+
+    At most `connections` requests are in flight; the rest wait for a free
+    connection (and that wait counts towards their latency).
+    """
+
+    def __init__(self, host, port, connections):
+        self.host = host
+        self.port = port
+        self.limit = asyncio.Semaphore(connections)
+        self.idle = []
+        self.opened = 0
+
+    async def get(self, path):
+        async with self.limit:
+            while True:
+                reused = bool(self.idle)
+                if reused:
+                    reader, writer = self.idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+                    self.opened += 1
+                try:
+                    writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+                    status, keep_alive = await self._read_response(reader)
+                    break
+                except EOFError:
+                    # The server closed an idle keep-alive connection; retry on a new one
+                    writer.close()
+                    if not reused:
+                        raise ConnectionError("Connection closed by server")
+                except BaseException:
+                    writer.close()
+                    raise
+            if keep_alive:
+                self.idle.append((reader, writer))
+            else:
+                writer.close()
+            return status
+
+    @staticmethod
+    async def _read_response(reader):
+        line = await reader.readline()
+        if not line:
+            raise EOFError
+        status = int(line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await reader.readexactly(int(headers.get('content-length', 0)))
+        return status, headers.get('connection', '').lower() != 'close'
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        'p50': at(0.50),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'max': round(ordered[-1] * 1000, 2),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 2)
+    }
+
+
+async def drive(client, rps, duration, mix, timeout, rng, poisson=False):
+    """Issue requests for `duration` seconds; returns ([(kind, outcome, latency_s)], wall seconds)"""
+    loop = asyncio.get_running_loop()
+    options = selection_options()
+    kinds, weights = list(mix), list(mix.values())
+    results = []
+
+    async def one(kind, path, scheduled):
+        try:
+            status = await asyncio.wait_for(client.get(path), timeout)
+            outcome = status
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            outcome = type(e).__name__
+        results.append((kind, outcome, loop.time() - scheduled))
+
+    tasks = []
+    started = loop.time()
+    scheduled = started
+    while scheduled < started + duration:
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = rng.choices(kinds, weights)[0]
+        tasks.append(asyncio.create_task(one(kind, request_path(kind, rng, options), scheduled)))
+        scheduled += rng.expovariate(rps) if poisson else 1 / rps
+    await asyncio.gather(*tasks)
+    return results, loop.time() - started
+
+
+def summarize(results, wall):
+    """Throughput, error rate and latency percentiles overall and per endpoint"""
+    def block(rows):
+        errors = {}
+        for _, outcome, _ in rows:
+            if not isinstance(outcome, int) or outcome >= 400:
+                errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+        failed = sum(errors.values())
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(failed / len(rows), 4) if rows else 0.0,
+            'latency_ms': percentiles([latency for _, _, latency in rows])
+        }
+
+    summary = block(results)
+    ok = summary['requests'] - sum(summary['errors'].values())
+    summary['throughput_rps'] = round(summary['requests'] / wall, 1) if wall else 0.0
+    summary['ok_rps'] = round(ok / wall, 1) if wall else 0.0
+    summary['wall_seconds'] = round(wall, 2)
+    summary['endpoints'] = dict(
+        (kind, block([r for r in results if r[0] == kind])) for kind in sorted(set(r[0] for r in results))
+    )
+    return summary
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def http_json(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, json.loads(response.read() or b'null')
+
+
+def wait_ready(base_url, processes, timeout, confirmations):
+    """Poll /health/ready until `confirmations` consecutive 200s (one per worker, roughly)"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        for process in processes:
+            if process.poll() is not None:
+                raise RuntimeError(f"{' '.join(process.args[1:3])} exited with {process.returncode} during startup")
+        try:
+            status, _ = http_json(f"{base_url}/health/ready")
+        except OSError:
+            status = None
+        streak = streak + 1 if status == 200 else 0
+        if streak >= confirmations:
+            return
+        time.sleep(0.05 if streak else 0.5)
+    raise TimeoutError(f"API not ready after {timeout:g}s")
+
+
+def start_stack(args, workdir):
+    """Fake market data, optional shared-state refresher and the API; returns (processes, api url, market url)"""
+    market_port, api_port = free_port(), free_port()
+    market_url = f"http://127.0.0.1:{market_port}"
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])),
+        'SONA_MARKET_DATA_URL': market_url,
+        'SONA_PRICE_STORE': os.path.join(workdir, 'prices'),
+        # Startup trains models when the workdir has none; skip the slow backtest
+        'SONA_BACKTEST_ON_RETRAIN': os.environ.get('SONA_BACKTEST_ON_RETRAIN', '0'),
+        # Every simulated user shares one address; don't rate-limit it
+        'SONA_RATE_LIMIT': os.environ.get('SONA_RATE_LIMIT', '0')
+    }
+    if args.shared:
+        env['SONA_SHARED_STATE'] = os.path.join(workdir, 'shared-state')
+    log = open(os.path.join(workdir, 'load_test.log'), 'ab')
+
+    processes = [subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.fake_market', '--port', str(market_port),
+         '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+         '--error-rate', str(args.error_rate), '--drop-rate', str(args.drop_rate)],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )]
+    if args.shared:
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, 'refresh_state.py')],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        ))
+    processes.append(subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(api_port),
+         '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    ))
+    return processes, f"http://127.0.0.1:{api_port}", market_url
+
+
+def stop_stack(processes):
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run(args, base_url):
+    url = urlparse(base_url)
+    rng = random.Random(args.seed)
+    client = HttpClient(url.hostname, url.port or 80, args.connections)
+    try:
+        if args.warmup > 0:
+            await drive(client, args.rps, args.warmup, args.mix, args.timeout, rng, args.poisson)
+        results, wall = await drive(client, args.rps, args.duration, args.mix, args.timeout, rng, args.poisson)
+    finally:
+        client.close()
+    summary = summarize(results, wall)
+    summary['connections_opened'] = client.opened
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end API load test")
+    parser.add_argument("--rps", type=float, default=100, help="target request rate")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds at the same rate first")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. predict=70,purities=10,units=10,health=10")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument("--connections", type=int, default=256, help="max concurrent connections")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout (counted as an error)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="load an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--shared", action="store_true", help="run workers on shared state with a refresher process")
+    parser.add_argument("--workdir", help="API working directory (models/ is reused); default: a scratch dir")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--latency-ms", type=float, default=50, help="fake market-data latency")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake market-data 503 share")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fake market-data dropped-connection share")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    report = {
+        'started_at': datetime.now().isoformat(),
+        'config': {
+            'target_rps': args.rps,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'mix': args.mix,
+            'arrivals': 'poisson' if args.poisson else 'fixed',
+            'connections': args.connections,
+            'timeout': args.timeout
+        },
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        }
+    }
+
+    processes, scratch = [], None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            report['server'] = {'url': base_url}
+        else:
+            workdir = args.workdir or tempfile.mkdtemp(prefix="sona-load-")
+            scratch = None if args.workdir else workdir
+            processes, base_url, market_url = start_stack(args, workdir)
+            t = time.perf_counter()
+            wait_ready(base_url, processes, args.startup_timeout, confirmations=2 * args.workers)
+            report['server'] = {
+                'workers': args.workers,
+                'shared_state': args.shared,
+                'startup_seconds': round(time.perf_counter() - t, 1),
+                'market_data': {
+                    'latency_ms': args.latency_ms,
+                    'jitter_ms': args.jitter_ms,
+                    'error_rate': args.error_rate,
+                    'drop_rate': args.drop_rate
+                }
+            }
+
+        report['results'] = asyncio.run(run(args, base_url))
+
+        if processes:
+            report['server']['market_data']['stats'] = http_json(f"{market_url}/stats")[1]
+        try:
+            report['server']['cache'] = http_json(f"{base_url}/api/cache/stats")[1]
+        except OSError:
+            pass
+    finally:
+        stop_stack(processes)
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    with open(args.output, 'w') as f:
+        f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Load test for the price streaming fan-out
+
+In-process (default): thousands of hub subscribers on one event loop, a few
+snapshot updates, and a share of deliberately slow consumers that must be
+dropped instead of holding everyone else back.
+
+    python -m benchmarks.stream_load --subscribers 5000 --updates 20
+
+Against a running server, with real WebSocket clients:
+
+    python -m benchmarks.stream_load --url ws://127.0.0.1:8000/api/stream --subscribers 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import ohlc_frame
+
+
+def synthetic_snapshot(step):
+    prices = ohlc_frame('GC=F', 8, seed=step)['Close'].to_numpy() * 83 / 31.1035 * 1.03
+    return {
+        'version': (f"bar-{step}", 'bench'),
+        'current_price': float(prices[0]),
+        'forecast': [{'day': d, 'price': float(p), 'trend': 0.0, 'confidence': 90} for d, p in enumerate(prices[1:], 1)],
+        'timestamp': f"2025-01-01T00:00:{step % 60:02d}"
+    }
+
+
+def random_selection(rng):
+    from app.routes.predictions import GOLD_PURITIES, GOLD_UNITS
+    from app.utils.city_spreads import CITIES
+
+    state = rng.choice(list(CITIES))
+    return rng.choice(GOLD_PURITIES), state, rng.choice(CITIES[state]), rng.choice(GOLD_UNITS)
+
+
+async def run_in_process(args):
+    from app.routes.predictions import localize
+    from app.utils.streaming import PriceStreamHub, CLOSE
+
+    state = {'snapshot': synthetic_snapshot(0)}
+
+    async def get_snapshot(metal):
+        return state['snapshot']
+
+    hub = PriceStreamHub(get_snapshot, localize, poll_seconds=3600)
+    rng = random.Random(42)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    subscribers = [await hub.subscribe('gold', *random_selection(rng)) for _ in range(args.subscribers)]
+    subscribe_s = time.perf_counter() - started
+    memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+
+    slow = set(rng.sample(range(len(subscribers)), int(len(subscribers) * args.slow_fraction)))
+    received = [0] * len(subscribers)
+    closed = [False] * len(subscribers)
+
+    async def consume(i, subscriber):
+        while True:
+            message = await subscriber.queue.get()
+            if message is CLOSE:
+                closed[i] = True
+                return
+            received[i] += 1
+
+    consumers = [asyncio.create_task(consume(i, s)) for i, s in enumerate(subscribers) if i not in slow]
+
+    fanout = []
+    for step in range(1, args.updates + 1):
+        state['snapshot'] = synthetic_snapshot(step)
+        t = time.perf_counter()
+        await hub.poll_once()
+        fanout.append(time.perf_counter() - t)
+        await asyncio.sleep(0)  # let consumers drain
+
+    await asyncio.sleep(0.1)
+    for task in consumers:
+        task.cancel()
+
+    fast = [i for i in range(len(subscribers)) if i not in slow]
+    fanout_ms = sorted(f * 1000 for f in fanout)
+    return {
+        'mode': 'in-process',
+        'subscribers': args.subscribers,
+        'slow_consumers': len(slow),
+        'updates': args.updates,
+        'subscribe_seconds': round(subscribe_s, 3),
+        'hub_memory_mb': round(memory_mb, 1),
+        'fanout_ms_p50': round(fanout_ms[len(fanout_ms) // 2], 3),
+        'fanout_ms_max': round(fanout_ms[-1], 3),
+        'messages_per_second': round(hub.stats['messages'] / sum(fanout), 0) if sum(fanout) else None,
+        'fast_consumers_complete': sum(1 for i in fast if received[i] >= args.updates) / max(1, len(fast)),
+        'slow_consumers_dropped': sum(1 for i in slow if subscribers[i].dropped),
+        'hub_stats': hub.stats
+    }
+
+
+async def run_websocket(args):
+    import websockets
+
+    rng = random.Random(42)
+    received = []
+    connect_times = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        purity, state, city, unit = random_selection(rng)
+        url = f"{args.url}?metal=gold&purity={purity}&state={state}&city={city}&unit={unit}"
+        t = time.perf_counter()
+        try:
+            async with websockets.connect(url, open_timeout=30) as ws:
+                first = json.loads(await ws.recv())
+                connect_times.append(time.perf_counter() - t)
+                count = 1 if first.get('type') == 'snapshot' else 0
+                try:
+                    while True:
+                        await asyncio.wait_for(ws.recv(), timeout=args.hold)
+                        count += 1
+                except asyncio.TimeoutError:
+                    pass
+                received.append(count)
+        except Exception:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(args.subscribers)])
+    connect_ms = sorted(t * 1000 for t in connect_times) or [0]
+    return {
+        'mode': 'websocket',
+        'url': args.url,
+        'subscribers': args.subscribers,
+        'connected': len(connect_times),
+        'errors': errors,
+        'connect_ms_p50': round(connect_ms[len(connect_ms) // 2], 1),
+        'connect_ms_p99': round(connect_ms[int(len(connect_ms) * 0.99) - 1 if len(connect_ms) > 1 else 0], 1),
+        'messages_received': sum(received),
+        'seconds': round(time.perf_counter() - started, 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming fan-out load test")
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--updates", type=int, default=20, help="snapshot changes to publish (in-process)")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="share of consumers that never read")
+    parser.add_argument("--url", help="ws:// URL of a running /api/stream endpoint")
+    parser.add_argument("--hold", type=float, default=10, help="seconds each WebSocket client waits for updates")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_websocket(args) if args.url else run_in_process(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Deterministic synthetic market data standing in for yfinance
+"""
+
+import zlib
+import numpy as np
+import pandas as pd
+
+# Rough USD levels so converted INR/gram prices look realistic
+BASE_PRICES = {
+    'GC=F': 2000.0,
+    'SI=F': 25.0,
+    'INR=X': 83.0,
+    'CL=F': 75.0,
+    '^NSEI': 22000.0,
+    '^VIX': 15.0
+}
+
+END_DATE = pd.Timestamp('2025-06-30')
+
+
+def ohlc_frame(symbol, bars, end=END_DATE, seed=None, index=None, volatility=0.01):
+    """Geometric random walk OHLCV frame with yfinance's daily columns"""
+    seed = zlib.crc32(symbol.encode()) if seed is None else seed
+    rng = np.random.default_rng(seed)
+    base = BASE_PRICES.get(symbol, 100.0)
+
+    close = base * np.exp(np.cumsum(rng.normal(0.0002 * (volatility / 0.01) ** 2, volatility, bars)))
+    open_ = close * np.exp(rng.normal(0, 0.003, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, bars)))
+
+    if index is None:
+        index = pd.bdate_range(end=end, periods=bars, tz='America/New_York', name='Date')
+    return pd.DataFrame({
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': rng.integers(10_000, 200_000, bars).astype(np.int64),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0
+    }, index=index)
+
+
+def intraday_ohlc_frame(symbol, interval, days, end):
+    """Round-the-clock weekday bars of `interval` ('1h', '15m') over `days` calendar days up to end"""
+    step = pd.Timedelta(interval)
+    index = pd.date_range(end=end.floor(step), periods=int(pd.Timedelta(days=days) / step), freq=step, tz='UTC', name='Datetime')
+    index = index[index.dayofweek < 5]
+    per_day = pd.Timedelta(days=1) / step
+    return ohlc_frame(symbol, len(index), seed=zlib.crc32(f"{symbol}@{interval}".encode()),
+                      index=index, volatility=0.01 / np.sqrt(per_day))
+
+
+def trading_bars(days):
+    """Approximate number of weekday bars in a calendar-day window"""
+    return max(1, days * 5 // 7)
+
+
+class SyntheticSource:
+    """
+    Drop-in for app.data.fetcher.yfinance_history (and, via download(),
+    for yfinance_download)
+
+    Frames are generated once per symbol and sliced per request, so repeated
+    calls are cheap and always return the same bars.
+    """
+
+    def __init__(self, history_days=3650, end=END_DATE):
+        self.end = end
+        self.history_days = history_days
+        self.frames = {}
+        self.calls = 0
+
+    def frame(self, symbol):
+        if symbol not in self.frames:
+            self.frames[symbol] = ohlc_frame(symbol, trading_bars(self.history_days), end=self.end)
+        return self.frames[symbol]
+
+    def intraday(self, symbol, interval):
+        """Intraday bars up to now (generated once, like frame())"""
+        key = (symbol, interval)
+        if key not in self.frames:
+            self.frames[key] = intraday_ohlc_frame(symbol, interval, 400, pd.Timestamp.now('UTC'))
+        return self.frames[key]
+
+    def __call__(self, symbol, start=None, end=None, period=None, interval='1d'):
+        self.calls += 1
+        return self.window(symbol, start, end, period, interval)
+
+    def download(self, symbols, start=None, end=None, period=None, interval='1d'):
+        """Bulk variant (one call for every symbol), like yfinance_download"""
+        self.calls += 1
+        return dict((symbol, self.window(symbol, start, end, period, interval)) for symbol in symbols)
+
+    def window(self, symbol, start=None, end=None, period=None, interval='1d'):
+        if interval != '1d':
+            df = self.intraday(symbol, interval)
+            if period is not None:
+                return df.iloc[-1:]
+            start = pd.Timestamp(start).tz_localize('UTC') if start is not None else None
+            end = pd.Timestamp(end).tz_localize('UTC') if end is not None else None
+            return df.loc[start:end]
+        df = self.frame(symbol)
+        if period is not None:
+            return df.iloc[-1:]
+        if start is not None and end is not None:
+            days = (end - start).days
+            return df.iloc[-trading_bars(days):]
+        return df
+
@@ -0,0 +1,56 @@
+"""
+Refresher process for running the API with several uvicorn workers
+
+Fetches data, loads/retrains models and computes forecasts once, and
+publishes them into a shared memory-mapped file that every worker reads:
+
+    export SONA_SHARED_STATE=/dev/shm/sona-state
+    python refresh_state.py &
+    uvicorn app.main:app --workers 4
+"""
+
+from app.data.history import PriceHistory
+from app.models.predictor import PricePredictor
+from app.models.snapshot import ForecastSnapshots
+from app.models.scheduler import RetrainScheduler
+from app.models.shared import SnapshotPublisher
+from app.utils.shared_state import SharedState, SHARED_STATE_PATH
+import logging
+import signal
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+def main():
+    if not SHARED_STATE_PATH:
+        logger.error("Set SONA_SHARED_STATE to the shared state file (e.g. /dev/shm/sona-state)")
+        return 1
+    
+    predictor = PricePredictor()
+    publisher = SnapshotPublisher(
+        ForecastSnapshots(predictor),
+        SharedState(SHARED_STATE_PATH, writer=True),
+        history=PriceHistory(predictor.fetcher)
+    )
+    
+    # Retrains happen here, never in the API workers
+    scheduler = RetrainScheduler(predictor)
+    if scheduler.interval:
+        scheduler.start()
+    
+    signal.signal(signal.SIGTERM, lambda *_: publisher.stop())
+    logger.info(f"Publishing shared state to {SHARED_STATE_PATH} every {publisher.interval:g}s")
+    try:
+        publisher.run()
+    except KeyboardInterrupt:
+        pass
+    scheduler.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
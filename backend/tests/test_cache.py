@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from app.data.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.005)
+
+
+def test_fresh_hit_does_not_reload():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, stale_ttl=100, clock=clock)
+    calls = []
+
+    assert cache.get('k', lambda: calls.append(1) or 'v1') == 'v1'
+    clock.now += 9
+    assert cache.get('k', lambda: calls.append(1) or 'v2') == 'v1'
+
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_hit_serves_old_value_and_refreshes_once():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, stale_ttl=100, clock=clock)
+    cache.get('k', lambda: 'v1')
+    clock.now += 50
+
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return 'v2'
+
+    # Both stale reads return at once; only one background refresh starts
+    assert cache.get('k', loader) == 'v1'
+    assert cache.get('k', loader) == 'v1'
+    release.set()
+    wait_for(lambda: cache.peek('k') == 'v2')
+
+    assert len(calls) == 1
+    assert cache.stats()['stale_hits'] == 2
+    assert cache.get('k', loader) == 'v2'
+
+
+def test_expired_entry_is_reloaded_synchronously():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, stale_ttl=5, clock=clock)
+    cache.get('k', lambda: 'v1')
+    clock.now += 20
+
+    assert cache.get('k', lambda: 'v2') == 'v2'
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=10, stale_ttl=10, clock=FakeClock())
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'v'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('k', loader))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    wait_for(lambda: cache.stats()['misses'] == 8)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1]
+    assert results == ['v'] * 8
+
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache(ttl=10, stale_ttl=10, clock=FakeClock())
+
+    def failing():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        cache.get('k', failing)
+    assert cache.peek('k') is None
+    assert cache.get('k', lambda: 'v') == 'v'
+
+
+def test_followers_of_a_failed_reload_do_not_get_expired_value():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, stale_ttl=5, clock=clock)
+    cache.get('k', lambda: 'old')
+    clock.now += 20  # past ttl + stale_ttl
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(cache.get('k', failing))
+        except Exception as e:
+            outcomes.append(type(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for t in followers:
+        t.start()
+    wait_for(lambda: cache.stats()['misses'] == 5)  # the first load + 4
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert sorted(outcomes, key=str) == sorted([ValueError] + [LookupError] * 3, key=str)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.models.features import RollingFeatureState, create_features
+from benchmarks.synthetic import ohlc_frame, trading_bars
+
+# Running sums are resynced once per window, so the incremental row stays
+# within ~1e-9 of the pandas rolling computation
+RTOL = 1e-8
+ATOL = 1e-8
+
+
+def history(days):
+    return ohlc_frame('GC=F', trading_bars(days))
+
+
+def assert_parity(state, df):
+    expected = create_features(df).iloc[-1].to_numpy(dtype=np.float64)
+    actual = state.row()[0]
+    np.testing.assert_allclose(actual, expected, rtol=RTOL, atol=ATOL)
+
+
+@pytest.mark.parametrize('days', [90, 365, 3650])
+def test_seed_matches_create_features(days):
+    df = history(days)
+    assert_parity(RollingFeatureState.from_frame(df), df)
+
+
+@pytest.mark.parametrize('days', [90, 365, 3650])
+def test_extend_matches_create_features(days):
+    df = history(days)
+    state = RollingFeatureState.from_frame(df.iloc[:40])
+    for end in range(41, len(df) + 1, 7):
+        assert state.matches(df.iloc[:end])
+        state.extend(df.iloc[:end])
+    state.extend(df)
+    assert_parity(state, df)
+
+
+@pytest.mark.parametrize('days', [90, 365, 3650])
+def test_replace_last_matches_create_features(days):
+    df = history(days)
+    state = RollingFeatureState.from_frame(df)
+    revised = df.copy()
+    for factor in (1.01, 0.97, 1.0):
+        revised.iloc[-1, revised.columns.get_loc('Close')] = df['Close'].iloc[-1] * factor
+        assert state.matches_before_last(revised)
+        state.replace_last(revised.iloc[-1].to_numpy(dtype=np.float64))
+        assert_parity(state, revised)
+
+
+def test_older_revision_needs_reseed():
+    df = history(365)
+    state = RollingFeatureState.from_frame(df)
+    revised = df.copy()
+    revised.iloc[-2, revised.columns.get_loc('Close')] *= 1.01
+    assert not state.matches(revised)
+    assert not state.matches_before_last(revised)
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from app.data.cache import TTLCache
+from app.data.fetcher import MarketDataFetcher
+from benchmarks.synthetic import SyntheticSource
+
+
+class StubSource(SyntheticSource):
+    """SyntheticSource that can be switched off to simulate an outage"""
+
+    def __init__(self):
+        super().__init__(history_days=800, end=pd.Timestamp.today().normalize())
+        self.down = False
+
+    def window(self, symbol, start=None, end=None, period=None, interval='1d'):
+        if self.down:
+            raise ConnectionError("upstream down")
+        return super().window(symbol, start, end, period, interval)
+
+
+@pytest.fixture
+def source():
+    return StubSource()
+
+
+@pytest.fixture
+def fetcher(source):
+    return MarketDataFetcher(source=source, bulk_source=source.download, cache=TTLCache(ttl=300, stale_ttl=0))
+
+
+def test_historical_data_is_converted_and_aligned(fetcher):
+    df = fetcher.get_historical_data('gold', days=365)
+
+    assert df is not None and len(df) > 200
+    assert {'usd_inr', 'oil', 'nifty', 'vix'} <= set(df.columns)
+    # USD/oz -> INR/gram with the retail markup
+    raw = fetcher.source.frame('GC=F')['Close'].iloc[-1]
+    rate = df['usd_inr'].iloc[-1]
+    assert df['Close'].iloc[-1] == pytest.approx(raw * rate / 31.1035 * 1.03)
+
+
+def test_repeated_reads_reuse_one_download(fetcher, source):
+    fetcher.get_historical_data('gold', days=365)
+    calls = source.calls
+    fetcher.get_historical_data('gold', days=365)
+    fetcher.get_historical_data('silver', days=365)
+
+    assert source.calls == calls
+    assert fetcher.cache_stats()['hits'] >= 1
+
+
+def test_usd_inr_rate_from_source(fetcher, source):
+    assert fetcher.get_usd_inr_rate() == pytest.approx(float(source.frame('INR=X')['Close'].iloc[-1]))
+
+
+def test_usd_inr_rate_falls_back_when_upstream_fails(fetcher, source):
+    source.down = True
+
+    assert fetcher.get_usd_inr_rate() == 83.0
+    assert fetcher.get_historical_data('gold', days=365) is None
@@ -0,0 +1,105 @@
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.data.cache import TTLCache
+from app.models.snapshot import ForecastSnapshots
+from app.routes import predictions
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakePredictor:
+    """Stands in for PricePredictor: the snapshot tracks `data`"""
+
+    model_version = 'v1'
+
+    def __init__(self):
+        self.data = 1
+        self.builds = 0
+
+    def ensure_models(self):
+        pass
+
+    def latest_data(self, metal):
+        return self.data
+
+    @staticmethod
+    def data_version(df):
+        return df
+
+    def predict_base(self, metal, df):
+        self.builds += 1
+        price = 7000.0 + df
+        return {
+            'current_price': price,
+            'forecast': [{'day': 1, 'price': price, 'trend': 'up', 'confidence': 80}],
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake(monkeypatch, clock):
+    fake = FakePredictor()
+    snapshots = ForecastSnapshots(fake)
+    snapshots.cache = TTLCache(ttl=60, stale_ttl=86400, clock=clock)
+    monkeypatch.setattr(predictions, 'snapshots', snapshots)
+    return fake
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(predictions.router)
+    return TestClient(app)
+
+
+def etag_for(snapshot):
+    params = ('gold', 'Maharashtra', 'Mumbai', '22K', 10)
+    return predictions.snapshot_cache_headers(snapshot, *params)['ETag']
+
+
+def test_not_modified_while_fresh(client, fake):
+    etag = etag_for(predictions.snapshots.get('gold'))
+
+    response = client.get('/predict', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert fake.builds == 1
+
+
+def test_revalidating_client_triggers_rebuild_after_ttl(client, fake, clock):
+    etag = etag_for(predictions.snapshots.get('gold'))
+    fake.data = 2
+    clock.now += 61
+
+    # Still answered from the old snapshot, but the rebuild starts
+    assert client.get('/predict', headers={'If-None-Match': etag}).status_code == 304
+    wait_for(lambda: predictions.snapshots.peek('gold')['version'][0] == 2)
+
+    response = client.get('/predict', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['currentPrice'] > 0
+    assert fake.builds == 2
@@ -0,0 +1,68 @@
+import fcntl
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.models.registry import ModelRegistry
+from app.models.scheduler import RetrainScheduler
+
+
+def add_version(registry, version):
+    directory = registry.version_dir(version)
+    os.makedirs(directory)
+    with open(os.path.join(directory, "manifest.json"), 'w') as f:
+        json.dump({'version': version, 'format': 2, 'created_at': '2026-01-01T00:00:00', 'models': {}}, f)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "models"))
+    for day in range(1, 7):
+        add_version(registry, f"2026010{day}T000000-000000")
+    return registry
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_prune_keeps_versions_served_by_live_processes(registry):
+    versions = registry.list_versions()
+    registry.mark_serving(versions[0])
+    with open(os.path.join(registry.serving_dir, str(dead_pid())), 'w') as f:
+        f.write(versions[1])
+    registry.activate(versions[-1])
+
+    registry.prune(keep=2)
+
+    assert registry.list_versions() == [versions[0], *versions[-2:]]
+    assert os.listdir(registry.serving_dir) == [str(os.getpid())]
+
+
+class FakePredictor:
+    def __init__(self, registry):
+        self.registry = registry
+        self.model_version = None
+        self.retrains = 0
+
+    def retrain_models(self):
+        self.retrains += 1
+        return {}
+
+
+def test_retrain_skipped_while_another_process_holds_the_lock(registry):
+    predictor = FakePredictor(registry)
+    scheduler = RetrainScheduler(predictor, interval_hours=24)
+
+    with open(os.path.join(registry.root, ".retrain.lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        scheduler.run_once(scheduled=True)
+    assert predictor.retrains == 0
+
+    scheduler.run_once()
+    assert predictor.retrains == 1
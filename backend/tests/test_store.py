@@ -0,0 +1,137 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data.cache import TTLCache
+from app.data.fetcher import MarketDataFetcher, daily_frame
+from app.data.store import PriceStore
+from benchmarks.synthetic import SyntheticSource
+
+SYMBOLS = ['GC=F', 'SI=F', 'INR=X', 'CL=F', '^NSEI', '^VIX']
+
+
+class RecordingSource(SyntheticSource):
+    """SyntheticSource that records each bulk download and can fail symbols"""
+
+    def __init__(self):
+        super().__init__(history_days=800, end=pd.Timestamp.today().normalize())
+        self.downloads = []
+        self.failing = set()
+
+    def download(self, symbols, start=None, end=None, period=None, interval='1d'):
+        self.downloads.append((list(symbols), pd.Timestamp(start)))
+        return super().download([s for s in symbols if s not in self.failing], start, end, period, interval)
+
+
+@pytest.fixture
+def source():
+    return RecordingSource()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / "prices"))
+
+
+def make_fetcher(source, store, **kwargs):
+    return MarketDataFetcher(source=source, bulk_source=source.download, store=store,
+                             cache=TTLCache(ttl=300, stale_ttl=0), **kwargs)
+
+
+def bars(source, symbol='GC=F'):
+    df = daily_frame(source.frame(symbol))
+    return df.set_axis(df.index.as_unit('ns'))
+
+
+def test_write_then_read_window(store, source):
+    df = bars(source)
+    store.write('GC=F', df)
+
+    pd.testing.assert_frame_equal(store.read('GC=F'), df, check_freq=False)
+    window = store.read('GC=F', start=df.index[-10])
+    assert len(window) == 10 and window.index[0] == df.index[-10]
+    assert store.read('SI=F') is None
+
+
+def test_append_adds_new_bars_and_replaces_provisional_tail(store, source):
+    df = bars(source)
+    store.write('GC=F', df.iloc[:-5])
+
+    revised = df.iloc[-6:].copy()
+    revised.iloc[0, revised.columns.get_loc('Close')] += 1.0
+    assert store.append('GC=F', revised) == 5
+
+    expected = pd.concat([df.iloc[:-6], revised])
+    pd.testing.assert_frame_equal(store.read('GC=F'), expected, check_freq=False)
+    assert store.meta('GC=F')['rows'] == len(df)
+
+
+def test_uncommitted_tail_rewrite_is_not_visible(store, source):
+    df = bars(source)
+    store.write('GC=F', df)
+    rows = store.meta('GC=F')['rows']
+
+    # A crash after rewriting a column in place but before meta.json is committed
+    path = os.path.join(store.symbol_dir('GC=F'), "Close.bin")
+    store._write_column(path, np.array([-1.0]), rows - 1, rows)
+
+    assert store.read('GC=F')['Close'].iloc[-1] == df['Close'].iloc[-1]
+
+
+def test_first_sync_backfills_the_window(store, source):
+    fetcher = make_fetcher(source, store)
+    end = datetime.now()
+
+    fetcher.sync(SYMBOLS, end - timedelta(days=365), end)
+
+    assert len(source.downloads) == 1
+    for symbol in SYMBOLS:
+        meta = store.meta(symbol)
+        assert meta['rows'] > 200
+        assert meta['requested_from'] == (end - timedelta(days=365)).date().isoformat()
+
+
+def test_sync_appends_only_missing_days(store, source):
+    fetcher = make_fetcher(source, store)
+    end = datetime.now()
+    fetcher.sync(SYMBOLS, end - timedelta(days=365), end)
+    full = store.read('GC=F')
+
+    # Drop the last 5 stored days, as if the store were a week old
+    for symbol in SYMBOLS:
+        store.write(symbol, store.read(symbol).iloc[:-5], requested_from=end - timedelta(days=365))
+    source.downloads.clear()
+    last = store.last_date('GC=F')
+
+    assert fetcher.sync(SYMBOLS, end - timedelta(days=365), end) == 5 * len(SYMBOLS)
+    assert [start for _, start in source.downloads] == [last]
+    pd.testing.assert_frame_equal(store.read('GC=F'), full, check_freq=False)
+
+
+def test_failed_backfill_does_not_widen_other_symbols(store, source):
+    fetcher = make_fetcher(source, store)
+    end = datetime.now()
+    source.failing.add('^VIX')
+    fetcher.sync(SYMBOLS, end - timedelta(days=365), end)
+    assert store.meta('^VIX') is None
+    source.downloads.clear()
+
+    fetcher.sync(SYMBOLS, end - timedelta(days=365), end)
+
+    starts = dict((tuple(symbols), start) for symbols, start in source.downloads)
+    assert starts[('^VIX',)] == pd.Timestamp((end - timedelta(days=365)).date())
+    assert starts[tuple(s for s in SYMBOLS if s != '^VIX')] == store.last_date('GC=F')
+
+
+def test_restart_reads_store_without_upstream_calls(store, source):
+    make_fetcher(source, store).get_historical_data('gold', days=365)
+    calls = source.calls
+
+    restarted = make_fetcher(source, PriceStore(store.root), read_only=True)
+    df = restarted.get_historical_data('gold', days=365)
+
+    assert df is not None and len(df) > 200
+    assert source.calls == calls
@@ -0,0 +1,71 @@
+import asyncio
+import gc
+
+from fastapi import WebSocketDisconnect
+
+from app.routes import stream
+from app.utils.streaming import PriceStreamHub
+
+
+class FakeWebSocket:
+    """Accepts, takes the first message, then the client goes away"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def receive_text(self):
+        await asyncio.sleep(0.01)
+        raise WebSocketDisconnect(code=1001)
+
+
+def test_disconnect_is_handled_quietly(monkeypatch):
+    async def get_snapshot(metal):
+        return {'version': (1, 'v1')}
+
+    hub = PriceStreamHub(get_snapshot, lambda snapshot, metal, *params: {'currentPrice': 7000.0})
+    monkeypatch.setattr(stream, 'hub', hub)
+    websocket = FakeWebSocket()
+    unhandled = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        await stream.stream_prices(websocket, metal='gold', state='Maharashtra', city='Mumbai', purity='22K', unit=10)
+        gc.collect()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert websocket.sent == [{'type': 'snapshot', 'data': {'currentPrice': 7000.0}}]
+    assert hub.subscriber_count() == 0
+    assert unhandled == []
+
+
+class BrokenWebSocket(FakeWebSocket):
+    async def send_json(self, message):
+        raise RuntimeError("encoder broke")
+
+    async def receive_text(self):
+        await asyncio.sleep(10)
+
+
+def test_unexpected_stream_error_is_logged(monkeypatch, caplog):
+    async def get_snapshot(metal):
+        return {'version': (1, 'v1')}
+
+    hub = PriceStreamHub(get_snapshot, lambda snapshot, metal, *params: {'currentPrice': 7000.0})
+    monkeypatch.setattr(stream, 'hub', hub)
+
+    asyncio.run(stream.stream_prices(BrokenWebSocket(), metal='gold', state='Maharashtra', city='Mumbai',
+                                     purity='22K', unit=10))
+
+    assert hub.subscriber_count() == 0
+    assert any('encoder broke' in record.getMessage() for record in caplog.records)
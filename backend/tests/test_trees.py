@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.models import registry
+from app.models.trees import EXPORT_RTOL, TreeEnsemble, check_export
+from app.models.training import MODEL_PARAMS
+
+xgb = pytest.importorskip('xgboost')
+
+# Float32 sums in XGBoost vs float64 here
+RTOL = 1e-5
+ATOL = 1e-5
+
+
+def dataset(targets, rows=400, features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    weights = rng.normal(size=(features, targets))
+    Y = np.nan_to_num(X) @ weights + rng.normal(scale=0.1, size=(rows, targets))
+    return X, Y[:, 0] if targets == 1 else Y
+
+
+def fit(targets, **params):
+    X, Y = dataset(targets)
+    model = xgb.XGBRegressor(**{**MODEL_PARAMS, 'n_estimators': 30, **params})
+    model.fit(X, Y)
+    booster = model.get_booster()
+    booster.set_attr(trained_through='2026-01-01')
+    return booster
+
+
+@pytest.fixture(scope='module', params=[
+    pytest.param((3, {}), id='multi_output_tree'),
+    pytest.param((3, {'multi_strategy': 'one_output_per_tree'}), id='one_output_per_tree'),
+    pytest.param((1, {'multi_strategy': 'one_output_per_tree'}), id='single_target')
+])
+def booster(request):
+    targets, params = request.param
+    return fit(targets, **params)
+
+
+def test_matches_booster_including_missing_values(booster):
+    ensemble = TreeEnsemble.from_booster(booster)
+    X, _ = dataset(1, rows=200, seed=1)
+    X[::7] = np.nan  # whole rows missing, too
+
+    expected = booster.inplace_predict(X)
+    np.testing.assert_allclose(ensemble.inplace_predict(X), expected, rtol=RTOL, atol=ATOL)
+    assert ensemble.inplace_predict(X[0]).shape == expected[:1].shape
+    assert check_export(booster, ensemble) <= EXPORT_RTOL
+
+
+def test_save_load_round_trip(booster, tmp_path):
+    ensemble = TreeEnsemble.from_booster(booster)
+    path = str(tmp_path / "gold.npz")
+    ensemble.save(path)
+    loaded = TreeEnsemble.load(path)
+
+    X, _ = dataset(1, rows=100, seed=2)
+    np.testing.assert_array_equal(loaded.inplace_predict(X), ensemble.inplace_predict(X))
+    assert loaded.attr('trained_through') == '2026-01-01'
+
+
+def test_tampered_export_is_rejected(booster, tmp_path, monkeypatch):
+    tampered = TreeEnsemble.from_booster(booster)
+    tampered.leaf_values = tampered.leaf_values * 1.5
+    assert check_export(booster, tampered) > EXPORT_RTOL
+
+    monkeypatch.setattr(registry.TreeEnsemble, 'from_booster', classmethod(lambda cls, b: tampered))
+    assert not registry.export_model(str(tmp_path), 'gold', booster)
+    assert os.listdir(tmp_path) == []
@@ -1,9 +1,19 @@
 """
 Script to train ML models for gold and silver predictions
 Run this once initially, then schedule daily via cron
+
+    python train_models.py                  # full refit of every model
+    python train_models.py --incremental    # warm-start on the new bars (daily cron)
+    python train_models.py --compare        # incremental vs full refit accuracy, no publish
+    python train_models.py --tune           # search a config per metal, then refit with it
+    python train_models.py --export         # add NumPy tree exports to the active version
 """
 
 from app.models.predictor import PricePredictor
+from app.models.incremental import compare_with_full
+from app.models.training import METALS, build_dataset
+import argparse
+import json
 import logging
 
 logging.basicConfig(
@@ -14,19 +24,47 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def main():
-    logger.info("🚀 Starting model training...")
+    parser = argparse.ArgumentParser(description="Train the gold/silver price models")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", action="store_true", help="continue boosting the active models")
+    mode.add_argument("--full", action="store_true", help="refit from scratch (overrides SONA_RETRAIN_MODE)")
+    mode.add_argument("--compare", action="store_true", help="report incremental vs full refit accuracy")
+    mode.add_argument("--tune", action="store_true", help="successive-halving search, then refit with the best config")
+    mode.add_argument("--export", action="store_true", help="export the active version's trees for NumPy serving")
+    parser.add_argument("--days", type=int, default=20, help="daily updates to replay with --compare")
+    args = parser.parse_args()
     
     predictor = PricePredictor()
     
-    for metal in ['gold', 'silver']:
-        for day in [1, 2, 3]:
-            try:
-                logger.info(f"Training {metal} model for day {day}...")
-                predictor.train_model(metal, day)
-            except Exception as e:
-                logger.error(f"Error training {metal} day {day}: {str(e)}")
+    if args.export:
+        version = predictor.registry.active_version()
+        if version is None:
+            logger.error("No active model version to export")
+            return
+        logger.info(f"Exported {version}: {predictor.registry.export(version)}")
+        return
+    
+    if args.compare:
+        report = {}
+        for metal in METALS:
+            logger.info(f"Comparing incremental and full retraining for {metal}...")
+            report[metal] = compare_with_full(build_dataset(predictor.fetcher, metal, days=730), days=args.days)
+        print(json.dumps(report, indent=2))
+        return
+    
+    if args.tune:
+        report = predictor.tune_models()
+        logger.info(f"Tuning report:\n{json.dumps(report, indent=2)}")
+        return
+    
+    logger.info("🚀 Starting model training...")
+    
+    # Full: fetches/featurizes each metal once, fits all metals in parallel
+    report = predictor.retrain_models(incremental=True if args.incremental else (False if args.full else None))
+    
+    logger.info(f"Stage timings (seconds):\n{json.dumps(report, indent=2)}")
     
     logger.info("✅ Model training complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
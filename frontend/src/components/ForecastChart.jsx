@@ -2,13 +2,28 @@ import { motion } from 'framer-motion'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Area, ComposedChart } from 'recharts'
 
 export default function ForecastChart({ data, metal }) {
+  const hasBands = data.forecast.some((item) => item.band)
+  // With simulated bands, days 4-7 are read off the widening range rather than a trend line
+  const laterLabel = hasBands ? 'Wider simulated range' : 'Trend Zone'
+
+  // Range areas: [low, high] per point, collapsing to today's price at the start
   const chartData = [
-    { day: 'Today', price: data.currentPrice, zone: 'current' },
+    {
+      day: 'Today',
+      price: data.currentPrice,
+      zone: 'current',
+      ...(hasBands && { band90: [data.currentPrice, data.currentPrice], band50: [data.currentPrice, data.currentPrice] }),
+    },
     ...data.forecast.map((item, index) => ({
       day: `Day ${index + 1}`,
       price: item.price,
       zone: index < 3 ? 'high' : 'trend',
       confidence: item.confidence,
+      ...(item.band && {
+        band90: [item.band.p5, item.band.p95],
+        band50: [item.band.p25, item.band.p75],
+        probUp: item.prob_up,
+      }),
     }))
   ]
 
@@ -26,8 +41,18 @@ export default function ForecastChart({ data, metal }) {
               Confidence: {data.confidence}%
             </p>
           )}
+          {data.band90 && data.zone !== 'current' && (
+            <p className="text-sm text-gray-600 mt-1">
+              90% range: ₹{data.band90[0].toLocaleString('en-IN')} – ₹{data.band90[1].toLocaleString('en-IN')}
+            </p>
+          )}
+          {data.probUp !== undefined && (
+            <p className="text-sm text-gray-600">
+              Chance above today: {data.probUp}%
+            </p>
+          )}
           <p className="text-xs text-gray-500 mt-1">
-            {data.zone === 'high' ? '🎯 High Confidence' : '📊 Trend Zone'}
+            {data.zone === 'high' ? '🎯 High Confidence' : `📊 ${laterLabel}`}
           </p>
         </div>
       )
@@ -52,8 +77,14 @@ export default function ForecastChart({ data, metal }) {
           </div>
           <div className="flex items-center gap-2">
             <div className="w-4 h-4 bg-blue-500 rounded"></div>
-            <span className="text-gray-600">Trend Zone (Days 4-7)</span>
+            <span className="text-gray-600">{laterLabel} (Days 4-7)</span>
           </div>
+          {hasBands && (
+            <div className="flex items-center gap-2">
+              <div className="w-4 h-4 bg-gold-200 rounded"></div>
+              <span className="text-gray-600">Simulated range (50% / 90% of paths)</span>
+            </div>
+          )}
         </div>
       </div>
 
@@ -77,6 +108,26 @@ export default function ForecastChart({ data, metal }) {
             tickFormatter={(value) => `₹${(value / 1000).toFixed(0)}k`}
           />
           <Tooltip content={<CustomTooltip />} />
+          {hasBands && (
+            <Area
+              type="monotone"
+              dataKey="band90"
+              stroke="none"
+              fill="#D4AF37"
+              fillOpacity={0.15}
+              isAnimationActive={false}
+            />
+          )}
+          {hasBands && (
+            <Area
+              type="monotone"
+              dataKey="band50"
+              stroke="none"
+              fill="#D4AF37"
+              fillOpacity={0.3}
+              isAnimationActive={false}
+            />
+          )}
           <Area
             type="monotone"
             dataKey="price"
@@ -99,8 +150,10 @@ export default function ForecastChart({ data, metal }) {
       <div className="mt-6 p-4 bg-blue-50 rounded-lg border border-blue-200">
         <p className="text-sm text-blue-800">
           <strong>💡 How to read:</strong> The first 3 days show high-confidence predictions 
-          based on current market conditions. Days 4-7 represent trend estimates that may 
-          vary based on global market changes.
+          based on current market conditions.{' '}
+          {hasBands
+            ? 'For days 4-7, rely on the shaded bands: they show where prices landed in 50% and 90% of simulated market paths, so they widen with each day.'
+            : 'Days 4-7 represent trend estimates that may vary based on global market changes.'}
         </p>
       </div>
     </motion.div>
@@ -10,6 +10,17 @@
  * @property {number} price
  * @property {number} trend
  * @property {number} confidence
+ * @property {PriceBand} [band] - simulated percentile prices for the day
+ * @property {number} [prob_up] - % of simulated paths above today's price
+ */
+
+/**
+ * @typedef {Object} PriceBand
+ * @property {number} p5
+ * @property {number} p25
+ * @property {number} p50
+ * @property {number} p75
+ * @property {number} p95
  */
 
 /**
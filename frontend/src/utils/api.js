@@ -14,12 +14,38 @@ export const fetchPredictions = async (metal, state, city, purity = '22K', unit
   }
 }
 
-export const refreshModels = async () => {
+export const refreshModels = async (adminToken) => {
   try {
-    const response = await axios.post(`${API_BASE_URL}/api/refresh-models`)
+    const response = await axios.post(`${API_BASE_URL}/api/refresh-models`, null, {
+      headers: { 'X-Admin-Token': adminToken }
+    })
     return response.data
   } catch (error) {
     console.error('Refresh Error:', error)
     throw error
   }
-}
\ No newline at end of file
+}
+
+export const fetchHistory = async (metal, state, city, purity = '22K', unit = 10, { start, end, points = 500, method = 'lttb' } = {}) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/api/history`, {
+      params: { metal, state, city, purity, unit, start, end, points, method }
+    })
+    return response.data
+  } catch (error) {
+    console.error('History Error:', error)
+    throw error
+  }
+}
+
+export const fetchIntraday = async (metal, state, city, purity = '22K', unit = 10, { interval = '1h', days = 5, points = 500, method = 'lttb' } = {}) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/api/intraday`, {
+      params: { metal, state, city, purity, unit, interval, days, points, method }
+    })
+    return response.data
+  } catch (error) {
+    console.error('Intraday Error:', error)
+    throw error
+  }
+}